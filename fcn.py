@@ -59,20 +59,137 @@ Parameters
     -x, --host                      Action Node IP (Default: 127.0.0.1)
     -y, --port                      Output Port to Action Node (Default: 5000)
     -z, --proto                     Protocol to Action Node (Default: UDP)
+    -f, --from-file                 CSV or JSON Lines file of rules, - for
+                                    stdin
+    --format                        Rule file format: csv or jsonl
+    -m, --msg-size                  Pack rule file rows into messages of up to
+                                    this many bytes (Default: 0, no packing)
+    -S, --session                   Send the template once per connection,
+                                    messages then carry only data
+    --template-interval             Seconds between UDP templates in session
+                                    mode (Default: 60)
+    -r, --rate                      Send generated rules at this many msg/s
+    --duration                      Length of the load run (Default: 10)
+    --count                         Stop the load run after this many messages
+    --burst                         Messages sent back to back to catch up
+                                    (Default: 10)
+    --poisson                       Poisson arrivals instead of even spacing
+    --ramp                          Seconds to ramp up to the rate
+    --flows                         Distinct flows in the load run
+                                    (Default: 65535)
+    -w, --workers                   Processes sharing the load run (Default: 1)
+    --pcap                          Write the messages to a capture file
+                                    instead of sending them
+    --pcap-format                   Capture format: pcap or pcapng
+                                    (Default: from the file extension)
+    --from-pcap                     Send an Add rule for each flow in a pcap
+                                    or pcapng file, - for stdin
+    --pcap-counts                   Fill in the packet and kbyte counts of
+                                    the flows, rules are sent after the
+                                    whole capture is read
+    --flow-table                    Skip rule file and capture Adds for flows
+                                    still installed and Removes for flows
+                                    that are not
+    --stream                        Send rules written one per line as
+                                    command line flags, - for stdin
+    --flush-delay                   Milliseconds a partial streamed message
+                                    waits for more rules (Default: 1)
+    --from-ring                     Send rules a co-located classifier writes
+                                    to a shared-memory ring buffer
+    --ring-size                     Slots of a ring that is created
+                                    (Default: 65536)
+    --from-flows                    Send every rule in a binary flow file,
+                                    see fcn_flowfile.py
+    --metrics                       Print the time spent in each stage of
+                                    the send pipeline at exit
+    --metrics-file                  Write Prometheus metrics to this
+                                    textfile every 10 seconds and at exit
+    --metrics-port                  Serve Prometheus metrics over HTTP on
+                                    this local port while running
 """
 
 # Import dependencies
+import os
+import signal
 import socket
 import sys
 import time
-import binascii
 import argparse
+import itertools
+import multiprocessing
+import struct
+
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_batch import RecordBatcher
+from fcn_flowfile import FlowFile
+from fcn_flowtable import FlowTable
+from fcn_loadgen import LoadGenerator
+from fcn_loadgen import LoadReport
+from fcn_metrics import Metrics
+from fcn_packet import PacketBuilder
+from fcn_pcap import PCAP_FORMATS
+from fcn_pcap import PcapTransport
+from fcn_pcap import read_flows
+from fcn_ring import DEFAULT_CAPACITY
+from fcn_ring import RingBuffer
+from fcn_ring import RingConsumer
+from fcn_rulefile import FORMATS
+from fcn_rulefile import file_format
+from fcn_rulefile import read_rules
+from fcn_stream import RuleStream
+from fcn_transport import Transport
+
+# Precompiled RAP message layouts (network byte order)
+# Header: version, message length, sequence number, export time,
+# template set id, template set length
+HEADER_STRUCT = struct.Struct('!HHIIHH')
+# Set header: set id, set length
+SET_HEADER_STRUCT = struct.Struct('!HH')
+# Template record: template id, flags and field specifiers. It never
+# changes, so it is packed once at import time
+TEMPLATE_RECORD = struct.pack('!' + 'H' * 20,
+                              256,    # Template ID
+                              0,      # Template flags
+                              32770,  # EXPORT_NAME
+                              8,      # Length of export name
+                              12,     # MSG_TYPE
+                              1,      # SRC_IPV4
+                              2,      # DST_IPV4
+                              3,      # SRC_PORT
+                              4,      # DST_PORT
+                              5,      # PROTO
+                              16,     # PCKT_CNT
+                              17,     # KBYTE_CNT
+                              49152,  # CLASSES
+                              13,     # TIMEOUT_TYPE
+                              14,     # TIMEOUT
+                              32768,  # ACTION
+                              8,      # Length of action
+                              15,     # ACTION_FLAGS
+                              32769,  # ACTION_PARAMS
+                              16)     # Length of action parameter
+# Template-only message: version and message length, then the template
+# set header (set id 1)
+TEMPLATE_MESSAGE_HEAD = struct.pack('!HH', 1, len(TEMPLATE_RECORD) + 16)
+TEMPLATE_SET_HEADER = SET_HEADER_STRUCT.pack(1, len(TEMPLATE_RECORD) + 4)
+# Upper bound on the number of cached templates
+TEMPLATE_CACHE_SIZE = 4096
+# Data record up to and including the class name length
+PAYLOAD_HEAD_STRUCT = struct.Struct('!8sB4s4sHHBIIB')
+# Data record after the class name
+PAYLOAD_TAIL_STRUCT = struct.Struct('!BBHQH16s')
 
 
 class FCN(object):
     """Fake Classifier Node CLI
 
     """
+    # Packed templates keyed by payload length
+    template_cache = {}
+    # Socket pool used by send_message
+    transport = None
+    # Stage timings and counters, None when not recorded
+    metrics = None
 
     def __init__(self):
         """Initialise FCN CLI
@@ -81,18 +198,446 @@ class FCN(object):
         # Get command line inputs
         inputs = self.parser()
 
-        # Serialise data
-        c_msg_pay = self.create_msg_payload(cli_inputs=inputs)
-        c_temp = self.create_template(payload_len=len(c_msg_pay))
-        c_header = self.create_header(cli_inputs=inputs,
-                                      payload_len=len(c_msg_pay),
-                                      template_len=len(c_temp))
+        if self.metrics_enabled(inputs):
+            self.start_metrics(inputs)
+        try:
+            self.dispatch(inputs)
+        finally:
+            self.close_transport()
+            if self.metrics is not None:
+                self.stop_metrics(inputs)
+
+    def dispatch(self, inputs):
+        """Sends the rules the command line asks for
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+
+        """
+        if inputs.from_file is not None:
+            # Stream rules from a file
+            self.send_rule_file(inputs)
+        elif inputs.from_flows is not None:
+            # Encode a memory-mapped binary flow file
+            self.send_flow_file(inputs)
+        elif inputs.from_pcap is not None:
+            # Stream rules from the flows of captured traffic
+            self.send_pcap_flows(inputs)
+        elif inputs.stream is not None:
+            # Send rules as a live producer writes them
+            self.send_stream(inputs)
+        elif inputs.from_ring is not None:
+            # Send rules a co-located classifier writes to shared memory
+            self.send_ring(inputs)
+        elif inputs.rate is not None:
+            # Generate load at a target rate
+            self.send_load(inputs)
+        else:
+            # Serialise data
+            rap_msg = self.pack_rule_message(inputs, inputs.session)
+
+            # Send RAP message
+            self.send_message(rap_msg, inputs)
+
+    @staticmethod
+    def metrics_enabled(inputs):
+        """Checks if the command line asks for metrics
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+
+        Returns
+        -------
+            True if any metrics option is given
+
+        """
+        return (inputs.metrics or inputs.metrics_file is not None or
+                inputs.metrics_port is not None)
+
+    def start_metrics(self, inputs):
+        """Times the send pipeline of this instance and starts the
+        Prometheus exporters
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+
+        """
+        self.metrics = Metrics()
+        self.metrics.instrument(self)
+        try:
+            self.metrics.export(inputs.metrics_file, inputs.metrics_port)
+        except (NameError, IOError, OSError) as error:
+            sys.exit(str(error))
+
+    def stop_metrics(self, inputs):
+        """Stops the exporters, writes the final textfile and prints the
+        summary
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+
+        """
+        self.metrics.stop()
+        if inputs.metrics_file is not None:
+            try:
+                self.metrics.write_textfile(inputs.metrics_file)
+            except (IOError, OSError) as error:
+                print('Error: Couldn\'t write %s: %s' % (inputs.metrics_file,
+                                                        error))
+        print(self.metrics.summary())
+
+    def send_load(self, inputs):
+        """Sends generated rules at the target rate and prints a report.
+        With more than one worker the load is split across processes
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs. The source IP and port of each rule
+            are varied to cycle through distinct flows
+
+        """
+        workers = inputs.workers
+        print('Sending to %s:%s over %s at %.1f msg/s with %d worker(s)' % (
+            inputs.HOST, inputs.PORT, inputs.PROTO.upper(), inputs.rate,
+            workers))
+        if workers <= 1:
+            try:
+                report = self.run_load_shard(inputs, 0, 1)
+            except NameError as error:
+                sys.exit(str(error))
+            print(report)
+            return
+
+        pool = multiprocessing.Pool(workers, init_load_worker)
+        try:
+            result = pool.map_async(
+                send_load_shard,
+                [(inputs, shard, workers) for shard in range(workers)])
+            while True:
+                try:
+                    results = result.get(0.5)
+                    break
+                except multiprocessing.TimeoutError:
+                    pass
+        except KeyboardInterrupt:
+            # Workers ignore Ctrl-C and are stopped here, one interrupted
+            # before its run started would never return
+            pool.terminate()
+            pool.join()
+            sys.exit('Interrupted, the load run was stopped')
+        except NameError as error:
+            pool.terminate()
+            pool.join()
+            sys.exit(str(error))
+        pool.close()
+        pool.join()
+
+        reports = [report for report, _ in results]
+        if self.metrics is not None:
+            # Each worker timed its own sends
+            for _, metrics in results:
+                self.metrics.merge(metrics)
+        for shard, report in enumerate(reports):
+            print('Worker %d: %d sent, %d errors, %.1f msg/s' % (
+                shard, report.sent, report.errors, report.rate))
+        print(LoadReport.merged(reports))
+
+    def run_load_shard(self, inputs, shard, shards):
+        """Sends one worker's share of the generated load. Each worker has
+        its own socket, a disjoint slice of the flows and a disjoint range
+        of 2**32 / shards sequence numbers
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+        shard:
+            Index of this worker
+        shards:
+            Number of workers
+
+        Returns
+        -------
+            The LoadReport of this worker
+
+        """
+        port = self.port_check(inputs.PORT)
+        proto = self.protocol_check(inputs.PROTO)
+        template = self.pack_template_message if inputs.session else None
+
+        # Fail on invalid inputs before the run starts
+        builder = PacketBuilder(self, inputs, session=inputs.session)
+        flows = inputs.flows
+        if flows < 1:
+            raise NameError('Error: Flows must be at least 1')
+        source_ip = struct.unpack('!I', socket.inet_aton(inputs.srcip))[0]
+        destination_ip = struct.unpack(
+            '!I', socket.inet_aton(inputs.destip))[0]
+        seq_no = (inputs.seq_no + shard * (2 ** 32 // shards)) & 0xffffffff
+        count = inputs.count
+        if count is not None:
+            count = count // shards + (1 if shard < count % shards else 0)
+
+        self.transport = self.open_transport(inputs, shard, shards,
+                                             self.metrics)
+
+        # Each message only patches the header and 5-tuple of one buffer
+        def send(index):
+            flow = (index * shards + shard) % flows
+            builder.patch_header((seq_no + index) & 0xffffffff,
+                                 int(time.time()))
+            builder.patch_flow(0,
+                               (source_ip + flow // 65535) & 0xffffffff,
+                               destination_ip,
+                               1 + flow % 65535,
+                               inputs.destport,
+                               inputs.prototype)
+            self.transport.send(builder.buffer, inputs.HOST, port, proto,
+                                template=template)
+
+        generator = LoadGenerator(send,
+                                  itertools.count(),
+                                  rate=inputs.rate / shards,
+                                  duration=inputs.duration,
+                                  count=count,
+                                  burst=inputs.burst,
+                                  poisson=inputs.poisson,
+                                  ramp=inputs.ramp)
+        try:
+            return generator.run()
+        finally:
+            self.close_transport()
+
+    def send_rule_file(self, inputs):
+        """Encodes and sends every rule in a CSV or JSON Lines file as it
+        is read
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs, used for the host settings and for
+            columns missing from the file
+
+        """
+        try:
+            fmt = file_format(inputs.from_file, inputs.file_format)
+            if inputs.from_file == '-':
+                stream = sys.stdin
+            else:
+                stream = open(inputs.from_file)
+        except (NameError, IOError) as error:
+            sys.exit(str(error))
+
+        try:
+            self.send_rules(read_rules(stream, fmt, inputs), inputs)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def send_flow_file(self, inputs):
+        """Sends every rule in a binary flow file, packed into messages
+        of up to --msg-size bytes. The file is memory-mapped and encoded
+        without parsing
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs, used for the host settings, export,
+            action flag and first sequence number
+
+        """
+        try:
+            flow_file = FlowFile(inputs.from_flows)
+        except NameError as error:
+            sys.exit(str(error))
+        if self.metrics is not None:
+            self.metrics.instrument_records(flow_file)
+        messages = 0
+        try:
+            for data in flow_file.messages(
+                    self, inputs.export, inputs.seq_no,
+                    inputs.msg_size or DEFAULT_MSG_SIZE, inputs.session,
+                    inputs.a_flg):
+                self.send_message(data, inputs)
+                messages += 1
+        except NameError as error:
+            sys.exit(str(error))
+        finally:
+            flow_file.close()
+
+        print('Sent %d rules in %d messages' % (len(flow_file), messages))
+
+    def send_pcap_flows(self, inputs):
+        """Sends an Add rule for every distinct flow in a pcap or pcapng
+        file, reading the capture as a stream
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs, used for the host settings and for
+            the rule fields that are not part of the 5-tuple
+
+        """
+        try:
+            if inputs.from_pcap == '-':
+                stream = getattr(sys.stdin, 'buffer', sys.stdin)
+            else:
+                stream = open(inputs.from_pcap, 'rb')
+        except IOError as error:
+            sys.exit(str(error))
+
+        try:
+            self.send_rules(read_flows(stream, inputs, inputs.pcap_counts),
+                            inputs, 'Packet')
+        finally:
+            if inputs.from_pcap != '-':
+                stream.close()
+
+    def send_stream(self, inputs):
+        """Sends rules written one per line by a live producer until the
+        stream ends or Ctrl-C. Rules that arrive together are packed into
+        messages of up to --msg-size bytes
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs, used for the host settings and for
+            flags missing from a line
+
+        """
+        try:
+            if inputs.stream == '-':
+                fd = sys.stdin.fileno()
+            else:
+                fd = os.open(inputs.stream, os.O_RDONLY)
+        except OSError as error:
+            sys.exit(str(error))
+
+        flow_table = None
+        if inputs.flow_table:
+            flow_table = FlowTable()
+        try:
+            batcher = RecordBatcher(
+                self, lambda data: self.send_message(data, inputs),
+                inputs.msg_size or DEFAULT_MSG_SIZE, session=inputs.session)
+            stream = RuleStream(fd, inputs, batcher,
+                                delay=inputs.flush_delay / 1000.0,
+                                flow_table=flow_table)
+        except NameError as error:
+            sys.exit(str(error))
+        try:
+            stream.run()
+        except KeyboardInterrupt:
+            stream.flush()
+        finally:
+            if inputs.stream != '-':
+                os.close(fd)
+
+        print('Sent %d rules in %d messages' % (stream.rules,
+                                                batcher.messages))
+        if stream.errors:
+            print('Skipped %d invalid lines' % stream.errors)
+        if flow_table is not None:
+            print('Suppressed %d redundant rules' % flow_table.suppressed)
+
+    def send_ring(self, inputs):
+        """Sends the rules written to a shared-memory ring buffer until
+        Ctrl-C. The ring is created if it doesn't exist
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs, used for the host settings, export,
+            action flag and the class of records without one
 
-        # Convert to byte hex
-        rap_msg = binascii.a2b_hex(c_header + c_temp + c_msg_pay)
+        """
+        try:
+            if os.path.exists(inputs.from_ring):
+                ring = RingBuffer(inputs.from_ring)
+            else:
+                ring = RingBuffer(inputs.from_ring, inputs.ring_size)
+            consumer = RingConsumer(
+                ring, self, lambda data: self.send_message(data, inputs),
+                inputs, inputs.msg_size or DEFAULT_MSG_SIZE,
+                session=inputs.session)
+        except NameError as error:
+            sys.exit(str(error))
+        if self.metrics is not None:
+            self.metrics.instrument_records(consumer)
+        print('Reading %d slot ring %s' % (ring.capacity, inputs.from_ring))
+        try:
+            consumer.run()
+        finally:
+            ring.close()
+
+        print('Sent %d rules in %d messages' % (consumer.rules,
+                                                consumer.messages))
+        if consumer.errors:
+            print('Skipped %d invalid records' % consumer.errors)
+
+    def send_rules(self, rules, inputs, unit='Line'):
+        """Encodes and sends rules as they are produced
+
+        Parameters
+        ----------
+        rules:
+            Iterable of (position, rule), the position is used in errors
+        inputs:
+            The command line inputs
+        unit:
+            What the position counts, for errors
 
-        # Send RAP message
-        self.send_message(rap_msg, inputs)
+        """
+        count = 0
+        flow_table = None
+        if getattr(inputs, 'flow_table', False):
+            flow_table = FlowTable()
+        batcher = None
+        if inputs.msg_size:
+            try:
+                batcher = RecordBatcher(
+                    self, lambda data: self.send_message(data, inputs),
+                    inputs.msg_size, session=inputs.session)
+            except NameError as error:
+                sys.exit(str(error))
+        try:
+            try:
+                for position, rule in rules:
+                    if flow_table is not None and not flow_table.admit(rule):
+                        continue
+                    try:
+                        if batcher is not None:
+                            batcher.add(rule)
+                        else:
+                            self.send_message(self.pack_rule_message(
+                                rule, inputs.session), inputs)
+                    except NameError as error:
+                        raise NameError('Error: %s %d: %s' % (
+                            unit, position,
+                            str(error).replace('Error: ', '', 1)))
+                    count += 1
+            finally:
+                # Rules batched before a bad one are still sent
+                if batcher is not None:
+                    batcher.flush()
+        except NameError as error:
+            sys.exit(str(error))
+
+        if batcher is not None:
+            print('Sent %d rules in %d messages' % (count, batcher.messages))
+        else:
+            print('Sent %d rules' % count)
+        if flow_table is not None:
+            print('Suppressed %d redundant rules' % flow_table.suppressed)
 
     def create_msg_payload(self, cli_inputs):
         """Serialises the parameters for the RAP packet
@@ -108,8 +653,9 @@ class FCN(object):
             The parameters and data about made by a classifier
 
         """
-        packet_count = 0
-        kbyte_count = 0
+        # Counts are only known for rules taken from captured traffic
+        packet_count = getattr(cli_inputs, 'packet_count', 0)
+        kbyte_count = getattr(cli_inputs, 'kbyte_count', 0)
 
         # Check the message variables
         msg_type = self.msg_type_check(cli_inputs.msgtype)
@@ -276,30 +822,73 @@ class FCN(object):
         port = self.port_check(inputs.PORT)
         proto = self.protocol_check(inputs.PROTO)  # Proto check
 
+        # Sockets stay open in the transport until close_transport
         try:
-            # Open UDP Socket if UDP
-            if proto.lower() in ["udp"]:
+            if self.transport is None:
+                self.transport = self.open_transport(inputs,
+                                                     metrics=self.metrics)
+        except NameError as error:
+            sys.exit(str(error))
+        if (inputs.HOST, port, proto.lower()) not in self.transport.sockets:
+            if getattr(inputs, 'pcap', None) is not None:
+                print("Writing %s packets for port %d to %s" % (
+                    proto.upper(), port, inputs.pcap))
+            else:
                 print(
-                    "Opening UDP socket on port", port)
-                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    "Opening %s socket on port" % proto.upper(), port)
 
-                # Send UDP Message
-                sock.sendto(data, (inputs.HOST, port))
+        # Data-only messages need the template sent ahead of them
+        template = None
+        if getattr(inputs, 'session', False):
+            template = self.pack_template_message
 
-            # Open TCP Socket if TCP
-            else:
-                print(
-                    "Opening TCP socket on port", port)
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.transport.send(data, inputs.HOST, port, proto,
+                                template=template)
+        except NameError as error:
+            sys.exit(str(error))
+
+    @staticmethod
+    def open_transport(inputs, shard=0, shards=1, metrics=None):
+        """Creates the transport messages are sent through, a capture
+        file writer when --pcap is given
+
+        Parameters
+        ----------
+        inputs:
+            The command line inputs
+        shard:
+            Index of the load worker
+        shards:
+            Number of load workers, each worker writes its own capture
+            file named after the worker
+        metrics:
+            Metrics the Transport records sends in, capture files are not
+            timed
+
+        Returns
+        -------
+            The Transport or PcapTransport
+
+        """
+        interval = getattr(inputs, 'template_interval', 60)
+        path = getattr(inputs, 'pcap', None)
+        if path is None:
+            return Transport(template_interval=interval, metrics=metrics)
+        fmt = getattr(inputs, 'pcap_format', None)
+        if shards > 1:
+            root, ext = os.path.splitext(path)
+            path = '%s-%d%s' % (root, shard, ext)
 
-                # Send TCP Message
-                sock.settimeout(10)
-                sock.connect((inputs.HOST, port))
-                sock.send(data)
-                sock.close()
+        return PcapTransport(path, fmt, template_interval=interval)
 
-        except socket.timeout:
-            sys.exit('Error: Couldn\'t connect to socket')
+    def close_transport(self):
+        """Closes every socket opened by send_message
+
+        """
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
 
     def create_header(self, cli_inputs, payload_len, template_len):
         """Creates the packet header
@@ -341,6 +930,241 @@ class FCN(object):
 
         return header
 
+    def pack_message(self, cli_inputs):
+        """Serialises a complete RAP message straight to bytes
+
+        Parameters
+        ----------
+        cli_inputs:
+            The imported command line interface inputs
+
+        Returns
+        -------
+        rap_msg:
+            The header, template and payload as a byte string
+
+        """
+        payload = self.pack_msg_payload(cli_inputs=cli_inputs)
+        template = self.pack_template(payload_len=len(payload))
+        header = self.pack_header(cli_inputs=cli_inputs,
+                                  payload_len=len(payload),
+                                  template_len=len(template))
+
+        return header + template + payload
+
+    def pack_batch(self, cli_inputs, payloads):
+        """Serialises a RAP message holding several data records in one
+        data set
+
+        Parameters
+        ----------
+        cli_inputs:
+            The inputs of the first rule, used for the sequence number
+        payloads:
+            The data records from pack_msg_payload
+
+        Returns
+        -------
+        rap_msg:
+            The header, template and payloads as a byte string
+
+        """
+        payload = b''.join(payloads)
+        template = self.pack_template(payload_len=len(payload))
+        header = self.pack_header(cli_inputs=cli_inputs,
+                                  payload_len=len(payload),
+                                  template_len=len(template))
+
+        return header + template + payload
+
+    def pack_data_batch(self, cli_inputs, payloads):
+        """Serialises a RAP message holding only a data set, for sessions
+        where the Action Node already has the template
+
+        Parameters
+        ----------
+        cli_inputs:
+            The inputs of the first rule, used for the sequence number
+        payloads:
+            The data records from pack_msg_payload
+
+        Returns
+        -------
+        rap_msg:
+            The header and payloads as a byte string
+
+        """
+        payload = b''.join(payloads)
+        try:
+            header = HEADER_STRUCT.pack(1,  # Version
+                                        len(payload) + 16,
+                                        cli_inputs.seq_no,
+                                        int(time.time()),
+                                        256,  # Set ID = 256
+                                        len(payload) + 4)
+        except struct.error:
+            raise NameError('Error: Header field out of range')
+
+        return header + payload
+
+    def pack_rule_message(self, cli_inputs, session=False):
+        """Serialises one rule as a RAP message
+
+        Parameters
+        ----------
+        cli_inputs:
+            The inputs of the rule
+        session:
+            Leave the template out, the transport sends it ahead
+
+        Returns
+        -------
+        rap_msg:
+            The serialised message
+
+        """
+        if session:
+            return self.pack_data_batch(
+                cli_inputs, [self.pack_msg_payload(cli_inputs=cli_inputs)])
+        return self.pack_message(cli_inputs=cli_inputs)
+
+    @staticmethod
+    def pack_template_message(data):
+        """Creates a RAP message holding only the template set, sent ahead
+        of data-only messages
+
+        Parameters
+        ----------
+        data:
+            The message the template goes in front of. Its sequence number
+            and export time are reused
+
+        Returns
+        -------
+        rap_msg:
+            The header and template set as a byte string
+
+        """
+        return (TEMPLATE_MESSAGE_HEAD + data[4:12] + TEMPLATE_SET_HEADER +
+                TEMPLATE_RECORD)
+
+    def pack_msg_payload(self, cli_inputs):
+        """Serialises the parameters for the RAP packet to bytes
+
+        Binary equivalent of create_msg_payload
+
+        Parameters
+        ----------
+        cli_inputs:
+            The imported command line interface inputs
+
+        Returns
+        -------
+        msg_pay:
+            The data record as a byte string
+
+        """
+        # Counts are only known for rules taken from captured traffic
+        packet_count = getattr(cli_inputs, 'packet_count', 0)
+        kbyte_count = getattr(cli_inputs, 'kbyte_count', 0)
+
+        # Check the message variables
+        msg_type = self.msg_type_check(cli_inputs.msgtype)
+        prototype = self.prototype_check(cli_inputs.prototype)
+        export_name = self.export_name_check(cli_inputs.export)
+        table_priority = self.priority_check(cli_inputs.prio)
+        source_port = self.port_check(cli_inputs.srcport)
+        destination_port = self.port_check(cli_inputs.destport)
+        class_name = self.to_bytes(cli_inputs.mclass)
+        source_ip = socket.inet_aton(self.ip_check(cli_inputs.srcip))
+        destination_ip = socket.inet_aton(self.ip_check(cli_inputs.destip))
+
+        try:
+            head = PAYLOAD_HEAD_STRUCT.pack(self.to_bytes(export_name),
+                                            msg_type,
+                                            source_ip,
+                                            destination_ip,
+                                            source_port,
+                                            destination_port,
+                                            prototype,
+                                            packet_count,
+                                            kbyte_count,
+                                            len(class_name) + 4)
+            tail = PAYLOAD_TAIL_STRUCT.pack(table_priority,
+                                            0,  # Timeout type
+                                            cli_inputs.timeoutval,
+                                            0,  # Action
+                                            cli_inputs.a_flg,
+                                            b'')  # Action parameter
+        except struct.error:
+            raise NameError('Error: Message field out of range')
+
+        # Class name is followed by two padding bytes
+        return head + class_name + b'\x00\x00' + tail
+
+    def pack_template(self, payload_len):
+        """Creates the template as bytes
+
+        Binary equivalent of create_template. Templates are cached by
+        payload length and shared by every FCN instance
+
+        Parameters
+        ----------
+        payload_len:
+            The length of the payload in bytes
+
+        Returns
+        -------
+        temp:
+            The template format as a byte string
+        """
+        try:
+            return self.template_cache[payload_len]
+        except KeyError:
+            pass
+
+        # Only the data set length depends on the payload
+        try:
+            temp = TEMPLATE_RECORD + SET_HEADER_STRUCT.pack(
+                256,  # Set ID = 256
+                payload_len + 4)  # Set length of msg
+        except struct.error:
+            raise NameError('Error: Message too long')
+        if len(self.template_cache) < TEMPLATE_CACHE_SIZE:
+            self.template_cache[payload_len] = temp
+
+        return temp
+
+    def pack_header(self, cli_inputs, payload_len, template_len):
+        """Creates the packet header as bytes
+
+        Binary equivalent of create_header
+
+        Parameters
+        ----------
+        cli_inputs:
+            The imported command line interface inputs
+        payload_len:
+            The length of the payload in bytes
+        template_len:
+            The length of the template in bytes
+
+        Returns
+        -------
+        header:
+            The header as a byte string
+
+        """
+        try:
+            return HEADER_STRUCT.pack(1,  # Version
+                                      payload_len + template_len + 16,
+                                      cli_inputs.seq_no,
+                                      int(time.time()),
+                                      1,  # Set ID = 1 for template
+                                      template_len)
+        except struct.error:
+            raise NameError('Error: Header field out of range')
+
     @staticmethod
     def parser():
         """Command Line Interface for the FCN
@@ -480,6 +1304,239 @@ class FCN(object):
                             help='(Experimental)\n\t\t\t'
                                  '0: Unidirectional\n\t\t\t'
                                  '1: Bidirectional\n')
+        # Bulk input
+        parser.add_argument("-f", "--from-file",
+                            action="store",
+                            dest="from_file",
+                            default=None,
+                            metavar='Rule File',
+                            help='\t\t\t'
+                                 'CSV or JSON Lines file of rules, - for '
+                                 'stdin.\n\t\t\t'
+                                 'Columns use the long flag names')
+        parser.add_argument("--format",
+                            action="store",
+                            dest="file_format",
+                            choices=FORMATS,
+                            default=None,
+                            metavar='Format',
+                            help='\t\t\t'
+                                 'Rule file format: csv or jsonl '
+                                 '(Default: from file extension, csv)')
+        parser.add_argument("-m", "--msg-size",
+                            action="store",
+                            dest="msg_size",
+                            type=int,
+                            default=0,
+                            metavar='Message Size',
+                            help='\t\t\t'
+                                 'Pack rule file rows into RAP messages of '
+                                 'up to this many bytes.\n\t\t\t'
+                                 '1472 fills a 1500 byte MTU over UDP '
+                                 '(Default: 0, one rule per message)')
+        parser.add_argument("-S", "--session",
+                            action="store_true",
+                            dest="session",
+                            help='\t\t\t'
+                                 'Send the template once per TCP connection '
+                                 'or every\n\t\t\t'
+                                 'template interval over UDP, messages '
+                                 'then\n\t\t\t'
+                                 'carry only data')
+        parser.add_argument("--template-interval",
+                            action="store",
+                            dest="template_interval",
+                            type=int,
+                            default=60,
+                            metavar='Seconds',
+                            help='\t\t\t'
+                                 'Seconds between UDP template messages in '
+                                 'session\n\t\t\t'
+                                 'mode (Default: 60)')
+        # Load generation
+        parser.add_argument("-r", "--rate",
+                            action="store",
+                            dest="rate",
+                            type=float,
+                            default=None,
+                            metavar='Rate',
+                            help='\t\t\t'
+                                 'Send generated rules at this many '
+                                 'messages per second')
+        parser.add_argument("--duration",
+                            action="store",
+                            dest="duration",
+                            type=float,
+                            default=10,
+                            metavar='Seconds',
+                            help='\t\t\t'
+                                 'Length of the load run (Default: 10)')
+        parser.add_argument("--count",
+                            action="store",
+                            dest="count",
+                            type=int,
+                            default=None,
+                            metavar='Messages',
+                            help='\t\t\t'
+                                 'Stop the load run after this many messages')
+        parser.add_argument("--burst",
+                            action="store",
+                            dest="burst",
+                            type=int,
+                            default=10,
+                            metavar='Messages',
+                            help='\t\t\t'
+                                 'Messages sent back to back to catch up '
+                                 '(Default: 10)')
+        parser.add_argument("--poisson",
+                            action="store_true",
+                            dest="poisson",
+                            help='\t\t\t'
+                                 'Poisson arrivals instead of even spacing')
+        parser.add_argument("--ramp",
+                            action="store",
+                            dest="ramp",
+                            type=float,
+                            default=0,
+                            metavar='Seconds',
+                            help='\t\t\t'
+                                 'Ramp linearly up to the rate over this '
+                                 'many seconds')
+        parser.add_argument("--flows",
+                            action="store",
+                            dest="flows",
+                            type=int,
+                            default=65535,
+                            metavar='Flows',
+                            help='\t\t\t'
+                                 'Distinct flows cycled through by the load '
+                                 'run\n\t\t\t'
+                                 '(Default: 65535)')
+        parser.add_argument("-w", "--workers",
+                            action="store",
+                            dest="workers",
+                            type=int,
+                            default=1,
+                            metavar='Workers',
+                            help='\t\t\t'
+                                 'Processes sharing the load run, each with '
+                                 'its own socket\n\t\t\t'
+                                 'and sequence numbers (Default: 1)')
+        parser.add_argument("--pcap",
+                            action="store",
+                            dest="pcap",
+                            default=None,
+                            metavar='File',
+                            help='\t\t\t'
+                                 'Write the messages to a capture file '
+                                 'instead of sending them.\n\t\t\t'
+                                 'Packets get synthetic Ethernet, IP and '
+                                 'UDP/TCP headers')
+        parser.add_argument("--pcap-format",
+                            action="store",
+                            dest="pcap_format",
+                            default=None,
+                            choices=PCAP_FORMATS,
+                            metavar='Format',
+                            help='\t\t\t'
+                                 'Capture format: pcap or pcapng '
+                                 '(Default: from the file extension)')
+        parser.add_argument("--from-pcap",
+                            action="store",
+                            dest="from_pcap",
+                            default=None,
+                            metavar='File',
+                            help='\t\t\t'
+                                 'Send an Add rule for each flow in a pcap '
+                                 'or pcapng file,\n\t\t\t'
+                                 '- for stdin')
+        parser.add_argument("--pcap-counts",
+                            action="store_true",
+                            dest="pcap_counts",
+                            help='\t\t\t'
+                                 'Fill in the packet and kbyte counts of the '
+                                 'flows.\n\t\t\t'
+                                 'Rules are sent after the whole capture is '
+                                 'read')
+        parser.add_argument("--flow-table",
+                            action="store_true",
+                            dest="flow_table",
+                            help='\t\t\t'
+                                 'Skip rule file and capture Adds for flows '
+                                 'still installed\n\t\t\t'
+                                 'and Removes for flows that are not')
+        # Live input
+        parser.add_argument("--stream",
+                            action="store",
+                            dest="stream",
+                            default=None,
+                            metavar='Source',
+                            help='\t\t\t'
+                                 'Send rules written one per line as command '
+                                 'line flags,\n\t\t\t'
+                                 '- for stdin')
+        parser.add_argument("--flush-delay",
+                            action="store",
+                            dest="flush_delay",
+                            type=float,
+                            default=1,
+                            metavar='Milliseconds',
+                            help='\t\t\t'
+                                 'Time a partial streamed message waits for '
+                                 'more rules\n\t\t\t'
+                                 '(Default: 1)')
+        parser.add_argument("--from-flows",
+                            action="store",
+                            dest="from_flows",
+                            default=None,
+                            metavar='Flow File',
+                            help='\t\t\t'
+                                 'Send every rule in a binary flow file, '
+                                 'see fcn_flowfile.py')
+        parser.add_argument("--metrics",
+                            action="store_true",
+                            dest="metrics",
+                            help='\t\t\t'
+                                 'Print the time spent in each stage of the '
+                                 'send pipeline\n\t\t\t'
+                                 'at exit')
+        parser.add_argument("--metrics-file",
+                            action="store",
+                            dest="metrics_file",
+                            default=None,
+                            metavar='Path',
+                            help='\t\t\t'
+                                 'Write Prometheus metrics to this textfile '
+                                 'every 10 seconds\n\t\t\t'
+                                 'and at exit')
+        parser.add_argument("--metrics-port",
+                            action="store",
+                            dest="metrics_port",
+                            type=int,
+                            default=None,
+                            metavar='Port',
+                            help='\t\t\t'
+                                 'Serve Prometheus metrics over HTTP on this '
+                                 'local port')
+        parser.add_argument("--from-ring",
+                            action="store",
+                            dest="from_ring",
+                            default=None,
+                            metavar='Ring File',
+                            help='\t\t\t'
+                                 'Send rules a co-located classifier writes '
+                                 'to a\n\t\t\t'
+                                 'shared-memory ring buffer')
+        parser.add_argument("--ring-size",
+                            action="store",
+                            dest="ring_size",
+                            type=int,
+                            default=DEFAULT_CAPACITY,
+                            metavar='Slots',
+                            help='\t\t\t'
+                                 'Slots of a ring that is created, a power '
+                                 'of two\n\t\t\t'
+                                 '(Default: %d)' % DEFAULT_CAPACITY)
         cli_inputs = parser.parse_args()
 
         return cli_inputs
@@ -637,6 +1694,27 @@ class FCN(object):
         else:
             return address
 
+    @staticmethod
+    def to_bytes(text):
+        """Converts a name to the byte string placed on the wire
+
+        Parameters
+        ----------
+        text:
+            The export or class name
+
+        Returns
+        -------
+            The name as bytes
+
+        """
+        if isinstance(text, bytes):
+            return text
+        try:
+            return text.encode('ascii')
+        except Exception:
+            raise NameError('Invalid Name')
+
     @staticmethod
     def convert_to_hexbyte(_input, _len):
         """Converts to hexbyte format
@@ -673,5 +1751,38 @@ class FCN(object):
             print('Error: Variable couldn\'t be converted')
         return _input
 
+
+def init_load_worker():
+    """Makes a load worker process ignore Ctrl-C, the parent stops the
+    workers
+
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def send_load_shard(args):
+    """Runs one load worker in a separate process
+
+    Parameters
+    ----------
+    args:
+        The command line inputs, the worker index and number of workers
+
+    Returns
+    -------
+        The LoadReport of the worker and its Metrics, None when metrics
+        are not asked for
+
+    """
+    inputs, shard, shards = args
+    # Instantiate FCN Modules without __init__
+    fake = FCN.__new__(FCN)
+    if FCN.metrics_enabled(inputs):
+        # Merged into the parent's metrics when the run ends
+        fake.metrics = Metrics()
+        fake.metrics.instrument(fake)
+
+    return fake.run_load_shard(inputs, shard, shards), fake.metrics
+
 if __name__ == '__main__':
     FCN()
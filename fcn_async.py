@@ -0,0 +1,311 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Async Sender
+- Send RAP messages to many Action Nodes concurrently
+
+Requires Python 3.7 or later. Each Action Node has its own connection, so
+a slow or unreachable node only delays the messages addressed to it
+
+Example
+-------
+    fake = FCNClient()
+    messages = [(fake.pack_message(rule), host, 5000, 'TCP')
+                for rule, host in rules]
+    for result in send_all(messages, limit=128):
+        if not result.ok:
+            print(result.host, result.error)
+
+"""
+import asyncio
+import collections
+import socket
+
+from fcn import FCN
+
+
+class SendResult(collections.namedtuple('SendResult',
+                                        'host port proto error')):
+    """Outcome of sending one RAP message
+
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the message was handed to the Action Node connection
+
+        """
+        return self.error is None
+
+
+class AsyncSender(object):
+    """Sends RAP messages over per Action Node asyncio connections with a
+    bound on the number of messages in flight
+
+    """
+
+    def __init__(self, limit=64, timeout=10, retry_after=None,
+                 session=False, template_interval=60):
+        """Initialise the sender
+
+        Parameters
+        ----------
+        limit:
+            Maximum number of messages in flight in send_many
+        timeout:
+            Connect and send timeout in seconds
+        retry_after:
+            Seconds to fail messages to a node straight away after it
+            could not be reached (Default: timeout)
+        session:
+            Send the template once per TCP connection, or every
+            template_interval seconds over UDP, ahead of data-only
+            messages
+        template_interval:
+            Seconds between UDP template messages in session mode
+
+        """
+        self.limit = limit
+        self.timeout = timeout
+        self.retry_after = timeout if retry_after is None else retry_after
+        self.template = FCN.pack_template_message if session else None
+        self.template_interval = template_interval
+        self.streams = {}
+        self.datagrams = {}
+        self.locks = {}
+        # Time each node last failed to connect
+        self.down = {}
+        # Time the template was last sent on each connection
+        self.template_times = {}
+
+    async def send(self, data, host, port, proto='UDP'):
+        """Sends a RAP message to an Action Node. Failures are reported in
+        the result rather than raised
+
+        Parameters
+        ----------
+        data:
+            The serialised message to be sent
+        host:
+            Action Node IP
+        port:
+            Output port to the Action Node
+        proto:
+            Protocol to the Action Node, TCP or UDP
+
+        Returns
+        -------
+            The SendResult
+
+        """
+        key = (host, port, proto.lower())
+        try:
+            if key[2] not in ['tcp', 'udp']:
+                raise NameError('Invalid Protocol')
+            # Keep messages to one node in order on its connection
+            lock = self.locks.get(key)
+            if lock is None:
+                lock = self.locks[key] = asyncio.Lock()
+            async with lock:
+                if key[2] == 'udp':
+                    await self.send_datagram(key, data)
+                else:
+                    await self.send_stream(key, data)
+        except NameError as error:
+            return SendResult(host, port, proto, str(error))
+
+        return SendResult(host, port, proto, None)
+
+    async def send_many(self, messages):
+        """Sends many RAP messages with at most limit in flight. Each node
+        has its own worker that sends the node's messages in order and
+        only takes a slot for the message it is sending, so a node that is
+        slow to connect holds one slot rather than all of them
+
+        Parameters
+        ----------
+        messages:
+            Iterable of (data, host, port, proto) tuples
+
+        Returns
+        -------
+            SendResults in the order of messages
+
+        """
+        semaphore = asyncio.Semaphore(self.limit)
+        results = []
+        # Node -> list of (index, message) addressed to it
+        queues = collections.OrderedDict()
+        for index, message in enumerate(messages):
+            results.append(None)
+            queues.setdefault(tuple(message[1:]), []).append((index,
+                                                              message))
+
+        async def worker(queue):
+            for index, message in queue:
+                async with semaphore:
+                    results[index] = await self.send(*message)
+
+        await asyncio.gather(*[worker(queue) for queue in queues.values()])
+
+        return results
+
+    async def send_stream(self, key, data):
+        """Writes a RAP message to the TCP connection of a node, opening
+        it if needed
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+        data:
+            The serialised message to be sent
+
+        """
+        loop = asyncio.get_running_loop()
+        stream = self.streams.get(key)
+        if stream is not None and (stream[0].at_eof() or
+                                   stream[1].is_closing()):
+            # The Action Node closed the connection since the last message
+            self.close_stream(key)
+            stream = None
+        if stream is None:
+            failed = self.down.get(key)
+            if failed is not None and loop.time() - failed < self.retry_after:
+                raise NameError('Error: Action Node unreachable')
+            try:
+                stream = await asyncio.wait_for(
+                    asyncio.open_connection(key[0], key[1]), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                self.down[key] = loop.time()
+                raise NameError('Error: Couldn\'t connect to socket')
+            self.down.pop(key, None)
+            sock = stream[1].get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.streams[key] = stream
+
+        writer = stream[1]
+        try:
+            if self.template is not None and key not in self.template_times:
+                writer.write(self.template(data))
+                self.template_times[key] = loop.time()
+            writer.write(data)
+            await asyncio.wait_for(writer.drain(), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.close_stream(key)
+            raise NameError('Error: Couldn\'t send to socket')
+
+    async def send_datagram(self, key, data):
+        """Sends a RAP message to a node over UDP
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+        data:
+            The serialised message to be sent
+
+        """
+        loop = asyncio.get_running_loop()
+        transport = self.datagrams.get(key)
+        if transport is None or transport.is_closing():
+            try:
+                transport = (await loop.create_datagram_endpoint(
+                    asyncio.DatagramProtocol,
+                    remote_addr=(key[0], key[1])))[0]
+            except OSError:
+                raise NameError('Error: Couldn\'t open socket')
+            self.datagrams[key] = transport
+            self.template_times.pop(key, None)
+
+        if self.template is not None:
+            sent = self.template_times.get(key)
+            if sent is None or loop.time() - sent >= self.template_interval:
+                transport.sendto(self.template(data))
+                self.template_times[key] = loop.time()
+        transport.sendto(data)
+
+    def close_stream(self, key):
+        """Closes the TCP connection of a node
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        """
+        stream = self.streams.pop(key, None)
+        self.template_times.pop(key, None)
+        if stream is not None:
+            stream[1].close()
+
+    async def close(self):
+        """Closes every connection
+
+        """
+        writers = [stream[1] for stream in self.streams.values()]
+        for key in list(self.streams):
+            self.close_stream(key)
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        for transport in self.datagrams.values():
+            transport.close()
+        self.datagrams = {}
+        self.template_times = {}
+
+
+def send_all(messages, **kwargs):
+    """Sends many RAP messages from synchronous code
+
+    Parameters
+    ----------
+    messages:
+        Iterable of (data, host, port, proto) tuples
+    kwargs:
+        AsyncSender options
+
+    Returns
+    -------
+        SendResults in the order of messages
+
+    """
+    async def run():
+        sender = AsyncSender(**kwargs)
+        try:
+            return await sender.send_many(messages)
+        finally:
+            await sender.close()
+
+    return asyncio.run(run())
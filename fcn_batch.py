@@ -0,0 +1,122 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Batching
+- Pack many flow rules into one RAP message
+
+"""
+# Header (16 bytes), template record (40 bytes) and data set header
+# (4 bytes) in front of the data records of every message
+MESSAGE_OVERHEAD = 60
+# Header (12 bytes) and data set header (4 bytes) of a data-only message
+DATA_MESSAGE_OVERHEAD = 16
+# Largest RAP message that fits a 1500 byte Ethernet MTU over UDP
+DEFAULT_MSG_SIZE = 1472
+# Largest RAP message the 16 bit message length can describe
+MAX_MSG_SIZE = 65535
+
+
+class RecordBatcher(object):
+    """Collects data records and sends them under one header and template
+    once the next record would push the message over the size limit
+
+    """
+
+    def __init__(self, encoder, send, msg_size=DEFAULT_MSG_SIZE,
+                 session=False):
+        """Initialise the batcher
+
+        Parameters
+        ----------
+        encoder:
+            The FCN instance used to pack records and messages
+        send:
+            Called with each finished RAP message
+        msg_size:
+            Maximum RAP message size in bytes. A record that does not fit
+            on its own is still sent in a message by itself
+        session:
+            Build data-only messages without the template
+
+        """
+        if session:
+            self.overhead = DATA_MESSAGE_OVERHEAD
+            self.pack = encoder.pack_data_batch
+        else:
+            self.overhead = MESSAGE_OVERHEAD
+            self.pack = encoder.pack_batch
+        if not self.overhead < msg_size <= MAX_MSG_SIZE:
+            raise NameError('Error: Message size must be between %d and %d'
+                            % (self.overhead + 1, MAX_MSG_SIZE))
+        self.encoder = encoder
+        self.send = send
+        self.msg_size = msg_size
+        self.first = None
+        self.payloads = []
+        self.size = self.overhead
+        self.messages = 0
+
+    def add(self, rule):
+        """Encodes a rule and adds it to the current message
+
+        Parameters
+        ----------
+        rule:
+            The flow rule or any object with the FCN input attributes
+
+        """
+        payload = self.encoder.pack_msg_payload(cli_inputs=rule)
+        if self.payloads and self.size + len(payload) > self.msg_size:
+            self.flush()
+        if not self.payloads:
+            # The message takes the sequence number of its first rule
+            self.first = rule
+        self.payloads.append(payload)
+        self.size += len(payload)
+
+    def flush(self):
+        """Sends the current message if it holds any records
+
+        Returns
+        -------
+            The number of records sent
+
+        """
+        if not self.payloads:
+            return 0
+        data = self.pack(self.first, self.payloads)
+        count = len(self.payloads)
+        self.first = None
+        self.payloads = []
+        self.size = self.overhead
+        self.send(data)
+        self.messages += 1
+
+        return count
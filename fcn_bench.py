@@ -0,0 +1,494 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Benchmarks
+Measures the encode, template, validation and send hot paths and saves the
+results as JSON so versions can be compared
+
+Parameters
+----------
+    -h, --help                      Help
+    -k, --filter                    Only run benchmarks whose name contains
+                                    this text
+    -t, --min-time                  Seconds to run each benchmark for
+                                    (Default: 1)
+    -o, --output                    Write the results to a JSON file
+    -b, --baseline                  Compare against an earlier JSON file
+
+Example
+-------
+    $ python ./fcn_bench.py -o before.json
+    $ python ./fcn_bench.py -o after.json -b before.json
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+from fcn import FCN
+from fcn_client import FCNClient
+from fcn_client import FlowRule
+from fcn_sink import RAPSink
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has no allocation tracing
+    tracemalloc = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Percentiles reported for the per operation latency
+PERCENTILES = [50, 90, 99]
+
+
+class Benchmark(object):
+    """A named operation to be timed
+
+    """
+
+    def __init__(self, name, func, inner=1, setup=None, teardown=None,
+                 pause=None):
+        """Initialise the benchmark
+
+        Parameters
+        ----------
+        name:
+            Name of the benchmark, group.case
+        func:
+            Runs one operation
+        inner:
+            Operations timed together per latency sample, keeps the timer
+            overhead out of sub-microsecond operations
+        setup:
+            Called before the benchmark runs
+        teardown:
+            Called after the benchmark runs
+        pause:
+            Called with True before the allocations are measured and with
+            False after, stops background threads being counted
+
+        """
+        self.name = name
+        self.func = func
+        self.inner = inner
+        self.setup = setup
+        self.teardown = teardown
+        self.pause = pause
+
+
+def percentile(samples, pct):
+    """Nearest rank percentile
+
+    Parameters
+    ----------
+    samples:
+        Sorted list of samples
+    pct:
+        Percentile between 0 and 100
+
+    Returns
+    -------
+        The sample at the percentile
+
+    """
+    index = int(round(pct / 100.0 * (len(samples) - 1)))
+    return samples[index]
+
+
+def measure_allocations(func, ops=200):
+    """Measures the memory allocated by an operation
+
+    Parameters
+    ----------
+    func:
+        Runs one operation
+    ops:
+        Number of operations to average the retained memory over
+
+    Returns
+    -------
+        Dict of peak_bytes, the most memory in use at once during an
+        operation, and retained_bytes, the memory still held after each
+        operation. Both are None without tracemalloc
+
+    """
+    if tracemalloc is None:
+        return {'peak_bytes': None, 'retained_bytes': None}
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        # Warm caches so they are not counted against the operation
+        func()
+        tracemalloc.clear_traces()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(ops):
+            func()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        if not started:
+            tracemalloc.stop()
+
+    return {'peak_bytes': peak,
+            'retained_bytes': round(float(retained) / ops, 1)}
+
+
+def run_benchmark(bench, min_time=1.0):
+    """Runs a benchmark for at least min_time seconds
+
+    Parameters
+    ----------
+    bench:
+        The benchmark
+    min_time:
+        Seconds to run for
+
+    Returns
+    -------
+        Dict of ops, ops_per_sec, latency percentiles in microseconds and
+        the allocations per operation
+
+    """
+    if bench.setup is not None:
+        bench.setup()
+    try:
+        func = bench.func
+        inner = range(bench.inner)
+        samples = []
+        start = timer()
+        end = start + min_time
+        now = start
+        while now < end or len(samples) < 10:
+            for _ in inner:
+                func()
+            then, now = now, timer()
+            samples.append((now - then) / bench.inner)
+        elapsed = now - start
+        if bench.pause is not None:
+            bench.pause(True)
+        result = measure_allocations(func)
+        if bench.pause is not None:
+            bench.pause(False)
+    finally:
+        if bench.teardown is not None:
+            bench.teardown()
+    ops = len(samples) * bench.inner
+    samples.sort()
+    result.update({
+        'ops': ops,
+        'ops_per_sec': round(ops / elapsed, 1),
+        'mean_us': round(elapsed / ops * 1e6, 3),
+        'max_us': round(samples[-1] * 1e6, 3)})
+    for pct in PERCENTILES:
+        result['p%d_us' % pct] = round(percentile(samples, pct) * 1e6, 3)
+
+    return result
+
+
+class LoopbackSink(object):
+    """RAP sink served from a background thread for the send benchmarks
+
+    """
+
+    def __init__(self):
+        self.sink = None
+        self.thread = None
+        self.running = False
+        self.paused = False
+
+    def start(self):
+        self.sink = RAPSink(port=0)
+        self.running = True
+        self.paused = False
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while self.running:
+            if self.paused:
+                # Messages queue in the socket buffers meanwhile
+                time.sleep(0.001)
+            else:
+                self.sink.poll(0.05)
+
+    def pause(self, paused):
+        self.paused = paused
+        # Let a poll in progress finish
+        time.sleep(0.06 if paused else 0)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.sink.close()
+
+
+def send_benchmark(name, proto, loopback):
+    """Creates an end-to-end send benchmark, each operation encodes one rule
+    and sends it to the loopback sink
+
+    Parameters
+    ----------
+    name:
+        Name of the benchmark
+    proto:
+        TCP or UDP
+    loopback:
+        The LoopbackSink
+
+    Returns
+    -------
+        The benchmark
+
+    """
+    state = {}
+    rule = FlowRule(srcip='10.0.0.1', destip='10.0.0.2', srcport=80,
+                    destport=5000, prototype=6)
+
+    def setup():
+        loopback.start()
+        state['client'] = FCNClient(port=loopback.sink.port, proto=proto)
+
+    def teardown():
+        state.pop('client').close()
+        loopback.stop()
+
+    def send():
+        state['client'].send_rule(rule)
+
+    return Benchmark(name, send, setup=setup, teardown=teardown,
+                     pause=loopback.pause)
+
+
+def benchmarks():
+    """Creates every benchmark
+
+    Returns
+    -------
+        List of benchmarks
+
+    """
+    fcn = FCN.__new__(FCN)
+    rule = FlowRule(srcip='10.0.0.1', destip='10.0.0.2', srcport=80,
+                    destport=5000, prototype=6)
+    payloads = [fcn.pack_msg_payload(rule)] * 20
+    payload_len = len(payloads[0])
+
+    def uncached_template():
+        FCN.template_cache.clear()
+        fcn.pack_template(payload_len)
+
+    loopback = LoopbackSink()
+
+    benches = [
+        Benchmark('encode.message', lambda: fcn.pack_message(rule), 100),
+        Benchmark('encode.payload', lambda: fcn.pack_msg_payload(rule), 100),
+        Benchmark('encode.batch_20', lambda: fcn.pack_batch(rule, payloads),
+                  100),
+        Benchmark('template.cached', lambda: fcn.pack_template(payload_len),
+                  1000),
+        Benchmark('template.uncached', uncached_template, 100),
+        Benchmark('validate.ip_check', lambda: FCN.ip_check('10.0.0.1'),
+                  1000),
+        Benchmark('validate.port_check', lambda: FCN.port_check(5000), 1000),
+        Benchmark('validate.priority_check', lambda: FCN.priority_check(20),
+                  1000),
+        Benchmark('validate.prototype_check',
+                  lambda: FCN.prototype_check(6), 1000),
+        Benchmark('validate.msg_type_check', lambda: FCN.msg_type_check(0),
+                  1000),
+        Benchmark('validate.export_name_check',
+                  lambda: FCN.export_name_check('myexp'), 1000),
+        Benchmark('validate.protocol_check',
+                  lambda: FCN.protocol_check('TCP'), 1000),
+        send_benchmark('send.udp', 'UDP', loopback),
+        send_benchmark('send.tcp', 'TCP', loopback),
+    ]
+    if sys.version_info[0] == 2:
+        # The hex string encoder only runs on Python 2
+        benches += [
+            Benchmark('encode.legacy_payload',
+                      lambda: fcn.create_msg_payload(rule), 10),
+            Benchmark('template.legacy',
+                      lambda: fcn.create_template(payload_len), 10)]
+
+    return benches
+
+
+def git_revision():
+    """Returns the git revision of the tree being benchmarked, or None
+
+    """
+    try:
+        out = subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            stderr=subprocess.STDOUT)
+    except Exception:
+        return None
+    return out.decode('ascii', 'replace').strip()
+
+
+def run_suite(name_filter='', min_time=1.0, out=None):
+    """Runs the benchmarks
+
+    Parameters
+    ----------
+    name_filter:
+        Only run benchmarks whose name contains this text
+    min_time:
+        Seconds to run each benchmark for
+    out:
+        Called with a line for each finished benchmark
+
+    Returns
+    -------
+        Dict of the environment and the results keyed by benchmark name
+
+    """
+    results = {}
+    for bench in benchmarks():
+        if name_filter not in bench.name:
+            continue
+        results[bench.name] = run_benchmark(bench, min_time)
+        if out is not None:
+            out(format_result(bench.name, results[bench.name]))
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'min_time': min_time,
+        'results': results}
+
+
+def format_result(name, result):
+    """Formats a benchmark result as a table row
+
+    """
+    peak = result['peak_bytes']
+    return '%-28s %12.0f ops/s  p50 %9.2f us  p99 %9.2f us  peak %s' % (
+        name, result['ops_per_sec'], result['p50_us'], result['p99_us'],
+        '-' if peak is None else '%d B' % peak)
+
+
+def compare(report, baseline):
+    """Compares the results against a baseline run
+
+    Parameters
+    ----------
+    report:
+        The results of run_suite
+    baseline:
+        Earlier results of run_suite
+
+    Returns
+    -------
+        List of lines, one per benchmark in both runs, with the change in
+        ops/sec and p50 latency
+
+    """
+    lines = ['Compared with %s (%s)' % (baseline.get('revision'),
+                                        baseline.get('time'))]
+    for name in sorted(report['results']):
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        new = report['results'][name]
+        lines.append('%-28s ops/s %+7.1f%%  p50 %+7.1f%%' % (
+            name,
+            (new['ops_per_sec'] / old['ops_per_sec'] - 1) * 100,
+            (new['p50_us'] / max(old['p50_us'], 1e-9) - 1) * 100))
+
+    return lines
+
+
+def parser():
+    """Command Line Interface for the benchmarks
+
+    Returns
+    -------
+    cli_inputs:
+        The command line interface inputs
+
+    """
+    parser = argparse.ArgumentParser(
+        description='FCN Benchmarks\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-k", "--filter",
+                        action="store",
+                        dest="name_filter",
+                        default='',
+                        metavar='Text',
+                        help='\t\t\tOnly run benchmarks whose name contains '
+                             'this text')
+    parser.add_argument("-t", "--min-time",
+                        action="store",
+                        dest="min_time",
+                        type=float,
+                        default=1,
+                        metavar='Seconds',
+                        help='\t\t\tSeconds to run each benchmark for '
+                             '(Default: 1)')
+    parser.add_argument("-o", "--output",
+                        action="store",
+                        dest="output",
+                        default=None,
+                        metavar='File',
+                        help='\t\t\tWrite the results to a JSON file')
+    parser.add_argument("-b", "--baseline",
+                        action="store",
+                        dest="baseline",
+                        default=None,
+                        metavar='File',
+                        help='\t\t\tCompare against an earlier JSON file')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    INPUTS = parser()
+    REPORT = run_suite(INPUTS.name_filter, INPUTS.min_time, out=print)
+    if INPUTS.output:
+        with open(INPUTS.output, 'w') as output:
+            json.dump(REPORT, output, indent=2, sort_keys=True)
+    if INPUTS.baseline:
+        with open(INPUTS.baseline) as baseline:
+            for LINE in compare(REPORT, json.load(baseline)):
+                print(LINE)
@@ -0,0 +1,383 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Client
+- Send FCN Messages from Python without the Command Line Interface
+
+Example
+-------
+    with FCNClient(host='192.168.1.2', port=5000, proto='TCP') as client:
+        client.add(srcip='10.0.0.1', destip='10.0.0.2', srcport=80,
+                   destport=5000, prototype=6, mclass='myclass', prio=20)
+        client.remove_all()
+
+"""
+from fcn import FCN
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_batch import RecordBatcher
+from fcn_flowtable import FlowTable
+from fcn_refresh import RefreshScheduler
+from fcn_rule import MSG_ADD
+from fcn_rule import MSG_REMOVE
+from fcn_rule import MSG_REMOVE_ALL
+from fcn_rule import FlowRule
+from fcn_transport import Transport
+
+
+class FCNClient(FCN):
+    """Fake Classifier Node Client
+    Long-lived connection to an Action Node. Each call only encodes and
+    sends, nothing is read from the command line
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=5000, proto='UDP',
+                 export='myexp', a_flg=1, seq_no=20,
+                 msg_size=DEFAULT_MSG_SIZE, session=False,
+                 template_interval=60, flow_table=False, refresh=None,
+                 metrics=None):
+        """Initialise FCN Client
+
+        Parameters
+        ----------
+        host:
+            Action Node IP
+        port:
+            Output port to the Action Node
+        proto:
+            Protocol to the Action Node, TCP or UDP
+        export:
+            Name of export
+        a_flg:
+            Action flag
+        seq_no:
+            Sequence number of the first message
+        msg_size:
+            Maximum RAP message size in bytes used by send_rules
+        session:
+            Send the template once per TCP connection, or every
+            template_interval seconds over UDP, and data-only messages
+            after it
+        template_interval:
+            Seconds between UDP template messages in session mode
+        flow_table:
+            Track installed flows and skip Adds for flows that are still
+            installed and Removes for flows that are not. True for a
+            FlowTable with no size limit, or a FlowTable
+        refresh:
+            Re-send Adds this many seconds before their timeout when
+            refresh_due is called, None to let rules expire
+        metrics:
+            Metrics that time each stage of encoding and sending, None to
+            record nothing
+
+        """
+        self.HOST = host
+        self.PORT = self.port_check(port)
+        self.PROTO = self.protocol_check(proto)
+        self.export = self.export_name_check(export)
+        self.a_flg = a_flg
+        self.seq_no = seq_no
+        self.msg_size = msg_size
+        self.session = session
+        self.transport = Transport(template_interval=template_interval,
+                                   metrics=metrics)
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+        if flow_table is True:
+            flow_table = FlowTable()
+        elif flow_table is False:
+            flow_table = None
+        self.flow_table = flow_table
+        self.refresher = None
+        if refresh is not None:
+            self.refresher = RefreshScheduler(self.send_refreshes,
+                                              lead=refresh)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0, destport=0,
+            prototype=0, mclass='myclass', prio=1, timeoutval=60):
+        """Sends an Add message for a flow
+
+        Returns
+        -------
+            The sequence number of the message, None if the flow table
+            suppressed it
+
+        """
+        return self.send_flow(self.create_rule(
+            MSG_ADD, srcip, destip, srcport, destport, prototype, mclass,
+            prio, timeoutval))
+
+    def remove(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0,
+               destport=0, prototype=0, mclass='myclass', prio=1,
+               timeoutval=60):
+        """Sends a Remove message for a flow
+
+        Returns
+        -------
+            The sequence number of the message, None if the flow table
+            suppressed it
+
+        """
+        return self.send_flow(self.create_rule(
+            MSG_REMOVE, srcip, destip, srcport, destport, prototype, mclass,
+            prio, timeoutval))
+
+    def remove_all(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0,
+                   destport=0, prototype=0, mclass='myclass', prio=1,
+                   timeoutval=60):
+        """Sends a Remove All message
+
+        Returns
+        -------
+            The sequence number of the message, None if the flow table
+            suppressed it
+
+        """
+        return self.send_flow(self.create_rule(
+            MSG_REMOVE_ALL, srcip, destip, srcport, destport, prototype,
+            mclass, prio, timeoutval))
+
+    def create_rule(self, msgtype, srcip, destip, srcport, destport,
+                    prototype, mclass, prio, timeoutval):
+        """Creates a flow rule with the next sequence number
+
+        Returns
+        -------
+        rule:
+            The flow rule
+
+        """
+        rule = FlowRule(srcip=srcip, destip=destip, srcport=srcport,
+                        destport=destport, prototype=prototype,
+                        msgtype=msgtype, mclass=mclass, prio=prio,
+                        timeoutval=timeoutval, export=self.export,
+                        a_flg=self.a_flg, seq_no=self.seq_no)
+        self.seq_no = (self.seq_no + 1) & 0xffffffff
+
+        return rule
+
+    def send_flow(self, rule):
+        """Sends a rule made by create_rule unless the flow table shows
+        it is redundant. The sequence number is reused if the rule is
+        suppressed or can't be sent
+
+        Parameters
+        ----------
+        rule:
+            The flow rule
+
+        Returns
+        -------
+            The sequence number of the message, None if it was suppressed
+
+        """
+        try:
+            if (self.flow_table is not None and
+                    not self.flow_table.admit(rule)):
+                self.seq_no = rule.seq_no
+                return None
+            self.send_rule(rule)
+        except NameError:
+            # Nothing was sent, the sequence number is reused
+            self.seq_no = rule.seq_no
+            if self.flow_table is not None:
+                self.flow_table.discard(rule)
+            raise
+        self.track_rule(rule)
+
+        return rule.seq_no
+
+    def send_rule(self, rule):
+        """Encodes and sends a single rule
+
+        Parameters
+        ----------
+        rule:
+            The flow rule or any object with the FCN input attributes
+
+        Returns
+        -------
+            The sequence number of the message
+
+        """
+        if self.session:
+            data = self.pack_data_batch(
+                rule, [self.pack_msg_payload(cli_inputs=rule)])
+        else:
+            data = self.pack_message(cli_inputs=rule)
+        self.send_data(data)
+
+        return rule.seq_no
+
+    def send_rules(self, rules):
+        """Encodes many rules and sends them packed into as few messages
+        as msg_size allows
+
+        Parameters
+        ----------
+        rules:
+            Iterable of flow rules, see create_rule. Rules the flow table
+            suppresses are skipped and keep their sequence numbers
+
+        Returns
+        -------
+            The number of messages sent
+
+        """
+        batcher = RecordBatcher(self, self.send_data, self.msg_size,
+                                session=self.session)
+        flow_table = self.flow_table
+        for rule in rules:
+            if flow_table is not None and not flow_table.admit(rule):
+                continue
+            batcher.add(rule)
+            self.track_rule(rule)
+        batcher.flush()
+
+        return batcher.messages
+
+    def send_rule_array(self, rules):
+        """Sends a RuleArray packed into as few messages as msg_size
+        allows, numbered on from the client's sequence number. The flow
+        table and refresh schedule are not consulted
+
+        Parameters
+        ----------
+        rules:
+            The RuleArray
+
+        Returns
+        -------
+            The number of messages sent
+
+        """
+        if self.metrics is not None:
+            # Timed for this send only, the array belongs to the caller
+            self.metrics.instrument_records(rules)
+        messages = 0
+        try:
+            for data in rules.messages(self, self.seq_no, self.msg_size,
+                                       self.session):
+                self.send_data(data)
+                messages += 1
+        finally:
+            if self.metrics is not None:
+                del rules.records
+        self.seq_no = (self.seq_no + len(rules)) & 0xffffffff
+
+        return messages
+
+    def track_rule(self, rule):
+        """Updates the refresh schedule for a rule that was sent
+
+        Parameters
+        ----------
+        rule:
+            The flow rule
+
+        """
+        if self.refresher is None:
+            return
+        if rule.msgtype == MSG_ADD:
+            self.refresher.track(rule)
+        elif rule.msgtype == MSG_REMOVE:
+            self.refresher.forget(rule)
+        else:
+            self.refresher.clear()
+
+    def refresh_due(self, now=None):
+        """Re-sends the Adds that are close to timing out, call at least
+        once a second
+
+        Parameters
+        ----------
+        now:
+            The current time (Default: time.time())
+
+        Returns
+        -------
+            The number of rules refreshed
+
+        """
+        if self.refresher is None:
+            return 0
+        return self.refresher.poll(now)
+
+    def send_refreshes(self, rules):
+        """Sends Adds due for refresh packed into as few messages as
+        msg_size allows, each with a new sequence number
+
+        Parameters
+        ----------
+        rules:
+            List of flow rules
+
+        """
+        batcher = RecordBatcher(self, self.send_data, self.msg_size,
+                                session=self.session)
+        for rule in rules:
+            rule.seq_no = self.seq_no
+            self.seq_no = (self.seq_no + 1) & 0xffffffff
+            if self.flow_table is not None:
+                # Restart the flow's timeout
+                self.flow_table.discard(rule)
+                self.flow_table.admit(rule)
+            batcher.add(rule)
+        batcher.flush()
+
+    def send_data(self, data):
+        """Sends an encoded RAP message to the Action Node over the pooled
+        connection
+
+        Parameters
+        ----------
+        data:
+            The serialised message to be sent
+
+        """
+        template = None
+        if self.session:
+            template = self.pack_template_message
+        self.transport.send(data, self.HOST, self.PORT, self.PROTO,
+                            template=template)
+
+    def close(self):
+        """Closes the connection to the Action Node
+
+        """
+        self.transport.close()
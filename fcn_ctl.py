@@ -0,0 +1,373 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Control Client
+Thin client that forwards rules to a running FCN daemon over its UNIX
+socket. Only the standard library socket code is loaded, so it starts and
+sends faster than fcn.py
+
+Parameters
+----------
+    -h, --help                      Help
+    -U, --socket                    Daemon socket (Default: /tmp/fcn.sock)
+    -i, --srcip                     The Source IP address in x.x.x.x format
+    -j, --destip                    Destination IP address in x.x.x.x format
+    -k, --srcport                   Source port 1-65535
+    -l, --destport                  Destination port 1-65535
+    -u, --prototype                 Protocol Type
+    -a, --mtype                     Message Type, 0: Add (Default), 1: Remove,
+                                    2: Remove All
+    -t, --timeoutval                Timeout value in seconds (Default: 60)
+    -c, --class                     Name of class (Default: myclass)
+    -n, --prio                      Table Priority (Default: 1)
+    --no-reply                      Don't wait for the daemon's reply
+
+Example
+-------
+    with DaemonClient('/tmp/fcn.sock') as client:
+        seq_no = client.add(srcip='10.0.0.1', destip='10.0.0.2', srcport=80,
+                            destport=5000, prototype=6, mclass='web')
+
+"""
+from __future__ import print_function
+
+import argparse
+import socket
+import struct
+import sys
+
+DEFAULT_SOCKET = '/tmp/fcn.sock'
+
+# Request: message type, srcip, destip, srcport, destport, prototype, prio,
+# timeoutval, class name length, followed by the class name
+REQUEST_STRUCT = struct.Struct('!B4s4sHHBBHB')
+# Set in the message type byte when no reply is wanted
+NO_REPLY = 0x80
+
+# Reply: status, sequence number, error length, followed by the error
+REPLY_STRUCT = struct.Struct('!BIB')
+STATUS_SENT = 0
+STATUS_SUPPRESSED = 1
+STATUS_ERROR = 2
+
+
+def pack_request(msgtype, srcip, destip, srcport, destport, prototype,
+                 mclass, prio, timeoutval, reply=True):
+    """Serialises a rule request
+
+    Returns
+    -------
+        The request as bytes
+
+    """
+    if not 0 <= msgtype < NO_REPLY:
+        raise NameError('Invalid Msg Type')
+    if not isinstance(mclass, bytes):
+        try:
+            mclass = mclass.encode('ascii')
+        except Exception:
+            raise NameError('Invalid Name')
+    try:
+        return REQUEST_STRUCT.pack(
+            msgtype | (0 if reply else NO_REPLY),
+            socket.inet_pton(socket.AF_INET, srcip),
+            socket.inet_pton(socket.AF_INET, destip),
+            srcport, destport, prototype, prio, timeoutval,
+            len(mclass)) + mclass
+    except (socket.error, TypeError):
+        raise NameError('Invalid IP')
+    except struct.error:
+        raise NameError('Error: Message field out of range')
+
+
+def unpack_requests(buf):
+    """Reads the complete requests at the start of a buffer
+
+    Parameters
+    ----------
+    buf:
+        Bytes received from a client
+
+    Returns
+    -------
+        (list of (reply wanted, msgtype, srcip, destip, srcport, destport,
+        prototype, mclass, prio, timeoutval), bytes used)
+
+    """
+    requests = []
+    offset = 0
+    size = REQUEST_STRUCT.size
+    while len(buf) - offset >= size:
+        (msgtype, srcip, destip, srcport, destport, prototype, prio,
+         timeoutval, class_len) = REQUEST_STRUCT.unpack_from(buf, offset)
+        end = offset + size + class_len
+        if len(buf) < end:
+            break
+        mclass = bytes(buf[offset + size:end]).decode('latin-1')
+        requests.append((not msgtype & NO_REPLY, msgtype & ~NO_REPLY,
+                         socket.inet_ntoa(srcip), socket.inet_ntoa(destip),
+                         srcport, destport, prototype, mclass, prio,
+                         timeoutval))
+        offset = end
+
+    return requests, offset
+
+
+def pack_reply(status, seq_no=0, error=''):
+    """Serialises a reply
+
+    Returns
+    -------
+        The reply as bytes
+
+    """
+    error = error.encode('ascii', 'replace')[:255]
+    return REPLY_STRUCT.pack(status, seq_no & 0xffffffff, len(error)) + error
+
+
+class DaemonClient(object):
+    """Connection to an FCN daemon
+
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=5):
+        """Connect to the daemon
+
+        Parameters
+        ----------
+        path:
+            The daemon's UNIX socket
+        timeout:
+            Seconds to wait for the daemon
+
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except socket.error:
+            self.sock.close()
+            raise NameError('Error: Couldn\'t connect to the FCN daemon at '
+                            '%s' % path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0, destport=0,
+            prototype=0, mclass='myclass', prio=1, timeoutval=60,
+            reply=True):
+        """Sends an Add message for a flow through the daemon
+
+        Returns
+        -------
+            The sequence number of the message, None if the daemon's flow
+            table suppressed it or no reply was wanted
+
+        """
+        return self.send(0, srcip, destip, srcport, destport, prototype,
+                         mclass, prio, timeoutval, reply)
+
+    def remove(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0,
+               destport=0, prototype=0, mclass='myclass', prio=1,
+               timeoutval=60, reply=True):
+        """Sends a Remove message for a flow through the daemon
+
+        Returns
+        -------
+            The sequence number of the message, None if the daemon's flow
+            table suppressed it or no reply was wanted
+
+        """
+        return self.send(1, srcip, destip, srcport, destport, prototype,
+                         mclass, prio, timeoutval, reply)
+
+    def remove_all(self, mclass='myclass', reply=True):
+        """Sends a Remove All message through the daemon
+
+        Returns
+        -------
+            The sequence number of the message, None if no reply was wanted
+
+        """
+        return self.send(2, '0.0.0.0', '0.0.0.0', 0, 0, 0, mclass, 1, 60,
+                         reply)
+
+    def send(self, msgtype, srcip, destip, srcport, destport, prototype,
+             mclass, prio, timeoutval, reply=True):
+        """Sends a rule request and waits for the reply
+
+        Returns
+        -------
+            The sequence number of the message, None if the daemon's flow
+            table suppressed it or no reply was wanted
+
+        """
+        request = pack_request(msgtype, srcip, destip, srcport, destport,
+                               prototype, mclass, prio, timeoutval, reply)
+        try:
+            self.sock.sendall(request)
+            if not reply:
+                return None
+            status, seq_no, error_len = REPLY_STRUCT.unpack(
+                self.recv_exact(REPLY_STRUCT.size))
+            error = self.recv_exact(error_len).decode('ascii')
+        except (socket.error, socket.timeout):
+            raise NameError('Error: Lost connection to the FCN daemon')
+        if status == STATUS_ERROR:
+            raise NameError(error)
+        if status == STATUS_SUPPRESSED:
+            return None
+        return seq_no
+
+    def recv_exact(self, size):
+        """Receives exactly size bytes
+
+        """
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise socket.error('Connection closed')
+            data += chunk
+        return data
+
+    def close(self):
+        """Closes the connection to the daemon
+
+        """
+        self.sock.close()
+
+
+def parser():
+    """Command Line Interface for the control client
+
+    Returns
+    -------
+    cli_inputs:
+        The command line interface inputs
+
+    """
+    parser = argparse.ArgumentParser(
+        description='FCN Daemon Control Client\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-U", "--socket",
+                        action="store",
+                        dest="socket",
+                        default=DEFAULT_SOCKET,
+                        metavar='Path',
+                        help='\t\t\tDaemon socket (Default: %s)'
+                             % DEFAULT_SOCKET)
+    parser.add_argument("-i", "--srcip",
+                        action="store",
+                        dest="srcip",
+                        default='0.0.0.0',
+                        metavar='Source IP',
+                        help='\t\t\tSource IP address in x.x.x.x format')
+    parser.add_argument("-j", "--destip",
+                        action="store",
+                        dest="destip",
+                        default='0.0.0.0',
+                        metavar='Destination IP',
+                        help='\t\t\tDestination IP address in x.x.x.x format')
+    parser.add_argument("-k", "--srcport",
+                        action="store",
+                        dest="srcport",
+                        type=int,
+                        default=0,
+                        metavar='Source port',
+                        help='\t\t\tSource port 1-65535')
+    parser.add_argument("-l", "--destport",
+                        action="store",
+                        dest="destport",
+                        type=int,
+                        default=0,
+                        metavar='Destination port',
+                        help='\t\t\tDestination port 1-65535')
+    parser.add_argument("-u", "--prototype",
+                        action="store",
+                        dest="prototype",
+                        type=int,
+                        default=0,
+                        metavar='Protocol Type',
+                        help='\t\t\tProtocol Type')
+    parser.add_argument("-a", "--mtype",
+                        action="store",
+                        dest="msgtype",
+                        type=int,
+                        default=0,
+                        metavar='Msg Type',
+                        help='\t\t\t0: Add (Default)\n\t\t\t1: Remove\n\t\t\t'
+                             '2: Remove All\n')
+    parser.add_argument("-t", "--timeoutval",
+                        action="store",
+                        dest="timeoutval",
+                        type=int,
+                        default=60,
+                        metavar='Timeout Value',
+                        help='\t\t\tTimeout value in seconds (Default: 60)')
+    parser.add_argument("-c", "--class",
+                        action="store",
+                        dest="mclass",
+                        default='myclass',
+                        metavar='Class',
+                        help='\t\t\tName of class (Default: myclass)')
+    parser.add_argument("-n", "--prio",
+                        action="store",
+                        dest="prio",
+                        type=int,
+                        default=1,
+                        metavar='Priority',
+                        help='\t\t\tClass Priority (Default: 1)')
+    parser.add_argument("--no-reply",
+                        action="store_false",
+                        dest="reply",
+                        help='\t\t\tDon\'t wait for the daemon\'s reply')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    INPUTS = parser()
+    try:
+        with DaemonClient(INPUTS.socket) as CLIENT:
+            SEQ_NO = CLIENT.send(INPUTS.msgtype, INPUTS.srcip, INPUTS.destip,
+                                 INPUTS.srcport, INPUTS.destport,
+                                 INPUTS.prototype, INPUTS.mclass, INPUTS.prio,
+                                 INPUTS.timeoutval, INPUTS.reply)
+    except NameError as error:
+        sys.exit(str(error))
+    if INPUTS.reply:
+        if SEQ_NO is None:
+            print('Suppressed, the flow table shows it is redundant')
+        else:
+            print('Sent with sequence number %d' % SEQ_NO)
@@ -0,0 +1,463 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Daemon
+Long-running FCN that keeps its encoder, template cache and Action Node
+connection open and takes rule requests from local clients over a UNIX
+socket, see fcn_ctl.py
+
+Parameters
+----------
+    -h, --help                      Help
+    -U, --socket                    Socket to listen on
+                                    (Default: /tmp/fcn.sock)
+    -x, --host                      Action Node IP (Default: 127.0.0.1)
+    -y, --port                      Output Port to Action Node (Default: 5000)
+    -z, --proto                     Protocol to Action Node (Default: UDP)
+    -s, --seqno                     Sequence number of the first message
+                                    (Default: 20)
+    -e, --export                    Name of export (Default: myexp)
+    -S, --session                   Send the template once per connection
+    --template-interval             Seconds between UDP templates in session
+                                    mode (Default: 60)
+    --flow-table                    Skip Adds for flows still installed and
+                                    Removes for flows that are not
+    --refresh                       Re-send Adds this many seconds before
+                                    they time out
+    -m, --msg-size                  Largest message for batched refreshes
+                                    (Default: 1472)
+    --metrics-file                  Write Prometheus metrics to this
+                                    textfile every 10 seconds
+    --metrics-port                  Serve Prometheus metrics over HTTP on
+                                    this local port
+"""
+from __future__ import print_function
+
+import argparse
+import errno
+import os
+import select
+import signal
+import socket
+import stat
+import sys
+import time
+
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_client import FCNClient
+from fcn_ctl import DEFAULT_SOCKET
+from fcn_ctl import STATUS_ERROR
+from fcn_ctl import STATUS_SENT
+from fcn_ctl import STATUS_SUPPRESSED
+from fcn_ctl import pack_reply
+from fcn_ctl import unpack_requests
+from fcn_metrics import Metrics
+
+# Bytes of unsent replies after which a client's requests are left unread
+# until it reads its replies
+MAX_PENDING = 1 << 20
+
+
+class FCNDaemon(object):
+    """Serves rule requests from local clients, sending each through one
+    long-lived FCNClient
+
+    """
+
+    def __init__(self, client, path=DEFAULT_SOCKET):
+        """Initialise the daemon and listen on its socket
+
+        Parameters
+        ----------
+        client:
+            The FCNClient rules are sent with
+        path:
+            The UNIX socket to listen on. A stale socket left by a daemon
+            that has exited is replaced
+
+        """
+        self.client = client
+        self.path = path
+        self.requests = 0
+        self.errors = 0
+        self.stopped = False
+        # Client connection -> receive buffer
+        self.streams = {}
+        # Client connection -> replies not yet sent
+        self.pending = {}
+        self.remove_stale_socket(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.listener.bind(path)
+        except socket.error as error:
+            self.listener.close()
+            raise NameError('Error: Couldn\'t listen on %s: %s' % (
+                path, error))
+        self.listener.listen(128)
+
+    @staticmethod
+    def remove_stale_socket(path):
+        """Removes the socket file of a daemon that is no longer running
+
+        Parameters
+        ----------
+        path:
+            The UNIX socket path
+
+        """
+        try:
+            mode = os.stat(path).st_mode
+        except OSError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise NameError('Error: %s exists and is not a socket' % path)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            os.unlink(path)
+            return
+        finally:
+            probe.close()
+        raise NameError('Error: An FCN daemon is already listening on %s'
+                        % path)
+
+    def poll(self, timeout):
+        """Handles the sockets that are ready and sends refreshes that are
+        due
+
+        Parameters
+        ----------
+        timeout:
+            Seconds to wait for a socket to become ready
+
+        """
+        sockets = [self.listener] + [conn for conn in self.streams
+                                     if len(self.pending[conn]) < MAX_PENDING]
+        waiting = [conn for conn in self.streams if self.pending[conn]]
+        try:
+            readable, writable = select.select(sockets, waiting, [],
+                                               timeout)[:2]
+        except select.error as error:
+            if error.args[0] != errno.EINTR:
+                raise
+            readable, writable = [], []
+        for conn in writable:
+            if conn in self.streams:
+                self.write_replies(conn)
+        for sock in readable:
+            if sock is self.listener:
+                conn = self.listener.accept()[0]
+                conn.setblocking(False)
+                self.streams[conn] = bytearray()
+                self.pending[conn] = bytearray()
+            elif sock in self.streams:
+                self.read_requests(sock)
+        try:
+            self.client.refresh_due()
+        except NameError:
+            self.errors += 1
+
+    def read_requests(self, conn):
+        """Reads from a client connection and handles each complete request
+
+        Parameters
+        ----------
+        conn:
+            The client connection
+
+        """
+        try:
+            data = conn.recv(65536)
+        except socket.error as error:
+            if error.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            data = b''
+        if not data:
+            self.close_stream(conn)
+            return
+        buf = self.streams[conn]
+        buf.extend(data)
+        requests, used = unpack_requests(buf)
+        del buf[:used]
+        pending = self.pending[conn]
+        for request in requests:
+            reply = self.handle(request)
+            if reply is not None:
+                pending.extend(reply)
+        if pending:
+            self.write_replies(conn)
+
+    def write_replies(self, conn):
+        """Sends as much of a connection's pending replies as the socket
+        takes without blocking, the rest waits for poll to find the socket
+        writable
+
+        Parameters
+        ----------
+        conn:
+            The client connection
+
+        """
+        pending = self.pending[conn]
+        try:
+            sent = conn.send(pending)
+        except socket.error as error:
+            if error.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.close_stream(conn)
+            return
+        del pending[:sent]
+
+    def handle(self, request):
+        """Sends the rule of one request
+
+        Parameters
+        ----------
+        request:
+            A request from unpack_requests
+
+        Returns
+        -------
+            The reply, None if the client wants none
+
+        """
+        (reply_wanted, msgtype, srcip, destip, srcport, destport, prototype,
+         mclass, prio, timeoutval) = request
+        self.requests += 1
+        try:
+            seq_no = self.client.send_flow(self.client.create_rule(
+                msgtype, srcip, destip, srcport, destport, prototype, mclass,
+                prio, timeoutval))
+        except NameError as error:
+            self.errors += 1
+            reply = pack_reply(STATUS_ERROR, error=str(error))
+        else:
+            if seq_no is None:
+                reply = pack_reply(STATUS_SUPPRESSED)
+            else:
+                reply = pack_reply(STATUS_SENT, seq_no)
+        if reply_wanted:
+            return reply
+        return None
+
+    def close_stream(self, conn):
+        """Closes a client connection
+
+        Parameters
+        ----------
+        conn:
+            The client connection
+
+        """
+        self.streams.pop(conn, None)
+        self.pending.pop(conn, None)
+        conn.close()
+
+    def serve(self, duration=None):
+        """Handles requests until stopped, Ctrl-C or duration seconds
+
+        Parameters
+        ----------
+        duration:
+            Seconds to run for, None to run until stopped
+
+        """
+        start = time.time()
+        try:
+            while not self.stopped:
+                timeout = 1.0
+                if duration is not None:
+                    timeout = min(timeout, start + duration - time.time())
+                    if timeout <= 0:
+                        break
+                self.poll(timeout)
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        """Makes serve return after the current poll, or straight away if it
+        hasn't started
+
+        """
+        self.stopped = True
+
+    def close(self):
+        """Closes every connection, removes the socket and closes the
+        client
+
+        """
+        for conn in list(self.streams):
+            self.close_stream(conn)
+        self.listener.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self.client.close()
+
+
+def parser():
+    """Command Line Interface for the daemon
+
+    Returns
+    -------
+    cli_inputs:
+        The command line interface inputs
+
+    """
+    parser = argparse.ArgumentParser(
+        description='FCN Daemon\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-U", "--socket",
+                        action="store",
+                        dest="socket",
+                        default=DEFAULT_SOCKET,
+                        metavar='Path',
+                        help='\t\t\tSocket to listen on (Default: %s)'
+                             % DEFAULT_SOCKET)
+    parser.add_argument("-x", "--host",
+                        action="store",
+                        dest="HOST",
+                        default='127.0.0.1',
+                        metavar='Host',
+                        help='\t\t\tAction Node IP (Default: 127.0.0.1)')
+    parser.add_argument("-y", "--port",
+                        action="store",
+                        dest="PORT",
+                        type=int,
+                        default=5000,
+                        metavar='Port',
+                        help='\t\t\tOutput Port to Action Node '
+                             '(Default: 5000)')
+    parser.add_argument("-z", "--proto",
+                        action="store",
+                        dest="PROTO",
+                        default='UDP',
+                        metavar='Proto',
+                        help='\t\t\tProtocol to Action Node (Default: UDP)')
+    parser.add_argument("-s", "--seqno",
+                        action="store",
+                        dest="seq_no",
+                        type=int,
+                        default=20,
+                        metavar='Sequence Number',
+                        help='\t\t\tSequence number of the first message '
+                             '(Default: 20)')
+    parser.add_argument("-e", "--export",
+                        action="store",
+                        dest="export",
+                        default='myexp',
+                        metavar='Export',
+                        help='\t\t\tName of export (Default: myexp)')
+    parser.add_argument("-S", "--session",
+                        action="store_true",
+                        dest="session",
+                        help='\t\t\tSend the template once per connection')
+    parser.add_argument("--template-interval",
+                        action="store",
+                        dest="template_interval",
+                        type=float,
+                        default=60,
+                        metavar='Seconds',
+                        help='\t\t\tSeconds between UDP templates in session '
+                             'mode (Default: 60)')
+    parser.add_argument("--flow-table",
+                        action="store_true",
+                        dest="flow_table",
+                        help='\t\t\tSkip Adds for flows still installed and '
+                             'Removes\n\t\t\tfor flows that are not')
+    parser.add_argument("--refresh",
+                        action="store",
+                        dest="refresh",
+                        type=float,
+                        default=None,
+                        metavar='Seconds',
+                        help='\t\t\tRe-send Adds this many seconds before '
+                             'they time out')
+    parser.add_argument("-m", "--msg-size",
+                        action="store",
+                        dest="msg_size",
+                        type=int,
+                        default=DEFAULT_MSG_SIZE,
+                        metavar='Bytes',
+                        help='\t\t\tLargest message for batched refreshes '
+                             '(Default: %d)' % DEFAULT_MSG_SIZE)
+    parser.add_argument("--metrics-file",
+                        action="store",
+                        dest="metrics_file",
+                        default=None,
+                        metavar='Path',
+                        help='\t\t\tWrite Prometheus metrics to this '
+                             'textfile every 10 seconds')
+    parser.add_argument("--metrics-port",
+                        action="store",
+                        dest="metrics_port",
+                        type=int,
+                        default=None,
+                        metavar='Port',
+                        help='\t\t\tServe Prometheus metrics over HTTP on '
+                             'this local port')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    INPUTS = parser()
+    # Exit through the finally below on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    METRICS = None
+    if INPUTS.metrics_file is not None or INPUTS.metrics_port is not None:
+        METRICS = Metrics()
+    try:
+        if METRICS is not None:
+            METRICS.export(INPUTS.metrics_file, INPUTS.metrics_port)
+        DAEMON = FCNDaemon(
+            FCNClient(INPUTS.HOST, INPUTS.PORT, INPUTS.PROTO,
+                      export=INPUTS.export, seq_no=INPUTS.seq_no,
+                      msg_size=INPUTS.msg_size, session=INPUTS.session,
+                      template_interval=INPUTS.template_interval,
+                      flow_table=INPUTS.flow_table, refresh=INPUTS.refresh,
+                      metrics=METRICS),
+            INPUTS.socket)
+    except (NameError, IOError, OSError) as error:
+        sys.exit(str(error))
+    print('Listening on %s, sending to %s:%d over %s' % (
+        INPUTS.socket, INPUTS.HOST, INPUTS.PORT, INPUTS.PROTO.upper()))
+    try:
+        DAEMON.serve()
+    finally:
+        DAEMON.close()
+        print('Handled %d requests, %d errors' % (DAEMON.requests,
+                                                   DAEMON.errors))
+        if METRICS is not None:
+            METRICS.stop()
+            if INPUTS.metrics_file is not None:
+                METRICS.write_textfile(INPUTS.metrics_file)
+            print(METRICS.summary())
@@ -0,0 +1,343 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Decoder
+- Parse RAP messages produced by the FCN encoder
+
+Messages are walked through memoryviews, only the fields of each record
+are copied out. Decoded records use the FCN input attribute names, so a
+record can be passed straight back to the encoder
+
+Example
+-------
+    for record in decode_file('capture.rap'):
+        print(record.seq_no, record.srcip, record.destip, record.mclass)
+
+"""
+import collections
+import mmap
+import socket
+import struct
+
+# Version, message length, sequence number, export time
+HEADER_STRUCT = struct.Struct('!HHII')
+SET_HEADER_STRUCT = struct.Struct('!HH')
+# Data record up to and including the class name length
+RECORD_HEAD_STRUCT = struct.Struct('!8sB4s4sHHBIIB')
+# Data record after the class name and its two padding bytes
+RECORD_TAIL_STRUCT = struct.Struct('!BBHQH16s')
+# Record bytes not counted by the class name length
+RECORD_EXTRA_LEN = 59
+MSG_TYPE_OFFSET = 8
+CLASS_LEN_OFFSET = 30
+TEMPLATE_SET_ID = 1
+DATA_SET_ID = 256
+
+
+class RuleRecord(collections.namedtuple(
+        'RuleRecord', 'seq_no export_time export msgtype srcip destip '
+                      'srcport destport prototype packet_count kbyte_count '
+                      'mclass prio timeout_type timeoutval action a_flg')):
+    """One decoded data record. seq_no is the message sequence number
+    plus the index of the record in the message
+
+    """
+    __slots__ = ()
+
+
+def parse_header(view):
+    """Checks and unpacks a RAP message header
+
+    Parameters
+    ----------
+    view:
+        One complete RAP message
+
+    Returns
+    -------
+        Version, message length, sequence number and export time
+
+    """
+    if len(view) < HEADER_STRUCT.size:
+        raise ValueError('Short message')
+    header = HEADER_STRUCT.unpack_from(view, 0)
+    if header[0] != 1 or header[1] != len(view):
+        raise ValueError('Invalid header')
+
+    return header
+
+
+def iter_sets(view):
+    """Walks the sets of a RAP message
+
+    Parameters
+    ----------
+    view:
+        Memoryview of one complete RAP message
+
+    Returns
+    -------
+        Generator of (set id, memoryview of the set contents)
+
+    """
+    m_len = parse_header(view)[1]
+    offset = HEADER_STRUCT.size
+    while offset < m_len:
+        if offset + SET_HEADER_STRUCT.size > m_len:
+            raise ValueError('Truncated set header')
+        set_id, set_len = SET_HEADER_STRUCT.unpack_from(view, offset)
+        end = offset + set_len
+        if set_len < SET_HEADER_STRUCT.size or end > m_len:
+            raise ValueError('Invalid set length')
+        yield set_id, view[offset + SET_HEADER_STRUCT.size:end]
+        offset = end
+
+
+def iter_record_views(set_view):
+    """Splits a data set into records
+
+    Parameters
+    ----------
+    set_view:
+        Memoryview of the data set contents
+
+    Returns
+    -------
+        Generator of memoryviews, one per record
+
+    """
+    pos = 0
+    end = len(set_view)
+    while pos < end:
+        if pos + RECORD_HEAD_STRUCT.size > end:
+            raise ValueError('Truncated record')
+        record_len = struct.unpack_from(
+            '!B', set_view, pos + CLASS_LEN_OFFSET)[0] + RECORD_EXTRA_LEN
+        if pos + record_len > end:
+            raise ValueError('Truncated record')
+        yield set_view[pos:pos + record_len]
+        pos += record_len
+
+
+def decode_record(view, seq_no=0, export_time=0):
+    """Decodes one data record
+
+    Parameters
+    ----------
+    view:
+        Memoryview of the record
+    seq_no:
+        Sequence number given to the record
+    export_time:
+        Export time of the message
+
+    Returns
+    -------
+        The RuleRecord
+
+    """
+    (export, msgtype, srcip, destip, srcport, destport, prototype,
+     packet_count, kbyte_count, class_len) = RECORD_HEAD_STRUCT.unpack_from(
+        view, 0)
+    # The length counts 4 bytes besides the class name
+    if class_len < 4:
+        raise ValueError('Invalid class length')
+    class_end = RECORD_HEAD_STRUCT.size + class_len - 4
+    mclass = view[RECORD_HEAD_STRUCT.size:class_end].tobytes()
+    (prio, timeout_type, timeoutval, action, a_flg,
+     _) = RECORD_TAIL_STRUCT.unpack_from(view, class_end + 2)
+
+    return _new_record(RuleRecord, (
+        seq_no, export_time, _name(export.rstrip(b'\x00')), msgtype,
+        socket.inet_ntoa(srcip), socket.inet_ntoa(destip), srcport,
+        destport, prototype, packet_count, kbyte_count, _name(mclass),
+        prio, timeout_type, timeoutval, action, a_flg))
+
+
+# Skips the keyword handling of the namedtuple constructor
+_new_record = tuple.__new__
+# Decoded export and class names, there are only ever a few of them
+_NAMES = {}
+
+
+def _name(raw):
+    """Decodes an export or class name, caching the result
+
+    Parameters
+    ----------
+    raw:
+        The name as bytes
+
+    Returns
+    -------
+        The name as a string
+
+    """
+    try:
+        return _NAMES[raw]
+    except KeyError:
+        if len(_NAMES) > 4096:
+            _NAMES.clear()
+        name = _NAMES[raw] = raw.decode('latin-1')
+        return name
+
+
+def decode_message(data):
+    """Decodes every data record of a RAP message, across all its sets
+
+    Parameters
+    ----------
+    data:
+        One complete RAP message, any bytes-like object
+
+    Returns
+    -------
+        Generator of RuleRecords
+
+    """
+    view = memoryview(data)
+    _, _, seq_no, export_time = parse_header(view)
+    index = 0
+    for set_id, set_view in iter_sets(view):
+        if set_id != DATA_SET_ID:
+            continue
+        for record in iter_record_views(set_view):
+            yield decode_record(record, (seq_no + index) & 0xffffffff,
+                                export_time)
+            index += 1
+
+
+def parse_message(data):
+    """Reads the sequence number and record message types of a RAP
+    message without decoding the records
+
+    Parameters
+    ----------
+    data:
+        One complete RAP message, any bytes-like object
+
+    Returns
+    -------
+    seq_no:
+        Sequence number of the message
+    msg_types:
+        Message type of each data record
+
+    """
+    view = memoryview(data)
+    seq_no = parse_header(view)[2]
+    msg_types = []
+    for set_id, set_view in iter_sets(view):
+        if set_id != DATA_SET_ID:
+            continue
+        for record in iter_record_views(set_view):
+            msg_types.append(struct.unpack_from('!B', record,
+                                                MSG_TYPE_OFFSET)[0])
+
+    return seq_no, msg_types
+
+
+def split_messages(data):
+    """Splits back to back RAP messages, such as a TCP stream capture
+
+    Parameters
+    ----------
+    data:
+        Concatenated RAP messages, any bytes-like object
+
+    Returns
+    -------
+        Generator of memoryviews, one per message
+
+    """
+    view = memoryview(data)
+    offset = 0
+    end = len(view)
+    while offset < end:
+        if offset + 4 > end:
+            raise ValueError('Truncated message')
+        m_len = struct.unpack_from('!H', view, offset + 2)[0]
+        if m_len < HEADER_STRUCT.size or offset + m_len > end:
+            raise ValueError('Invalid message length')
+        yield view[offset:offset + m_len]
+        offset += m_len
+
+
+def decode_stream(data):
+    """Decodes every record of back to back RAP messages
+
+    Parameters
+    ----------
+    data:
+        Concatenated RAP messages, any bytes-like object
+
+    Returns
+    -------
+        Generator of RuleRecords
+
+    """
+    for message in split_messages(data):
+        for record in decode_message(message):
+            yield record
+
+
+def decode_file(path):
+    """Decodes a file of back to back RAP messages through mmap
+
+    Parameters
+    ----------
+    path:
+        The capture file
+
+    Returns
+    -------
+        Generator of RuleRecords
+
+    """
+    with open(path, 'rb') as capture:
+        try:
+            data = mmap.mmap(capture.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        try:
+            view = memoryview(data)
+        except TypeError:
+            # Python 2 maps do not export buffers, decode a copy
+            view = data[:]
+        records = decode_stream(view)
+        try:
+            for record in records:
+                yield record
+        finally:
+            # Release the views into the map before closing it
+            records.close()
+            del view
+            data.close()
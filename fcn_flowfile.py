@@ -0,0 +1,439 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Flow Files
+- Binary rule files that are memory-mapped and encoded without parsing
+
+Layout, all fields in network byte order
+
+    Offset  Field
+    0       Magic b'FCNFLOW1', record size (uint16), class count (uint16),
+            reserved (uint32), record count (uint64), class table offset
+            (uint64)
+    32      Records, FLOW_RECORD_STRUCT each
+    ...     Class table, each name as a length byte followed by the name
+
+A record holds the message type, source and destination IP, ports and
+protocol in the order of the RAP data record, then the priority, a zero
+byte, the timeout and the index of its class in the class table. Encoding
+a record only joins its slices with the export and class name
+
+Convert a CSV or JSON Lines rule file
+
+    python fcn_flowfile.py rules.csv rules.flows
+
+"""
+from __future__ import print_function
+
+import argparse
+import mmap
+import os
+import socket
+import struct
+import sys
+
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_rule import MSG_REMOVE_ALL
+from fcn_rule import FlowRule
+from fcn_rule import pack_records
+from fcn_rulefile import FORMATS
+from fcn_rulefile import file_format
+from fcn_rulefile import read_rules
+
+FLOW_MAGIC = b'FCNFLOW1'
+FLOW_HEADER_STRUCT = struct.Struct('!8sHHIQQ')
+FLOW_RECORD_STRUCT = struct.Struct('!BIIHHBBBHH')
+# A record split into the part in front of the counts, the priority and
+# timeout, and the class index
+FLOW_SLICES_STRUCT = struct.Struct('!14s4sH')
+MAX_CLASSES = 65535
+# Packet and kbyte counts, which flow files don't hold
+ZERO_COUNTS = b'\x00' * 8
+# Action, action flag and action parameter after the timeout
+ACTION_STRUCT = struct.Struct('!QH16s')
+
+
+class FlowFileWriter(object):
+    """Writes rules to a flow file as they are added
+
+    """
+
+    def __init__(self, path):
+        """Create the flow file
+
+        Parameters
+        ----------
+        path:
+            The flow file path
+
+        """
+        try:
+            self.stream = open(path, 'wb')
+        except IOError as error:
+            raise NameError('Error: Couldn\'t create %s: %s' % (
+                path, error.strerror))
+        self.stream.write(b'\x00' * FLOW_HEADER_STRUCT.size)
+        self.path = path
+        self.count = 0
+        self.classes = []
+        self._class_index = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't leave a partial flow file behind
+            self.stream.close()
+            os.unlink(self.path)
+
+    def add(self, rule):
+        """Adds a rule, checking every field
+
+        Parameters
+        ----------
+        rule:
+            Any object with the FCN input attributes
+
+        """
+        if not 0 <= rule.msgtype <= MSG_REMOVE_ALL:
+            raise NameError('Invalid Msg Type')
+        index = self._class_index.get(rule.mclass)
+        if index is None:
+            name = rule.mclass
+            if not isinstance(name, bytes):
+                try:
+                    name = name.encode('ascii')
+                except Exception:
+                    raise NameError('Invalid Name')
+            if len(name) > 251:
+                raise NameError('Invalid Name')
+            if len(self.classes) == MAX_CLASSES:
+                raise NameError('Error: More than %d classes' % MAX_CLASSES)
+            index = self._class_index[rule.mclass] = len(self.classes)
+            self.classes.append(name)
+        try:
+            srcip = struct.unpack('!I', socket.inet_pton(socket.AF_INET,
+                                                         rule.srcip))[0]
+            destip = struct.unpack('!I', socket.inet_pton(socket.AF_INET,
+                                                          rule.destip))[0]
+        except Exception:
+            raise NameError('Invalid IP')
+        try:
+            record = FLOW_RECORD_STRUCT.pack(
+                rule.msgtype, srcip, destip, rule.srcport, rule.destport,
+                rule.prototype, rule.prio, 0, rule.timeoutval, index)
+        except struct.error:
+            raise NameError('Error: Message field out of range')
+        self.stream.write(record)
+        self.count += 1
+
+    def close(self):
+        """Writes the class table and header, and closes the file
+
+        """
+        if self.stream.closed:
+            return
+        offset = FLOW_HEADER_STRUCT.size + self.count * FLOW_RECORD_STRUCT.size
+        self.stream.write(b''.join(struct.pack('!B', len(name)) + name
+                                   for name in self.classes))
+        self.stream.seek(0)
+        self.stream.write(FLOW_HEADER_STRUCT.pack(
+            FLOW_MAGIC, FLOW_RECORD_STRUCT.size, len(self.classes), 0,
+            self.count, offset))
+        self.stream.close()
+
+
+class FlowFile(object):
+    """Read-only memory map of a flow file
+
+    """
+
+    def __init__(self, path):
+        """Map the flow file
+
+        Parameters
+        ----------
+        path:
+            The flow file path
+
+        """
+        try:
+            with open(path, 'rb') as stream:
+                size = os.fstat(stream.fileno()).st_size
+                if size < FLOW_HEADER_STRUCT.size:
+                    raise NameError('Error: %s is not a flow file' % path)
+                self.map = mmap.mmap(stream.fileno(), size,
+                                     access=mmap.ACCESS_READ)
+        except (IOError, OSError) as error:
+            raise NameError('Error: Couldn\'t open %s: %s' % (
+                path, error.strerror))
+        (magic, record_size, class_count, _, self.count,
+         offset) = FLOW_HEADER_STRUCT.unpack_from(self.map, 0)
+        end = FLOW_HEADER_STRUCT.size + self.count * FLOW_RECORD_STRUCT.size
+        if (magic != FLOW_MAGIC or
+                record_size != FLOW_RECORD_STRUCT.size or
+                not end <= offset <= size):
+            self.map.close()
+            raise NameError('Error: %s is not a flow file' % path)
+        self.classes = []
+        for _ in range(class_count):
+            length = struct.unpack_from('!B', self.map, offset)[0]
+            name = self.map[offset + 1:offset + 1 + length]
+            if len(name) != length:
+                self.map.close()
+                raise NameError('Error: %s is not a flow file' % path)
+            self.classes.append(name)
+            offset += 1 + length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def records(self, export, start=0, stop=None, a_flg=1):
+        """Encodes a run of records as data records
+
+        Parameters
+        ----------
+        export:
+            Name of export shared by every record
+        start:
+            Index of the first record
+        stop:
+            Index after the last record (Default: the end)
+        a_flg:
+            Action flag shared by every record
+
+        Returns
+        -------
+            List of data records, as the FCN encoder's pack_msg_payload
+            would make them
+
+        """
+        if stop is None or stop > self.count:
+            stop = self.count
+        if isinstance(export, bytes):
+            prefix = export
+        else:
+            prefix = export.encode('ascii')
+        prefix = struct.pack('!8s', prefix)
+        # Everything from the counts up to the priority, for each class
+        middles = [ZERO_COUNTS + struct.pack('!B', len(name) + 4) + name +
+                   b'\x00\x00' for name in self.classes]
+        try:
+            action = ACTION_STRUCT.pack(0, a_flg, b'')
+        except struct.error:
+            raise NameError('Error: Message field out of range')
+        limit = struct.pack('!B', MSG_REMOVE_ALL)
+        join = b''.join
+        records = []
+        try:
+            for head, prio_timeout, index in _iter_unpack(
+                    FLOW_SLICES_STRUCT, self.map,
+                    FLOW_HEADER_STRUCT.size + start * FLOW_RECORD_STRUCT.size,
+                    FLOW_HEADER_STRUCT.size + stop * FLOW_RECORD_STRUCT.size):
+                if head[:1] > limit:
+                    raise NameError('Invalid Msg Type')
+                records.append(join((prefix, head, middles[index],
+                                     prio_timeout, action)))
+        except IndexError:
+            raise NameError('Error: Invalid class index')
+
+        return records
+
+    def messages(self, encoder, export='myexp', seq_no=0,
+                 msg_size=DEFAULT_MSG_SIZE, session=False, a_flg=1,
+                 chunk=65536):
+        """Encodes every record into RAP messages of up to msg_size bytes
+
+        Parameters
+        ----------
+        encoder:
+            The FCN instance used to pack headers and templates
+        export:
+            Name of export shared by every record
+        seq_no:
+            Sequence number of the first record, each message takes the
+            sequence number of its first record
+        msg_size:
+            Maximum RAP message size in bytes
+        session:
+            Build data-only messages without the template
+        a_flg:
+            Action flag shared by every record
+        chunk:
+            Records encoded at a time, bounds the memory used for records
+
+        Returns
+        -------
+            Generator of serialised messages
+
+        """
+        export = encoder.to_bytes(encoder.export_name_check(export))
+
+        def records():
+            for start in range(0, self.count, chunk):
+                for record in self.records(export, start, start + chunk,
+                                           a_flg):
+                    yield record
+
+        return pack_records(encoder, records(), seq_no, msg_size, session)
+
+    def close(self):
+        """Unmaps the flow file
+
+        """
+        self.map.close()
+
+
+def _iter_unpack(fmt, buf, start, stop):
+    """Unpacks consecutive structs from part of a buffer without copying
+    it
+
+    Parameters
+    ----------
+    fmt:
+        The struct.Struct
+    buf:
+        The buffer, such as a memory map
+    start:
+        Offset of the first struct
+    stop:
+        Offset after the last struct
+
+    Returns
+    -------
+        Generator of tuples
+
+    """
+    if not hasattr(fmt, 'iter_unpack'):
+        # Python 2
+        for offset in range(start, stop, fmt.size):
+            yield fmt.unpack_from(buf, offset)
+        return
+    view = memoryview(buf)[start:stop]
+    try:
+        for values in fmt.iter_unpack(view):
+            yield values
+    finally:
+        # The map can't be closed while a view of it exists
+        view.release()
+
+
+def convert(source, path, fmt=None, defaults=None):
+    """Converts a CSV or JSON Lines rule file to a flow file
+
+    Parameters
+    ----------
+    source:
+        The rule file path, - for stdin
+    path:
+        The flow file path
+    fmt:
+        csv or jsonl (Default: from the file extension)
+    defaults:
+        The inputs used for columns missing from the rule file
+        (Default: FlowRule defaults)
+
+    Returns
+    -------
+        The number of rules written
+
+    """
+    if defaults is None:
+        defaults = FlowRule()
+    fmt = file_format(source, fmt)
+    if source == '-':
+        stream = sys.stdin
+    else:
+        try:
+            stream = open(source)
+        except IOError as error:
+            raise NameError('Error: Couldn\'t open %s: %s' % (
+                source, error.strerror))
+    try:
+        with FlowFileWriter(path) as writer:
+            for line_no, rule in read_rules(stream, fmt, defaults):
+                try:
+                    writer.add(rule)
+                except NameError as error:
+                    raise NameError('Error: Line %d: %s' % (
+                        line_no, str(error).replace('Error: ', '', 1)))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    return writer.count
+
+
+def parser():
+    """Command Line Interface for the converter
+
+    Returns
+    -------
+    cli_inputs:
+        The command line interface inputs
+
+    """
+    parser = argparse.ArgumentParser(
+        description='Convert a rule file to an FCN flow file\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("source",
+                        metavar='Rule File',
+                        help='\t\t\tCSV or JSON Lines rule file, - for stdin')
+    parser.add_argument("path",
+                        metavar='Flow File',
+                        help='\t\t\tFlow file to write')
+    parser.add_argument("--format",
+                        action="store",
+                        dest="file_format",
+                        choices=FORMATS,
+                        default=None,
+                        metavar='Format',
+                        help='\t\t\tRule file format: csv or jsonl '
+                             '(Default: from file extension, csv)')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    INPUTS = parser()
+    try:
+        COUNT = convert(INPUTS.source, INPUTS.path, INPUTS.file_format)
+    except NameError as error:
+        sys.exit(str(error))
+    print('Wrote %d rules to %s' % (COUNT, INPUTS.path))
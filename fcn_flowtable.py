@@ -0,0 +1,185 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Flow Table
+- Track the flows installed on an Action Node so redundant Add and Remove
+  messages are not sent
+
+"""
+import heapq
+import time
+
+
+class FlowTable(object):
+    """Flows believed to be installed, keyed by 5-tuple and class
+    Each flow expires timeoutval seconds after its Add was sent, when the
+    Action Node drops it
+
+    """
+
+    def __init__(self, max_flows=None, refresh=0, clock=time.time):
+        """Initialise the flow table
+
+        Parameters
+        ----------
+        max_flows:
+            Most flows tracked, the flow closest to expiry is forgotten to
+            make room. None for no limit
+        refresh:
+            Adds for a flow this many seconds or less from expiry are sent
+            again to renew it
+        clock:
+            Returns the current time in seconds
+
+        """
+        self.max_flows = max_flows
+        self.refresh = refresh
+        self.clock = clock
+        # Flow key -> expiry time
+        self.flows = {}
+        # Heap of (expiry time, flow key), entries for flows since removed
+        # or renewed are skipped when they reach the top
+        self.expiries = []
+        self.suppressed = 0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __contains__(self, rule):
+        self.expire()
+        return self.flow_key(rule) in self.flows
+
+    @staticmethod
+    def flow_key(rule):
+        """Key of the flow a rule applies to
+
+        Parameters
+        ----------
+        rule:
+            The flow rule
+
+        Returns
+        -------
+            The 5-tuple and class name
+
+        """
+        return (rule.srcip, rule.destip, rule.srcport, rule.destport,
+                rule.prototype, rule.mclass)
+
+    def admit(self, rule):
+        """Checks if a rule needs to be sent and records its effect
+
+        Parameters
+        ----------
+        rule:
+            The flow rule about to be sent
+
+        Returns
+        -------
+            False for an Add of a flow that is still installed and for a
+            Remove of a flow that is not, True otherwise
+
+        """
+        now = self.clock()
+        self.expire(now)
+        if rule.msgtype == 2:
+            # Remove All
+            self.clear()
+            return True
+        key = self.flow_key(rule)
+        if rule.msgtype == 1:
+            # Remove
+            if self.flows.pop(key, None) is None:
+                self.suppressed += 1
+                return False
+            return True
+
+        expiry = self.flows.get(key)
+        if expiry is not None and expiry - now > self.refresh:
+            self.suppressed += 1
+            return False
+        expiry = now + rule.timeoutval
+        self.flows[key] = expiry
+        heapq.heappush(self.expiries, (expiry, key))
+        if self.max_flows is not None and len(self.flows) > self.max_flows:
+            self.evict()
+        elif len(self.expiries) > 2 * len(self.flows) + 64:
+            # Drop the entries of removed and renewed flows
+            self.expiries = [(expiry, key)
+                             for key, expiry in self.flows.items()]
+            heapq.heapify(self.expiries)
+        return True
+
+    def discard(self, rule):
+        """Forgets a flow, used when sending its rule failed and its state
+        on the Action Node is unknown
+
+        Parameters
+        ----------
+        rule:
+            The flow rule
+
+        """
+        self.flows.pop(self.flow_key(rule), None)
+
+    def expire(self, now=None):
+        """Forgets the flows whose timeout has passed
+
+        Parameters
+        ----------
+        now:
+            The current time (Default: clock())
+
+        """
+        if now is None:
+            now = self.clock()
+        expiries = self.expiries
+        flows = self.flows
+        while expiries and expiries[0][0] <= now:
+            expiry, key = heapq.heappop(expiries)
+            if flows.get(key) == expiry:
+                del flows[key]
+
+    def evict(self):
+        """Forgets the flow closest to expiry
+
+        """
+        while self.expiries:
+            expiry, key = heapq.heappop(self.expiries)
+            if self.flows.get(key) == expiry:
+                del self.flows[key]
+                return
+
+    def clear(self):
+        """Forgets every flow
+
+        """
+        self.flows.clear()
+        del self.expiries[:]
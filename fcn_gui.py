@@ -33,7 +33,6 @@
 
 """
 import sys
-import binascii
 
 from PyQt4.QtGui import QGridLayout
 from PyQt4.QtGui import QLabel
@@ -44,7 +43,7 @@ from PyQt4.QtGui import QMessageBox
 from PyQt4.QtGui import QWidget
 from PyQt4.QtGui import QApplication
 
-from fcn import FCN
+from fcn_client import FCNClient
 
 
 class FCNGui(QWidget):
@@ -365,21 +364,13 @@ class FCNGui(QWidget):
             if 'destport' not in dir(inputs):
                 inputs.destport = 0
 
-            # Instantiate FCN Modules without __init__
-            fake = FCN.__new__(FCN)
-
-            # Parse Variables
-            c_msg = fake.create_msg_payload(cli_inputs=inputs)
-            c_temp = fake.create_template(payload_len=len(c_msg))
-            c_header = fake.create_header(cli_inputs=inputs,
-                                          payload_len=len(c_msg),
-                                          template_len=len(c_temp))
-
-            # Create message
-            message = binascii.a2b_hex(c_header + c_temp + c_msg)
-
             # Send Message
-            fake.send_message(message, inputs)
+            try:
+                with FCNClient(host=inputs.HOST, port=inputs.PORT,
+                               proto=inputs.PROTO) as client:
+                    client.send_rule(inputs)
+            except NameError as error:
+                QMessageBox.information(self, 'Send Failed', str(error))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,326 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Load Generator
+- Send flow rules at a target rate to stress test an Action Node
+
+"""
+import itertools
+import math
+import random
+import socket
+import struct
+import time
+
+from fcn_rule import FlowRule
+
+
+class TokenBucket(object):
+    """Paces messages to a rate, allowing bursts of up to burst messages
+    after the sender falls behind
+
+    """
+
+    def __init__(self, rate, burst=1, clock=time.time):
+        """Initialise the token bucket
+
+        Parameters
+        ----------
+        rate:
+            Tokens added per second
+        burst:
+            Maximum number of tokens held
+        clock:
+            Returns the current time in seconds
+
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = 0.0
+        self.stamp = clock()
+
+    def reserve(self, cost=1.0):
+        """Takes tokens from the bucket, going into debt if there are not
+        enough
+
+        Parameters
+        ----------
+        cost:
+            Number of tokens to take
+
+        Returns
+        -------
+            The time the tokens are available, now or in the future
+
+        """
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return now
+        return now - self.tokens / self.rate
+
+
+class LoadReport(object):
+    """Counters and send time jitter of a load run
+
+    """
+
+    def __init__(self, target_rate=0):
+        self.target_rate = target_rate
+        self.sent = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        # Lateness of each send against its scheduled time
+        self.jitter_sum = 0.0
+        self.jitter_sq_sum = 0.0
+        self.jitter_max = 0.0
+
+    @classmethod
+    def merged(cls, reports):
+        """Combines the reports of workers that ran at the same time
+
+        Parameters
+        ----------
+        reports:
+            The LoadReports to combine
+
+        Returns
+        -------
+            The combined LoadReport, lasting as long as the slowest worker
+
+        """
+        total = cls()
+        for report in reports:
+            total.target_rate += report.target_rate
+            total.sent += report.sent
+            total.errors += report.errors
+            total.elapsed = max(total.elapsed, report.elapsed)
+            total.jitter_sum += report.jitter_sum
+            total.jitter_sq_sum += report.jitter_sq_sum
+            total.jitter_max = max(total.jitter_max, report.jitter_max)
+
+        return total
+
+    def record(self, lateness, error=False):
+        """Adds one message to the report
+
+        Parameters
+        ----------
+        lateness:
+            Seconds between the scheduled and actual send time
+        error:
+            True if the send failed
+
+        """
+        if error:
+            self.errors += 1
+        else:
+            self.sent += 1
+        self.jitter_sum += lateness
+        self.jitter_sq_sum += lateness * lateness
+        if lateness > self.jitter_max:
+            self.jitter_max = lateness
+
+    @property
+    def rate(self):
+        """Achieved messages per second
+
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.sent / self.elapsed
+
+    @property
+    def jitter_mean(self):
+        """Mean lateness in seconds
+
+        """
+        total = self.sent + self.errors
+        if not total:
+            return 0.0
+        return self.jitter_sum / total
+
+    @property
+    def jitter_stdev(self):
+        """Standard deviation of the lateness in seconds
+
+        """
+        total = self.sent + self.errors
+        if not total:
+            return 0.0
+        mean = self.jitter_sum / total
+        return math.sqrt(max(0.0, self.jitter_sq_sum / total - mean * mean))
+
+    def __str__(self):
+        return ('Sent: %d messages in %.3f s\n'
+                'Send errors: %d\n'
+                'Rate: %.1f msg/s (target %.1f msg/s)\n'
+                'Jitter: mean %.3f ms, stdev %.3f ms, max %.3f ms'
+                % (self.sent, self.elapsed, self.errors, self.rate,
+                   self.target_rate, self.jitter_mean * 1000,
+                   self.jitter_stdev * 1000, self.jitter_max * 1000))
+
+
+class LoadGenerator(object):
+    """Sends rules at a target rate with token bucket pacing, optional
+    Poisson arrivals and a linear ramp up
+
+    """
+
+    def __init__(self, send, rules, rate, duration=None, count=None,
+                 burst=10, poisson=False, ramp=0, seed=None,
+                 clock=time.time, sleep=time.sleep):
+        """Initialise the load generator
+
+        Parameters
+        ----------
+        send:
+            Called with each rule, raises NameError if the send fails
+        rules:
+            Iterator of rules to send
+        rate:
+            Target messages per second
+        duration:
+            Seconds to run for, None to run until count or Ctrl-C
+        count:
+            Number of messages to send, None for no limit
+        burst:
+            Messages that may be sent back to back to catch up
+        poisson:
+            Poisson arrivals with mean rate instead of even spacing
+        ramp:
+            Seconds to ramp linearly up to rate
+        seed:
+            Seed for the Poisson arrivals
+        clock:
+            Returns the current time in seconds
+        sleep:
+            Sleeps for a number of seconds
+
+        """
+        if rate <= 0:
+            raise NameError('Error: Rate must be greater than 0')
+        self.send = send
+        self.rules = rules
+        self.rate = float(rate)
+        self.duration = duration
+        self.count = count
+        self.burst = burst
+        self.poisson = poisson
+        self.ramp = ramp
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+
+    def current_rate(self, elapsed):
+        """Target rate at a point in the run
+
+        Parameters
+        ----------
+        elapsed:
+            Seconds since the start of the run
+
+        Returns
+        -------
+            Messages per second, at least 1% of rate during the ramp
+
+        """
+        if self.ramp and elapsed < self.ramp:
+            return max(self.rate / 100, self.rate * elapsed / self.ramp)
+        return self.rate
+
+    def run(self):
+        """Sends rules until the duration or count is reached
+
+        Returns
+        -------
+            The LoadReport
+
+        """
+        report = LoadReport(self.rate)
+        bucket = TokenBucket(self.current_rate(0), self.burst, self.clock)
+        start = self.clock()
+        end = None if self.duration is None else start + self.duration
+        try:
+            for rule in self.rules:
+                if self.count is not None and \
+                        report.sent + report.errors >= self.count:
+                    break
+                bucket.rate = self.current_rate(self.clock() - start)
+                cost = self.random.expovariate(1.0) if self.poisson else 1.0
+                due = bucket.reserve(cost)
+                if end is not None and due >= end:
+                    break
+                wait = due - self.clock()
+                if wait > 0:
+                    self.sleep(wait)
+                lateness = max(0.0, self.clock() - due)
+                try:
+                    self.send(rule)
+                except NameError:
+                    report.record(lateness, error=True)
+                else:
+                    report.record(lateness)
+        except KeyboardInterrupt:
+            pass
+        report.elapsed = self.clock() - start
+
+        return report
+
+
+def generate_rules(base, flows=65535):
+    """Generates an endless stream of rules cycling through distinct flows
+    Source ports run from 1 to 65535, then the source IP is incremented
+
+    Parameters
+    ----------
+    base:
+        Rule with the FCN input attributes to copy
+    flows:
+        Number of distinct flows before the cycle repeats
+
+    Returns
+    -------
+        Generator of rules with consecutive sequence numbers
+
+    """
+    base_ip = struct.unpack('!I', socket.inet_aton(base.srcip))[0]
+    for index in itertools.count():
+        flow = index % flows
+        rule = FlowRule.from_inputs(base)
+        rule.srcport = 1 + flow % 65535
+        rule.srcip = socket.inet_ntoa(struct.pack(
+            '!I', (base_ip + flow // 65535) & 0xffffffff))
+        rule.seq_no = (base.seq_no + index) & 0xffffffff
+        yield rule
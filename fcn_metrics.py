@@ -0,0 +1,506 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Metrics
+- Counters and latency histograms for each stage of the send pipeline,
+  exported in the Prometheus text format
+
+Stages
+------
+    payload                         Encoding a data record
+    template                        Packing or looking up the template
+    header                          Packing the message header
+    connect                         Connecting to the Action Node
+    send                            Handing a message to the socket
+
+Slow encoding shows in the first three stages, a slow socket in send, and
+an Action Node that is slow to accept or drain a TCP connection in connect,
+send and the timeout counter
+
+Example
+-------
+    metrics = Metrics()
+    with FCNClient(host='192.168.1.2', metrics=metrics) as client:
+        client.add(srcip='10.0.0.1')
+    print(metrics.render())
+
+"""
+from __future__ import print_function
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+
+# Seconds, the upper bounds of the histogram buckets
+BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+           0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage -> FCN encoder method timed by Metrics.instrument
+ENCODER_STAGES = (('payload', 'pack_msg_payload'),
+                  ('template', 'pack_template'),
+                  ('header', 'pack_header'),
+                  ('batch', 'pack_batch'),
+                  ('batch', 'pack_data_batch'))
+
+# Counter -> help text
+COUNTERS = (('messages_sent', 'RAP messages sent'),
+            ('bytes_sent', 'Bytes of RAP messages sent'),
+            ('templates_sent', 'Template messages sent in session mode'),
+            ('connects', 'Sockets opened to the Action Node'),
+            ('send_errors', 'Messages that could not be sent'),
+            ('send_timeouts', 'Connects and sends that timed out'),
+            ('encode_errors', 'Rules that could not be encoded'))
+
+# Highest resolution clock available
+CLOCK = getattr(time, 'perf_counter', time.time)
+
+
+class Histogram(object):
+    """Counts observations into fixed latency buckets
+
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """Initialise the histogram
+
+        Parameters
+        ----------
+        buckets:
+            Ascending upper bounds of the buckets in seconds. Larger
+            observations are only counted in the total
+
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        """Number of observations
+
+        """
+        return sum(self.counts)
+
+    def observe(self, seconds):
+        """Adds an observation
+
+        Parameters
+        ----------
+        seconds:
+            The observed latency
+
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def quantile(self, fraction):
+        """Estimates a quantile as the upper bound of its bucket
+
+        Parameters
+        ----------
+        fraction:
+            The quantile, 0.99 for p99
+
+        Returns
+        -------
+            Seconds, None without observations and inf past the largest
+            bucket
+
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics(object):
+    """Send pipeline counters and stage histograms
+
+    """
+
+    def __init__(self, clock=CLOCK):
+        """Initialise the metrics
+
+        Parameters
+        ----------
+        clock:
+            Returns the current time in seconds
+
+        """
+        self.clock = clock
+        self.counters = dict((name, 0) for name, _ in COUNTERS)
+        self.stages = {}
+        self.stage_errors = {}
+        self.server = None
+        self.writer = None
+        self.stopping = threading.Event()
+
+    def __getstate__(self):
+        # Exporters stay with the process that started them
+        state = self.__dict__.copy()
+        state.update(server=None, writer=None, stopping=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stopping = threading.Event()
+
+    def merge(self, other):
+        """Adds the counts of metrics recorded elsewhere, such as in a
+        load worker process
+
+        Parameters
+        ----------
+        other:
+            The Metrics to add
+
+        """
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        for stage, histogram in other.stages.items():
+            total = self.histogram(stage)
+            # In place, timed functions hold on to the list
+            for index, count in enumerate(histogram.counts):
+                total.counts[index] += count
+            total.sum += histogram.sum
+            self.stage_errors[stage] += other.stage_errors[stage]
+
+    def inc(self, name, amount=1):
+        """Adds to a counter
+
+        Parameters
+        ----------
+        name:
+            The counter, see COUNTERS
+        amount:
+            Added to the counter
+
+        """
+        self.counters[name] += amount
+
+    def histogram(self, stage):
+        """Finds the histogram of a stage, adding it if new
+
+        Parameters
+        ----------
+        stage:
+            Name of the stage
+
+        Returns
+        -------
+            The Histogram
+
+        """
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+            self.stage_errors[stage] = 0
+        return histogram
+
+    def observe(self, stage, seconds, failed=False):
+        """Records the latency of one pass through a stage
+
+        Parameters
+        ----------
+        stage:
+            Name of the stage
+        seconds:
+            The latency
+        failed:
+            Count the pass as an error of the stage too
+
+        """
+        self.histogram(stage).observe(seconds)
+        if failed:
+            self.stage_errors[stage] += 1
+
+    def timed(self, stage, func):
+        """Wraps a function so every call is timed as a stage. Calls that
+        raise NameError are counted as errors of the stage and as encode
+        errors
+
+        Parameters
+        ----------
+        stage:
+            Name of the stage
+        func:
+            The function
+
+        Returns
+        -------
+            The wrapped function
+
+        """
+        histogram = self.histogram(stage)
+        # Histogram.observe inlined, this runs for every record
+        counts = histogram.counts
+        buckets = histogram.buckets
+        bisect_left = bisect.bisect_left
+        clock = self.clock
+
+        def timed_func(*args, **kwargs):
+            start = clock()
+            try:
+                result = func(*args, **kwargs)
+            except NameError:
+                self.observe(stage, clock() - start, failed=True)
+                self.counters['encode_errors'] += 1
+                raise
+            seconds = clock() - start
+            counts[bisect_left(buckets, seconds)] += 1
+            histogram.sum += seconds
+            return result
+
+        return timed_func
+
+    def instrument(self, encoder):
+        """Times the encoding stages of an FCN instance. Only that
+        instance is changed, the methods of other instances stay as fast
+        as before
+
+        Parameters
+        ----------
+        encoder:
+            The FCN or FCNClient instance
+
+        """
+        for stage, name in ENCODER_STAGES:
+            setattr(encoder, name, self.timed(stage, getattr(encoder, name)))
+
+    def instrument_records(self, source):
+        """Times the bulk record encoding of a RuleArray, FlowFile or
+        RingConsumer as the records stage. These build data records
+        without pack_msg_payload. Only that instance is changed
+
+        Parameters
+        ----------
+        source:
+            The instance whose records method is timed
+
+        """
+        source.records = self.timed('records', source.records)
+
+    def render(self):
+        """Formats the metrics in the Prometheus text exposition format
+
+        Returns
+        -------
+            The metrics as text
+
+        """
+        lines = []
+        for name, text in COUNTERS:
+            lines.append('# HELP fcn_%s_total %s' % (name, text))
+            lines.append('# TYPE fcn_%s_total counter' % name)
+            lines.append('fcn_%s_total %d' % (name, self.counters[name]))
+        lines.append('# HELP fcn_stage_seconds Time spent in each stage of '
+                     'the send pipeline')
+        lines.append('# TYPE fcn_stage_seconds histogram')
+        for stage in sorted(self.stages):
+            histogram = self.stages[stage]
+            # Copied first, the counts may change while rendering
+            counts = list(histogram.counts)
+            total = 0
+            for bound, count in zip(histogram.buckets, counts):
+                total += count
+                lines.append('fcn_stage_seconds_bucket{stage="%s",le="%r"} %d'
+                             % (stage, bound, total))
+            lines.append('fcn_stage_seconds_bucket{stage="%s",le="+Inf"} %d'
+                         % (stage, sum(counts)))
+            lines.append('fcn_stage_seconds_sum{stage="%s"} %r'
+                         % (stage, histogram.sum))
+            lines.append('fcn_stage_seconds_count{stage="%s"} %d'
+                         % (stage, sum(counts)))
+        lines.append('# HELP fcn_stage_errors_total Calls of each stage that '
+                     'failed')
+        lines.append('# TYPE fcn_stage_errors_total counter')
+        for stage in sorted(self.stage_errors):
+            lines.append('fcn_stage_errors_total{stage="%s"} %d'
+                         % (stage, self.stage_errors[stage]))
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Formats the metrics for people, printed when FCN exits
+
+        Returns
+        -------
+            The summary as text
+
+        """
+        lines = ['%-10s %10s %10s %10s %10s %8s' % (
+            'Stage', 'Calls', 'Mean us', 'p50 us', 'p99 us', 'Errors')]
+        for stage in sorted(self.stages):
+            histogram = self.stages[stage]
+            if not histogram.count:
+                continue
+            lines.append('%-10s %10d %10.1f %10s %10s %8d' % (
+                stage, histogram.count, histogram.sum / histogram.count * 1e6,
+                _micros(histogram.quantile(0.5)),
+                _micros(histogram.quantile(0.99)),
+                self.stage_errors[stage]))
+        counters = self.counters
+        lines.append('Sent %d messages (%d bytes), %d templates, %d connects'
+                     % (counters['messages_sent'], counters['bytes_sent'],
+                        counters['templates_sent'], counters['connects']))
+        lines.append('%d send errors, %d timeouts, %d encode errors' % (
+            counters['send_errors'], counters['send_timeouts'],
+            counters['encode_errors']))
+
+        return '\n'.join(lines)
+
+    def write_textfile(self, path):
+        """Writes the metrics for the node exporter textfile collector.
+        The file is replaced in one step so it is never read half written
+
+        Parameters
+        ----------
+        path:
+            The .prom file
+
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as stream:
+                stream.write(self.render())
+            os.rename(temp, path)
+        except OSError:
+            os.unlink(temp)
+            raise
+
+    def export(self, path=None, port=None, host='127.0.0.1', interval=10):
+        """Starts exporting the metrics in the background
+
+        Parameters
+        ----------
+        path:
+            Rewrite this textfile every interval seconds, None for no file
+        port:
+            Serve GET /metrics over HTTP on this port, None for no server
+        host:
+            Address the HTTP server listens on
+        interval:
+            Seconds between textfile writes
+
+        """
+        self.stopping.clear()
+        if port is not None:
+            try:
+                self.server = HTTPServer((host, port), _handler(self))
+            except (OSError, IOError) as error:
+                raise NameError('Error: Couldn\'t serve metrics on port %d: '
+                                '%s' % (port, error))
+            thread = threading.Thread(target=self.server.serve_forever)
+            thread.daemon = True
+            thread.start()
+        if path is not None:
+            self.write_textfile(path)
+
+            def write():
+                while not self.stopping.wait(interval):
+                    self.write_textfile(path)
+
+            self.writer = threading.Thread(target=write)
+            self.writer.daemon = True
+            self.writer.start()
+
+    def stop(self):
+        """Stops the HTTP server and textfile writes started by export
+
+        """
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+
+def _micros(seconds):
+    """Formats a bucket bound in microseconds for the summary
+
+    """
+    if seconds is None:
+        return '-'
+    if seconds == float('inf'):
+        return 'inf'
+    return '<=%g' % (seconds * 1e6)
+
+
+def _handler(metrics):
+    """Creates the HTTP request handler class serving the metrics
+
+    Parameters
+    ----------
+    metrics:
+        The Metrics to serve
+
+    Returns
+    -------
+        The handler class
+
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type',
+                             'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            # Scrapes are not worth a line on stderr each
+            pass
+
+    return MetricsHandler
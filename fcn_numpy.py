@@ -0,0 +1,236 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node NumPy Encoder
+- Encode large batches of flow rules in one vectorised pass
+
+Requires NumPy
+
+Example
+-------
+    records = encode_records(srcip=ip_array(sources),
+                             destip=ip_array(destinations),
+                             srcport=ports, destport=5000, prototype=6,
+                             prio=1, timeoutval=60, mclass='myclass')
+    for data in encode_messages(FCN.__new__(FCN), records, seq_no=1):
+        ...
+
+"""
+import socket
+import struct
+
+import numpy
+
+from fcn import FCN
+from fcn_batch import DATA_MESSAGE_OVERHEAD
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_batch import MAX_MSG_SIZE
+from fcn_batch import MESSAGE_OVERHEAD
+from fcn_rule import FlowRule
+
+
+def record_dtype(class_len):
+    """Creates the structured dtype of a data record, see
+    FCN.pack_msg_payload for the layout
+
+    Parameters
+    ----------
+    class_len:
+        Length of the class name in bytes
+
+    Returns
+    -------
+        Packed big endian record dtype
+
+    """
+    return numpy.dtype([('export', 'S8'),
+                        ('msg_type', 'u1'),
+                        ('srcip', '>u4'),
+                        ('destip', '>u4'),
+                        ('srcport', '>u2'),
+                        ('destport', '>u2'),
+                        ('prototype', 'u1'),
+                        ('packet_count', '>u4'),
+                        ('kbyte_count', '>u4'),
+                        ('class_len', 'u1'),
+                        # Class name is followed by two padding bytes
+                        ('mclass', 'S%d' % (class_len + 2)),
+                        ('prio', 'u1'),
+                        ('timeout_type', 'u1'),
+                        ('timeoutval', '>u2'),
+                        ('action', '>u8'),
+                        ('a_flg', '>u2'),
+                        ('action_params', 'V16')])
+
+
+def ip_array(addresses):
+    """Converts IPv4 addresses in x.x.x.x format to integers
+
+    Parameters
+    ----------
+    addresses:
+        Iterable of IP address strings
+
+    Returns
+    -------
+        uint32 array
+
+    """
+    return numpy.array([
+        struct.unpack('!I', socket.inet_aton(FCN.ip_check(address)))[0]
+        for address in addresses], dtype=numpy.uint32)
+
+
+def _checked(name, values, low, high):
+    """Checks an array of field values is within range
+
+    Parameters
+    ----------
+    name:
+        Field name for the error message
+    values:
+        Scalar or array of values
+    low:
+        Lowest valid value
+    high:
+        Highest valid value
+
+    Returns
+    -------
+        The values as an int64 array
+
+    """
+    values = numpy.asarray(values, dtype=numpy.int64)
+    if values.size and (values.min() < low or values.max() > high):
+        raise NameError('Error: %s must be between %d and %d'
+                        % (name, low, high))
+    return values
+
+
+def encode_records(srcip, destip, srcport, destport, prototype, prio,
+                   timeoutval, msgtype=0, mclass='myclass', export='myexp',
+                   a_flg=1):
+    """Encodes many data records at once. Array arguments must share one
+    length, scalars apply to every record
+
+    Parameters
+    ----------
+    srcip:
+        Source IPs as 32 bit integers
+    destip:
+        Destination IPs as 32 bit integers
+    srcport:
+        Source ports
+    destport:
+        Destination ports
+    prototype:
+        Protocol types
+    prio:
+        Table priorities
+    timeoutval:
+        Timeout values in seconds
+    msgtype:
+        Message types
+    mclass:
+        Name of class shared by every record
+    export:
+        Name of export shared by every record
+    a_flg:
+        Action flag shared by every record
+
+    Returns
+    -------
+        Structured array of records, .tobytes() gives the packed records
+
+    """
+    class_name = FCN.to_bytes(mclass)
+    if len(class_name) + 4 > 255:
+        raise NameError('Error: Message field out of range')
+    columns = {
+        'srcip': _checked('Source IP', srcip, 0, 0xffffffff),
+        'destip': _checked('Destination IP', destip, 0, 0xffffffff),
+        'srcport': _checked('Port', srcport, 0, 65535),
+        'destport': _checked('Port', destport, 0, 65535),
+        'prototype': _checked('Protocol type', prototype, 0, 255),
+        'prio': _checked('Priority', prio, 0, 255),
+        'timeoutval': _checked('Timeout', timeoutval, 0, 65535),
+        'msg_type': _checked('Msg type', msgtype, 0, 2),
+    }
+    try:
+        count = numpy.broadcast(*columns.values()).size
+    except ValueError:
+        raise NameError('Error: Rule arrays differ in length')
+
+    records = numpy.zeros(count, dtype=record_dtype(len(class_name)))
+    for name, values in columns.items():
+        records[name] = values
+    records['export'] = FCN.to_bytes(FCN.export_name_check(export))
+    records['class_len'] = len(class_name) + 4
+    records['mclass'] = class_name
+    records['a_flg'] = _checked('Action flag', a_flg, 0, 65535)
+
+    return records
+
+
+def encode_messages(encoder, records, seq_no=0, msg_size=DEFAULT_MSG_SIZE,
+                    session=False):
+    """Splits encoded records into RAP messages of up to msg_size bytes
+
+    Parameters
+    ----------
+    encoder:
+        The FCN instance used to pack headers and templates
+    records:
+        Records from encode_records
+    seq_no:
+        Sequence number of the first record. Each message takes the
+        sequence number of its first record
+    msg_size:
+        Maximum RAP message size in bytes
+    session:
+        Build data-only messages without the template
+
+    Returns
+    -------
+        Generator of serialised messages
+
+    """
+    overhead = DATA_MESSAGE_OVERHEAD if session else MESSAGE_OVERHEAD
+    pack = encoder.pack_data_batch if session else encoder.pack_batch
+    if not overhead < msg_size <= MAX_MSG_SIZE:
+        raise NameError('Error: Message size must be between %d and %d'
+                        % (overhead + 1, MAX_MSG_SIZE))
+    per_message = max(1, (msg_size - overhead) // records.dtype.itemsize)
+    data = records.tobytes()
+    step = per_message * records.dtype.itemsize
+    first = FlowRule(seq_no=seq_no)
+    for index, start in enumerate(range(0, len(data), step)):
+        first.seq_no = (seq_no + index * per_message) & 0xffffffff
+        yield pack(first, [data[start:start + step]])
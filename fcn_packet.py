@@ -0,0 +1,133 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Packet Builder
+- Reuse one preallocated RAP message and patch fields in place
+
+"""
+import struct
+
+# Sequence number and export time in the message header
+HEADER_PATCH_STRUCT = struct.Struct('!II')
+HEADER_PATCH_OFFSET = 4
+# Source IP, destination IP, source port, destination port and protocol
+# in a data record
+FLOW_PATCH_STRUCT = struct.Struct('!IIHHB')
+FLOW_PATCH_OFFSET = 9
+# Message type in a data record
+MSG_TYPE_OFFSET = 8
+
+
+class PacketBuilder(object):
+    """Preallocated RAP message holding one or more copies of a rule.
+    The sequence number, export time and 5-tuples are patched in place,
+    so sending another message allocates nothing. Patched values are not
+    validated
+
+    """
+
+    def __init__(self, encoder, rule, records=1, session=False):
+        """Initialise the packet builder
+
+        Parameters
+        ----------
+        encoder:
+            The FCN instance used to pack the initial message
+        rule:
+            The rule copied into every record, validated by the encoder
+        records:
+            Number of data records in the message
+        session:
+            Build a data-only message without the template
+
+        """
+        payload = encoder.pack_msg_payload(cli_inputs=rule)
+        if session:
+            data = encoder.pack_data_batch(rule, [payload] * records)
+        else:
+            data = encoder.pack_batch(rule, [payload] * records)
+        self.buffer = bytearray(data)
+        self.records = records
+        self.record_len = len(payload)
+        self.payload_offset = len(data) - records * len(payload)
+
+    def patch_header(self, seq_no, export_time):
+        """Sets the sequence number and export time
+
+        Parameters
+        ----------
+        seq_no:
+            Sequence number
+        export_time:
+            Export time in seconds since the epoch
+
+        """
+        HEADER_PATCH_STRUCT.pack_into(self.buffer, HEADER_PATCH_OFFSET,
+                                      seq_no, export_time)
+
+    def patch_flow(self, record, srcip, destip, srcport, destport,
+                   prototype):
+        """Sets the 5-tuple of a data record
+
+        Parameters
+        ----------
+        record:
+            Index of the data record
+        srcip:
+            Source IP as a 32 bit integer
+        destip:
+            Destination IP as a 32 bit integer
+        srcport:
+            Source port
+        destport:
+            Destination port
+        prototype:
+            Protocol type
+
+        """
+        FLOW_PATCH_STRUCT.pack_into(
+            self.buffer,
+            self.payload_offset + record * self.record_len +
+            FLOW_PATCH_OFFSET,
+            srcip, destip, srcport, destport, prototype)
+
+    def patch_msg_type(self, record, msg_type):
+        """Sets the message type of a data record
+
+        Parameters
+        ----------
+        record:
+            Index of the data record
+        msg_type:
+            0: Add, 1: Remove, 2: Remove All
+
+        """
+        self.buffer[self.payload_offset + record * self.record_len +
+                    MSG_TYPE_OFFSET] = msg_type
@@ -0,0 +1,737 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Capture Files
+- Write RAP messages to pcap or pcapng files instead of sending them, with
+  synthetic Ethernet, IPv4 and UDP or TCP framing, for replay with tools
+  such as tcpreplay
+- Read the flows of a capture file back as flow rules
+
+"""
+import collections
+import os
+import socket
+import struct
+import time
+
+from fcn_rule import FlowRule
+
+PCAP_FORMATS = ['pcap', 'pcapng']
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+SNAPLEN = 65535
+
+# Locally administered MAC addresses of the synthetic hosts
+SOURCE_MAC = b'\x02\x00\x00\x00\x00\x01'
+DESTINATION_MAC = b'\x02\x00\x00\x00\x00\x02'
+ETHERNET_HEADER = DESTINATION_MAC + SOURCE_MAC + b'\x08\x00'
+
+IP_HEADER_STRUCT = struct.Struct('!BBHHHBBH4s4s')
+UDP_HEADER_STRUCT = struct.Struct('!HHHH')
+TCP_HEADER_STRUCT = struct.Struct('!HHIIBBHHH')
+PSEUDO_HEADER_STRUCT = struct.Struct('!4s4sBBH')
+# Version and header length, total length, fragment offset, protocol,
+# source and destination
+IP_FLOW_STRUCT = struct.Struct('!BxH2xHxB2x4s4s')
+
+# TCP, UDP, SCTP and UDP-Lite start with the source and destination ports
+PORT_PROTOCOLS = (6, 17, 132, 136)
+
+# Largest IP packet on the synthetic Ethernet link
+MTU = 1500
+TCP_MSS = MTU - 40
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+
+PCAP_HEADER_STRUCT = struct.Struct('<IHHiIII')
+PCAP_RECORD_STRUCT = struct.Struct('<IIII')
+PCAPNG_BLOCK_HEAD_STRUCT = struct.Struct('<II')
+PCAPNG_PACKET_HEAD_STRUCT = struct.Struct('<IIIIIII')
+
+
+def checksum(data):
+    """Internet checksum, the ones' complement of the ones' complement sum
+    of 16 bit words
+
+    Parameters
+    ----------
+    data:
+        The bytes to sum
+
+    Returns
+    -------
+        The checksum
+
+    """
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+
+    return ~total & 0xffff
+
+
+def pcap_format(path, fmt=None):
+    """Works out the format of a capture file
+
+    Parameters
+    ----------
+    path:
+        Path of the capture file
+    fmt:
+        pcap or pcapng, None to go by the file extension
+
+    Returns
+    -------
+        The format
+
+    """
+    if fmt is None:
+        if os.path.splitext(path)[1].lower() == '.pcapng':
+            return 'pcapng'
+        return 'pcap'
+    if fmt not in PCAP_FORMATS:
+        raise NameError('Error: Capture format must be pcap or pcapng')
+
+    return fmt
+
+
+class PcapWriter(object):
+    """Writes Ethernet frames to a pcap or pcapng stream
+
+    """
+
+    def __init__(self, stream, fmt='pcap'):
+        """Initialise the writer and write the file header
+
+        Parameters
+        ----------
+        stream:
+            Binary file object
+        fmt:
+            pcap or pcapng
+
+        """
+        self.stream = stream
+        self.fmt = pcap_format('', fmt)
+        self.packets = 0
+        if self.fmt == 'pcap':
+            stream.write(PCAP_HEADER_STRUCT.pack(
+                0xa1b2c3d4, 2, 4, 0, 0, SNAPLEN, LINKTYPE_ETHERNET))
+        else:
+            # Section header block, then one interface with the default
+            # microsecond timestamps
+            stream.write(struct.pack('<IIIHHqI', 0x0a0d0d0a, 28, 0x1a2b3c4d,
+                                     1, 0, -1, 28))
+            stream.write(struct.pack('<IIHHII', 1, 20, LINKTYPE_ETHERNET, 0,
+                                     SNAPLEN, 20))
+
+    def write(self, frame, timestamp):
+        """Writes one frame
+
+        Parameters
+        ----------
+        frame:
+            The Ethernet frame
+        timestamp:
+            Capture time in seconds since the epoch
+
+        """
+        usec = int(round(timestamp * 1e6))
+        length = len(frame)
+        if self.fmt == 'pcap':
+            self.stream.write(PCAP_RECORD_STRUCT.pack(
+                usec // 1000000, usec % 1000000, length, length))
+            self.stream.write(frame)
+        else:
+            padding = -length % 4
+            block_len = 32 + length + padding
+            self.stream.write(PCAPNG_PACKET_HEAD_STRUCT.pack(
+                6, block_len, 0, usec >> 32, usec & 0xffffffff, length,
+                length))
+            self.stream.write(frame)
+            self.stream.write(b'\x00' * padding +
+                              struct.pack('<I', block_len))
+        self.packets += 1
+
+
+def ip_packets(payload, proto, src, dst, ident):
+    """Frames a transport segment in IPv4, fragmenting it to fit the MTU
+
+    Parameters
+    ----------
+    payload:
+        The UDP or TCP segment
+    proto:
+        IP protocol number
+    src:
+        Packed source address
+    dst:
+        Packed destination address
+    ident:
+        IP identification
+
+    Returns
+    -------
+        List of Ethernet frames
+
+    """
+    frames = []
+    chunk = (MTU - 20) // 8 * 8
+    offset = 0
+    while True:
+        part = payload[offset:offset + chunk]
+        more = offset + chunk < len(payload)
+        flags = (0x2000 if more else 0) | offset // 8
+        if offset == 0 and not more:
+            # Don't fragment
+            flags = 0x4000
+        header = IP_HEADER_STRUCT.pack(0x45, 0, 20 + len(part), ident, flags,
+                                       64, proto, 0, src, dst)
+        header = (header[:10] + struct.pack('!H', checksum(header)) +
+                  header[12:])
+        frames.append(ETHERNET_HEADER + header + part)
+        offset += chunk
+        if not more:
+            return frames
+
+
+class PcapTransport(object):
+    """Stands in for Transport, writing each RAP message to a capture file
+    as the packets that sending it would produce
+    TCP connections get a handshake when first used and are closed with
+    FIN segments by close
+
+    """
+
+    def __init__(self, path, fmt=None, source='192.0.2.1',
+                 template_interval=60, clock=time.time):
+        """Initialise the transport and open the capture file
+
+        Parameters
+        ----------
+        path:
+            Path of the capture file
+        fmt:
+            pcap or pcapng, None to go by the file extension
+        source:
+            Source IP of the synthetic packets
+        template_interval:
+            Seconds between template messages over UDP in session mode
+        clock:
+            Returns the timestamp of each packet
+
+        """
+        try:
+            self.source = socket.inet_pton(socket.AF_INET, source)
+        except socket.error:
+            raise NameError('Error: Invalid capture source IP')
+        fmt = pcap_format(path, fmt)
+        try:
+            self.stream = open(path, 'wb')
+        except IOError:
+            raise NameError('Error: Couldn\'t open capture file')
+        self.writer = PcapWriter(self.stream, fmt)
+        self.template_interval = template_interval
+        self.clock = clock
+        self.ident = 0
+        # Flow state of each host, port and protocol
+        self.sockets = {}
+        self.template_times = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, data, host, port, proto, template=None):
+        """Writes a RAP message to the capture file
+
+        Parameters
+        ----------
+        data:
+            The serialised message
+        host:
+            Action Node IP
+        port:
+            Output port to the Action Node
+        proto:
+            Protocol to the Action Node, TCP or UDP
+        template:
+            Session mode. Called with data to build a template message,
+            which is written first on every new TCP connection and every
+            template_interval seconds over UDP
+
+        """
+        key = (host, port, proto.lower())
+        flow = self.sockets.get(key)
+        if flow is None:
+            flow = self.open(key)
+        now = self.clock()
+        if template is not None and self.template_due(key, now):
+            self.write_data(flow, bytes(template(data)), now)
+            self.template_times[key] = now
+        self.write_data(flow, bytes(data), now)
+
+    def template_due(self, key, now):
+        """Checks if a session needs the template written
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+        now:
+            The current time
+
+        Returns
+        -------
+            True if the template has never been written on this flow, or
+            is stale on a UDP flow
+
+        """
+        sent = self.template_times.get(key)
+        if sent is None:
+            return True
+        return key[2] == 'udp' and now - sent >= self.template_interval
+
+    def open(self, key):
+        """Starts a flow, writing the handshake for TCP
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        Returns
+        -------
+        flow:
+            Dict of the flow's addresses, ports and TCP sequence numbers
+
+        """
+        host, port, proto = key
+        try:
+            destination = socket.inet_pton(socket.AF_INET, host)
+        except socket.error:
+            raise NameError('Error: Invalid IP')
+        flow = {'src': self.source, 'dst': destination,
+                'sport': 49152 + len(self.sockets) % 16384, 'dport': port,
+                'proto': proto, 'seq': 1000, 'ack': 2000}
+        self.sockets[key] = flow
+        if proto == 'tcp':
+            now = self.clock()
+            self.write_segment(flow, TCP_SYN, b'', now)
+            self.write_segment(flow, TCP_SYN | TCP_ACK, b'', now, reply=True)
+            self.write_segment(flow, TCP_ACK, b'', now)
+
+        return flow
+
+    def write_data(self, flow, data, now):
+        """Writes the packets carrying one message
+
+        Parameters
+        ----------
+        flow:
+            The flow state
+        data:
+            The message
+        now:
+            Timestamp of the packets
+
+        """
+        if flow['proto'] == 'udp':
+            if len(data) > 65507:
+                raise NameError('Error: Message too large for UDP')
+            header = UDP_HEADER_STRUCT.pack(flow['sport'], flow['dport'],
+                                            8 + len(data), 0)
+            pseudo = PSEUDO_HEADER_STRUCT.pack(
+                flow['src'], flow['dst'], 0, socket.IPPROTO_UDP,
+                8 + len(data))
+            # Zero means no checksum in UDP
+            csum = checksum(pseudo + header + data) or 0xffff
+            self.write_ip(flow, socket.IPPROTO_UDP,
+                          header[:6] + struct.pack('!H', csum) + data, now)
+            return
+        for offset in range(0, len(data), TCP_MSS):
+            self.write_segment(flow, TCP_PSH | TCP_ACK,
+                               data[offset:offset + TCP_MSS], now)
+
+    def write_segment(self, flow, flags, data, now, reply=False):
+        """Writes a TCP segment and advances the sequence numbers
+
+        Parameters
+        ----------
+        flow:
+            The flow state
+        flags:
+            TCP flags
+        data:
+            The segment payload
+        now:
+            Timestamp of the packet
+        reply:
+            The segment goes from the Action Node back to the sender
+
+        """
+        src, dst = flow['src'], flow['dst']
+        sport, dport = flow['sport'], flow['dport']
+        seq, ack = flow['seq'], flow['ack']
+        if reply:
+            src, dst, sport, dport, seq, ack = dst, src, dport, sport, ack, seq
+        if flags == TCP_SYN:
+            ack = 0
+        header = TCP_HEADER_STRUCT.pack(sport, dport, seq, ack, 0x50, flags,
+                                        65535, 0, 0)
+        pseudo = PSEUDO_HEADER_STRUCT.pack(src, dst, 0, socket.IPPROTO_TCP,
+                                           20 + len(data))
+        csum = checksum(pseudo + header + data)
+        segment = header[:16] + struct.pack('!H', csum) + header[18:] + data
+        self.write_ip(flow, socket.IPPROTO_TCP, segment, now,
+                      reverse=reply)
+        step = len(data) + (1 if flags & (TCP_SYN | TCP_FIN) else 0)
+        flow['ack' if reply else 'seq'] = (
+            (ack if reply else seq) + step) & 0xffffffff
+
+    def write_ip(self, flow, proto, segment, now, reverse=False):
+        """Frames a segment in IPv4 and writes it
+
+        """
+        src, dst = flow['src'], flow['dst']
+        if reverse:
+            src, dst = dst, src
+        self.ident = (self.ident + 1) & 0xffff
+        for frame in ip_packets(segment, proto, src, dst, self.ident):
+            self.writer.write(frame, now)
+
+    def close_socket(self, key):
+        """Ends a flow, writing the FIN exchange for TCP
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        """
+        flow = self.sockets.pop(key, None)
+        self.template_times.pop(key, None)
+        if flow is not None and flow['proto'] == 'tcp':
+            now = self.clock()
+            self.write_segment(flow, TCP_FIN | TCP_ACK, b'', now)
+            self.write_segment(flow, TCP_FIN | TCP_ACK, b'', now, reply=True)
+            self.write_segment(flow, TCP_ACK, b'', now)
+
+    def close(self):
+        """Ends every flow and closes the capture file
+
+        """
+        if self.stream.closed:
+            return
+        for key in list(self.sockets):
+            self.close_socket(key)
+        self.stream.close()
+
+
+def read_packets(stream):
+    """Reads the packets of a pcap or pcapng stream one at a time, so memory
+    use does not grow with the file
+
+    Parameters
+    ----------
+    stream:
+        Binary file object
+
+    Returns
+    -------
+        Generator of (timestamp, link type, packet data)
+
+    """
+    magic = stream.read(4)
+    if magic == b'\x0a\x0d\x0d\x0a':
+        return _read_pcapng(stream, magic)
+    for order in '<>':
+        number = struct.unpack(order + 'I', magic)[0] if len(magic) == 4 \
+            else None
+        if number in (0xa1b2c3d4, 0xa1b23c4d):
+            return _read_pcap(stream, order, number == 0xa1b23c4d)
+    raise NameError('Error: Not a pcap or pcapng file')
+
+
+def _read_pcap(stream, order, nanoseconds):
+    """Reads the records of a pcap stream after the magic number
+
+    """
+    header = stream.read(20)
+    if len(header) < 20:
+        raise NameError('Error: Truncated capture file')
+    linktype = struct.unpack(order + 'I', header[16:])[0] & 0xffff
+    record_struct = struct.Struct(order + 'IIII')
+    scale = 1e-9 if nanoseconds else 1e-6
+    while True:
+        head = stream.read(16)
+        if len(head) < 16:
+            return
+        sec, frac, length, _ = record_struct.unpack(head)
+        data = stream.read(length)
+        if len(data) < length:
+            return
+        yield sec + frac * scale, linktype, data
+
+
+def _read_pcapng(stream, magic):
+    """Reads the packet blocks of a pcapng stream after the first block
+    type
+
+    """
+    order = '<'
+    # Link type and timestamp units of each interface in the section
+    interfaces = []
+    block_type = magic
+    while True:
+        head = stream.read(8)
+        if len(head) < 8:
+            return
+        if block_type == b'\x0a\x0d\x0d\x0a':
+            order = '<' if head[4:8] == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+        block_len = struct.unpack(order + 'I', head[:4])[0]
+        rest = stream.read(block_len - 12) if block_len >= 12 else b''
+        if block_len < 12 or len(rest) < block_len - 12:
+            return
+        # Block body followed by the trailing block length
+        body = head[4:] + rest
+        if block_type != b'\x0a\x0d\x0d\x0a':
+            number = struct.unpack(order + 'I', block_type)[0]
+            if number == 1:
+                interfaces.append(_interface(order, body))
+            elif number == 6:
+                interface, high, low, length = struct.unpack(
+                    order + 'IIII', body[:16])
+                linktype, scale = interfaces[interface]
+                yield ((high << 32 | low) * scale, linktype,
+                       body[20:20 + length])
+            elif number == 3:
+                # Simple packet block, no timestamp
+                length = struct.unpack(order + 'I', body[:4])[0]
+                yield 0.0, interfaces[0][0], body[4:4 + length]
+        block_type = stream.read(4)
+        if len(block_type) < 4:
+            return
+
+
+def _interface(order, body):
+    """Reads the link type and timestamp units of an interface description
+    block
+
+    """
+    linktype = struct.unpack(order + 'H', body[:2])[0]
+    scale = 1e-6
+    offset = 8
+    while offset + 4 <= len(body) - 4:
+        code, length = struct.unpack(order + 'HH', body[offset:offset + 4])
+        if code == 0:
+            break
+        if code == 9:
+            resolution = bytearray(body[offset + 4:offset + 5])[0]
+            if resolution & 0x80:
+                scale = 2.0 ** -(resolution & 0x7f)
+            else:
+                scale = 10.0 ** -resolution
+        offset += 4 + length + (-length % 4)
+
+    return linktype, scale
+
+
+def ip_offset(linktype, data):
+    """Finds the IPv4 header in a captured packet
+
+    Parameters
+    ----------
+    linktype:
+        Link type of the capture
+    data:
+        The packet
+
+    Returns
+    -------
+        Offset of the IPv4 header, or None if the packet is not IPv4
+
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = data[offset:offset + 2]
+        # Skip 802.1Q and 802.1ad tags
+        while ethertype in (b'\x81\x00', b'\x88\xa8'):
+            offset += 4
+            ethertype = data[offset:offset + 2]
+        offset += 2
+    elif linktype == LINKTYPE_LINUX_SLL:
+        ethertype = data[14:16]
+        offset = 16
+    elif linktype == LINKTYPE_NULL:
+        # Host byte order address family of the capturing machine
+        family = data[:4]
+        ethertype = b'\x08\x00' if family in (b'\x02\x00\x00\x00',
+                                              b'\x00\x00\x00\x02') else b''
+        offset = 4
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        ethertype = b'\x08\x00'
+        offset = 0
+    else:
+        return None
+    version = bytearray(data[offset:offset + 1])
+    if ethertype != b'\x08\x00' or not version or version[0] >> 4 != 4:
+        return None
+
+    return offset
+
+
+def flow_key(linktype, data):
+    """Reads the 5-tuple of a captured IPv4 packet
+
+    Parameters
+    ----------
+    linktype:
+        Link type of the capture
+    data:
+        The packet
+
+    Returns
+    -------
+        ((srcip, destip, srcport, destport, prototype), IP length), or None
+        for packets that are not IPv4 and for fragments after the first,
+        whose ports are unknown. Ports are 0 for protocols without them
+
+    """
+    offset = ip_offset(linktype, data)
+    if offset is None or len(data) < offset + 20:
+        return None
+    (version_ihl, length, fragment, prototype, source,
+     destination) = IP_FLOW_STRUCT.unpack_from(data, offset)
+    if fragment & 0x1fff:
+        return None
+    source_port = destination_port = 0
+    if prototype in PORT_PROTOCOLS:
+        offset += (version_ihl & 0x0f) * 4
+        if len(data) >= offset + 4:
+            source_port, destination_port = struct.unpack_from(
+                '!HH', data, offset)
+
+    return ((socket.inet_ntoa(source), socket.inet_ntoa(destination),
+             source_port, destination_port, prototype), length)
+
+
+def read_flows(stream, defaults, counts=False):
+    """Streams the distinct flows of a capture file as Add rules
+
+    Parameters
+    ----------
+    stream:
+        Binary pcap or pcapng file object
+    defaults:
+        The command line inputs used for the fields that are not part of
+        the 5-tuple. Rules are numbered on from the command line seqno
+    counts:
+        Fill in the packet and kbyte counts of each flow. Rules are then
+        only produced once the whole capture is read, otherwise each flow
+        is produced when its first packet is read
+
+    Returns
+    -------
+        Generator of (packet number, rule), the packet number being that of
+        the flow's first packet
+
+    """
+    seq_no = defaults.seq_no
+    if counts:
+        # 5-tuple -> [first packet number, packets, bytes]
+        flows = collections.OrderedDict()
+    else:
+        flows = set()
+    for packet_no, (_, linktype, data) in enumerate(read_packets(stream), 1):
+        flow = flow_key(linktype, data)
+        if flow is None:
+            continue
+        key, length = flow
+        if counts:
+            totals = flows.get(key)
+            if totals is None:
+                totals = flows[key] = [packet_no, 0, 0]
+            totals[1] += 1
+            totals[2] += length
+        elif key not in flows:
+            flows.add(key)
+            yield packet_no, flow_rule(defaults, key, seq_no)
+            seq_no = (seq_no + 1) & 0xffffffff
+    if counts:
+        for key, (packet_no, packets, octets) in flows.items():
+            yield packet_no, flow_rule(defaults, key, seq_no,
+                                       min(packets, 0xffffffff),
+                                       min(octets // 1024, 0xffffffff))
+            seq_no = (seq_no + 1) & 0xffffffff
+
+
+def flow_rule(defaults, key, seq_no, packet_count=0, kbyte_count=0):
+    """Creates the Add rule for a flow
+
+    Parameters
+    ----------
+    defaults:
+        The command line inputs
+    key:
+        The flow's 5-tuple
+    seq_no:
+        Sequence number of the rule
+    packet_count:
+        Packets seen in the flow
+    kbyte_count:
+        Kilobytes seen in the flow, counting IP lengths
+
+    Returns
+    -------
+        The rule with the FCN input attributes
+
+    """
+    rule = FlowRule.from_inputs(defaults)
+    (rule.srcip, rule.destip, rule.srcport, rule.destport,
+     rule.prototype) = key
+    rule.msgtype = 0
+    rule.seq_no = seq_no
+    rule.packet_count = packet_count
+    rule.kbyte_count = kbyte_count
+
+    return rule
@@ -0,0 +1,304 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Refresh Scheduler
+- Re-send Adds shortly before their timeout so long-lived flows stay
+  installed on the Action Node
+
+"""
+import time
+
+
+class TimerWheel(object):
+    """Hierarchical timer wheel
+    Scheduling and cancelling are O(1). Level 0 has one slot per tick, each
+    slot of level n spans slots ** n ticks and is moved down a level when
+    the wheel reaches it
+
+    """
+
+    def __init__(self, tick=1.0, bits=8, levels=4, start=0):
+        """Initialise the timer wheel
+
+        Parameters
+        ----------
+        tick:
+            Seconds per level 0 slot, timers due in the same tick expire
+            together
+        bits:
+            Each level has 2 ** bits slots
+        levels:
+            Number of levels. Timers further away than
+            tick * 2 ** (bits * levels) wait in the last slot of the top
+            level until they come into range
+        start:
+            Time the wheel starts at
+
+        """
+        self.tick = float(tick)
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.levels = levels
+        self.span = 1 << (bits * levels)
+        self.now = int(start // self.tick)
+        self.slots = [[{} for _ in range(1 << bits)] for _ in range(levels)]
+        # Key -> (due tick, level, slot)
+        self.timers = {}
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def schedule(self, key, item, when):
+        """Schedules a timer, replacing any timer with the same key
+
+        Parameters
+        ----------
+        key:
+            Hashable timer key
+        item:
+            Returned with the key when the timer expires
+        when:
+            Time the timer is due. Times already passed are due at the next
+            tick
+
+        """
+        if key in self.timers:
+            self.cancel(key)
+        self.place(key, item, max(int(when // self.tick), self.now + 1))
+
+    def place(self, key, item, due):
+        """Puts a timer in the slot for its due tick
+
+        """
+        delta = min(due - self.now, self.span - 1)
+        # Timers moved down on the tick they are due have a delta of 0
+        level = (max(delta, 1).bit_length() - 1) // self.bits
+        slot = ((self.now + delta) >> (self.bits * level)) & self.mask
+        self.slots[level][slot][key] = item
+        self.timers[key] = (due, level, slot)
+
+    def cancel(self, key):
+        """Cancels a timer
+
+        Parameters
+        ----------
+        key:
+            The timer key
+
+        Returns
+        -------
+            The item of the timer, None if there was no timer
+
+        """
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return None
+        _, level, slot = timer
+        return self.slots[level][slot].pop(key)
+
+    def advance(self, now):
+        """Moves the wheel forward to a time
+
+        Parameters
+        ----------
+        now:
+            The current time
+
+        Returns
+        -------
+            List of (key, item) of the timers that expired, in order of
+            their due tick
+
+        """
+        target = int(now // self.tick)
+        expired = []
+        timers = self.timers
+        level0 = self.slots[0]
+        while self.now < target:
+            if not timers:
+                # Nothing to move down or expire
+                self.now = target
+                break
+            self.now += 1
+            slot = self.now & self.mask
+            if slot == 0:
+                self.cascade(1)
+            due = level0[slot]
+            if due:
+                level0[slot] = {}
+                for key, item in due.items():
+                    if timers[key][0] > self.now:
+                        # Out of range of a single level wheel when placed
+                        self.place(key, item, timers[key][0])
+                    else:
+                        del timers[key]
+                        expired.append((key, item))
+
+        return expired
+
+    def cascade(self, level):
+        """Moves the timers of the slot the wheel has reached on a level
+        down to the levels below
+
+        """
+        if level >= self.levels:
+            return
+        slot = (self.now >> (self.bits * level)) & self.mask
+        if slot == 0:
+            self.cascade(level + 1)
+        timers = self.slots[level][slot]
+        if not timers:
+            return
+        self.slots[level][slot] = {}
+        for key, item in timers.items():
+            self.place(key, item, self.timers[key][0])
+
+    def clear(self):
+        """Cancels every timer
+
+        """
+        for level in self.slots:
+            for slot in range(len(level)):
+                level[slot] = {}
+        self.timers.clear()
+
+
+class RefreshScheduler(object):
+    """Re-sends Adds lead seconds before they time out on the Action Node
+    Refreshes due in the same tick are handed over together so they can
+    be packed into multi-record messages
+
+    """
+
+    def __init__(self, send, lead=5, tick=1.0, clock=time.time):
+        """Initialise the refresh scheduler
+
+        Parameters
+        ----------
+        send:
+            Called with the list of rules due for refresh
+        lead:
+            Seconds before the timeout to refresh a rule. Rules with a
+            timeoutval of lead or less are refreshed halfway through
+            their timeout
+        tick:
+            Seconds per timer wheel slot
+        clock:
+            Returns the current time in seconds
+
+        """
+        self.send = send
+        self.lead = lead
+        self.clock = clock
+        self.wheel = TimerWheel(tick, start=clock())
+        self.refreshed = 0
+
+    def __len__(self):
+        return len(self.wheel)
+
+    @staticmethod
+    def flow_key(rule):
+        """Key of the flow a rule applies to
+
+        """
+        return (rule.srcip, rule.destip, rule.srcport, rule.destport,
+                rule.prototype, rule.mclass)
+
+    def interval(self, rule):
+        """Seconds between sending a rule and refreshing it
+
+        """
+        if rule.timeoutval > self.lead:
+            return rule.timeoutval - self.lead
+        return rule.timeoutval / 2.0
+
+    def track(self, rule, now=None):
+        """Starts refreshing a rule that was just sent, or restarts its
+        timer
+
+        Parameters
+        ----------
+        rule:
+            The Add rule
+        now:
+            Time it was sent (Default: clock())
+
+        """
+        if now is None:
+            now = self.clock()
+        self.wheel.schedule(self.flow_key(rule), rule,
+                            now + self.interval(rule))
+
+    def forget(self, rule):
+        """Stops refreshing the flow of a rule
+
+        Parameters
+        ----------
+        rule:
+            Any rule for the flow
+
+        """
+        self.wheel.cancel(self.flow_key(rule))
+
+    def clear(self):
+        """Stops refreshing every flow
+
+        """
+        self.wheel.clear()
+
+    def poll(self, now=None):
+        """Sends the refreshes that are due
+
+        Parameters
+        ----------
+        now:
+            The current time (Default: clock())
+
+        Returns
+        -------
+            The number of rules refreshed
+
+        """
+        if now is None:
+            now = self.clock()
+        due = self.wheel.advance(now)
+        if not due:
+            return 0
+        rules = []
+        for key, rule in due:
+            rules.append(rule)
+            self.wheel.schedule(key, rule, now + self.interval(rule))
+        self.send(rules)
+        self.refreshed += len(rules)
+
+        return len(rules)
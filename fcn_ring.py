@@ -0,0 +1,359 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Ring Buffer
+- Take flow rules from a co-located classifier through a memory-mapped
+  single-producer single-consumer ring
+
+The ring is a file, ideally on a RAM file system such as /dev/shm, that
+both processes map. All fields are little-endian
+
+    Offset  Field
+    0       Magic b'FCNRING1', record size and capacity (uint32 each)
+    64      Head, records written by the producer (uint64)
+    128     Tail, records read by the consumer (uint64)
+    192     capacity slots of RING_RECORD_STRUCT
+
+Record i is in slot i % capacity. The producer writes the record, then
+stores the new head. The consumer reads records up to the head, then
+stores the new tail, freeing their slots. Head and tail only grow and sit
+on their own cache lines. A C producer should store the head with release
+ordering. Nothing on the data path makes a system call.
+
+Record fields: srcip, destip (integers, 10.0.0.1 is 0x0a000001), srcport,
+destport, prototype, msgtype, prio, class name length, timeoutval,
+packet_count, kbyte_count and the class name (up to 20 bytes). A class
+name length of 0 uses the default class
+
+"""
+import mmap
+import os
+import struct
+import time
+
+from fcn_batch import DATA_MESSAGE_OVERHEAD
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_batch import MAX_MSG_SIZE
+from fcn_batch import MESSAGE_OVERHEAD
+from fcn_rule import MSG_REMOVE_ALL
+from fcn_rule import RECORD_HEAD_STRUCT
+from fcn_rule import RECORD_TAIL_STRUCT
+from fcn_rule import pack_records
+
+RING_MAGIC = b'FCNRING1'
+RING_HEADER_STRUCT = struct.Struct('<8sII')
+INDEX_STRUCT = struct.Struct('<Q')
+HEAD_OFFSET = 64
+TAIL_OFFSET = 128
+RECORDS_OFFSET = 192
+RING_RECORD_STRUCT = struct.Struct('<IIHHBBBBH2xII20s')
+MAX_CLASS_LEN = 20
+DEFAULT_CAPACITY = 65536
+
+
+class RingBuffer(object):
+    """Memory-mapped single-producer single-consumer ring of flow records
+
+    """
+
+    def __init__(self, path, capacity=None):
+        """Map a ring, creating it when a capacity is given
+
+        Parameters
+        ----------
+        path:
+            The ring file
+        capacity:
+            Number of slots, a power of two. The file is created, or
+            cleared if it exists. None to map an existing ring
+
+        """
+        if capacity is not None:
+            if capacity < 1 or capacity & (capacity - 1):
+                raise NameError('Error: Ring capacity must be a power of two')
+            size = RECORDS_OFFSET + capacity * RING_RECORD_STRUCT.size
+            flags = os.O_RDWR | os.O_CREAT | os.O_TRUNC
+        else:
+            size = 0
+            flags = os.O_RDWR
+        try:
+            fd = os.open(path, flags, 0o600)
+        except OSError as error:
+            raise NameError('Error: Couldn\'t open ring %s: %s' % (
+                path, error.strerror))
+        try:
+            if capacity is not None:
+                os.ftruncate(fd, size)
+            else:
+                size = os.fstat(fd).st_size
+                if size < RECORDS_OFFSET:
+                    raise NameError('Error: %s is not an FCN ring' % path)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if capacity is not None:
+            RING_HEADER_STRUCT.pack_into(self.map, 0, RING_MAGIC,
+                                         RING_RECORD_STRUCT.size, capacity)
+        magic, record_size, capacity = RING_HEADER_STRUCT.unpack_from(
+            self.map, 0)
+        if (magic != RING_MAGIC or
+                record_size != RING_RECORD_STRUCT.size or
+                size < RECORDS_OFFSET + capacity * record_size):
+            self.map.close()
+            raise NameError('Error: %s is not an FCN ring' % path)
+        self.path = path
+        self.capacity = capacity
+        self.mask = capacity - 1
+        # Last seen tail, the producer only reads it when the ring seems
+        # full
+        self.tail = self.read_index(TAIL_OFFSET)
+
+    def __len__(self):
+        return self.read_index(HEAD_OFFSET) - self.read_index(TAIL_OFFSET)
+
+    def read_index(self, offset):
+        """Reads the head or tail
+
+        """
+        return INDEX_STRUCT.unpack_from(self.map, offset)[0]
+
+    def push(self, srcip=0, destip=0, srcport=0, destport=0, prototype=0,
+             msgtype=0, mclass=b'', prio=1, timeoutval=60, packet_count=0,
+             kbyte_count=0):
+        """Writes a record as the producer
+
+        Returns
+        -------
+            False if the ring is full
+
+        """
+        head = self.read_index(HEAD_OFFSET)
+        if head - self.tail >= self.capacity:
+            self.tail = self.read_index(TAIL_OFFSET)
+            if head - self.tail >= self.capacity:
+                return False
+        if len(mclass) > MAX_CLASS_LEN:
+            raise NameError('Invalid Name')
+        try:
+            RING_RECORD_STRUCT.pack_into(
+                self.map,
+                RECORDS_OFFSET + (head & self.mask) * RING_RECORD_STRUCT.size,
+                srcip, destip, srcport, destport, prototype, msgtype, prio,
+                len(mclass), timeoutval, packet_count, kbyte_count, mclass)
+        except struct.error:
+            raise NameError('Error: Message field out of range')
+        INDEX_STRUCT.pack_into(self.map, HEAD_OFFSET, head + 1)
+
+        return True
+
+    def pop(self, limit=None):
+        """Reads the waiting records as the consumer and frees their slots
+
+        Parameters
+        ----------
+        limit:
+            Most records to read (Default: all waiting)
+
+        Returns
+        -------
+            List of RING_RECORD_STRUCT tuples
+
+        """
+        tail = self.read_index(TAIL_OFFSET)
+        stop = self.read_index(HEAD_OFFSET)
+        if limit is not None:
+            stop = min(stop, tail + limit)
+        unpack = RING_RECORD_STRUCT.unpack_from
+        ring = self.map
+        mask = self.mask
+        size = RING_RECORD_STRUCT.size
+        records = [unpack(ring, RECORDS_OFFSET + (index & mask) * size)
+                   for index in range(tail, stop)]
+        INDEX_STRUCT.pack_into(ring, TAIL_OFFSET, stop)
+
+        return records
+
+    def close(self):
+        """Unmaps the ring
+
+        """
+        self.map.close()
+
+
+class RingConsumer(object):
+    """Encodes records taken from a RingBuffer straight into RAP messages.
+    The records read in one poll are packed into as few messages as
+    msg_size allows, so batches grow with the producer's rate
+
+    """
+
+    def __init__(self, ring, encoder, send, defaults,
+                 msg_size=DEFAULT_MSG_SIZE, session=False, batch=4096):
+        """Initialise the consumer
+
+        Parameters
+        ----------
+        ring:
+            The RingBuffer
+        encoder:
+            The FCN instance used to pack headers and templates
+        send:
+            Called with each finished RAP message
+        defaults:
+            The command line inputs, used for the export, action flag,
+            first sequence number and the class of records without one
+        msg_size:
+            Maximum RAP message size in bytes
+        session:
+            Build data-only messages without the template
+        batch:
+            Most records read in one poll
+
+        """
+        overhead = DATA_MESSAGE_OVERHEAD if session else MESSAGE_OVERHEAD
+        if not overhead < msg_size <= MAX_MSG_SIZE:
+            raise NameError('Error: Message size must be between %d and %d'
+                            % (overhead + 1, MAX_MSG_SIZE))
+        self.ring = ring
+        self.encoder = encoder
+        self.send = send
+        self.msg_size = msg_size
+        self.session = session
+        self.batch = batch
+        self.export = encoder.to_bytes(defaults.export)
+        if len(self.export) > 8:
+            raise NameError('Invalid Export Name')
+        if not 0 <= defaults.a_flg <= 0xffff:
+            raise NameError('Error: Message field out of range')
+        self.a_flg = defaults.a_flg
+        self.mclass = encoder.to_bytes(defaults.mclass)
+        if len(self.mclass) > 251:
+            raise NameError('Invalid Name')
+        self.seq_no = defaults.seq_no
+        self.rules = 0
+        self.messages = 0
+        self.errors = 0
+
+    def poll(self):
+        """Sends the records waiting in the ring
+
+        Returns
+        -------
+            The number of records read
+
+        """
+        records = self.ring.pop(self.batch)
+        if records:
+            payloads = self.records(records)
+            seq_no = self.seq_no
+            self.seq_no = (seq_no + len(payloads)) & 0xffffffff
+            # Counted before sending, the records have left the ring
+            self.rules += len(payloads)
+            for data in pack_records(self.encoder, payloads, seq_no,
+                                     self.msg_size, self.session):
+                self.send(data)
+                self.messages += 1
+
+        return len(records)
+
+    def records(self, records):
+        """Encodes ring records as data records, skipping invalid ones
+
+        Parameters
+        ----------
+        records:
+            List of RING_RECORD_STRUCT tuples
+
+        Returns
+        -------
+            List of data records
+
+        """
+        pack_head = RECORD_HEAD_STRUCT.pack
+        pack_tail = RECORD_TAIL_STRUCT.pack
+        export = self.export
+        a_flg = self.a_flg
+        default = self.mclass
+        payloads = []
+        for (srcip, destip, srcport, destport, prototype, msgtype, prio,
+             class_len, timeoutval, packet_count, kbyte_count,
+             mclass) in records:
+            if msgtype > MSG_REMOVE_ALL or class_len > MAX_CLASS_LEN:
+                self.errors += 1
+                continue
+            if class_len:
+                mclass = mclass[:class_len]
+            else:
+                mclass = default
+            name = mclass + b'\x00\x00'
+            payloads.append(
+                pack_head(export, msgtype, srcip, destip, srcport, destport,
+                          prototype, packet_count, kbyte_count,
+                          len(name) + 2) +
+                name +
+                pack_tail(prio, 0, timeoutval, 0, a_flg, b''))
+
+        return payloads
+
+    def run(self, duration=None, spin=1000, max_sleep=0.001):
+        """Polls the ring until Ctrl-C or duration seconds. An idle
+        consumer spins before backing off to short sleeps
+
+        Parameters
+        ----------
+        duration:
+            Seconds to run for, None to run until Ctrl-C
+        spin:
+            Empty polls before the consumer starts sleeping
+        max_sleep:
+            Longest sleep between polls of an idle ring
+
+        Returns
+        -------
+            The number of records sent
+
+        """
+        stop = None if duration is None else time.time() + duration
+        idle = 0
+        sleep = 0.00001
+        try:
+            while stop is None or time.time() < stop:
+                if self.poll():
+                    idle = 0
+                    sleep = 0.00001
+                    continue
+                idle += 1
+                if idle > spin:
+                    time.sleep(sleep)
+                    sleep = min(sleep * 2, max_sleep)
+        except KeyboardInterrupt:
+            pass
+
+        return self.rules
@@ -0,0 +1,435 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Rules
+- Compact flow rule objects, and array-backed rule collections for holding
+  millions of rules before a bulk install
+
+Example
+-------
+    rules = RuleArray()
+    for address in sources:
+        rules.add(srcip=address, destip='10.0.0.2', destport=80,
+                  prototype=6, mclass='web')
+    for data in rules.messages(FCN.__new__(FCN), seq_no=1):
+        ...
+
+"""
+import array
+import socket
+import struct
+
+from fcn_batch import DATA_MESSAGE_OVERHEAD
+from fcn_batch import DEFAULT_MSG_SIZE
+from fcn_batch import MAX_MSG_SIZE
+from fcn_batch import MESSAGE_OVERHEAD
+
+# Message types
+MSG_ADD = 0
+MSG_REMOVE = 1
+MSG_REMOVE_ALL = 2
+
+# FlowRule attributes and their defaults
+RULE_FIELDS = (('srcip', '0.0.0.0'),
+               ('destip', '0.0.0.0'),
+               ('srcport', 0),
+               ('destport', 0),
+               ('prototype', 0),
+               ('msgtype', MSG_ADD),
+               ('mclass', 'myclass'),
+               ('prio', 1),
+               ('timeoutval', 60),
+               ('export', 'myexp'),
+               ('a_flg', 1),
+               ('seq_no', 20),
+               ('packet_count', 0),
+               ('kbyte_count', 0))
+
+# Data record layout of the FCN encoder with the IPs as integers
+RECORD_HEAD_STRUCT = struct.Struct('!8sBIIHHBIIB')
+RECORD_TAIL_STRUCT = struct.Struct('!BBHQH16s')
+
+# Array type code of 32 bit unsigned integers
+UINT32 = 'I' if array.array('I').itemsize == 4 else 'L'
+
+
+class FlowRule(object):
+    """Contains the parameters of a single flow rule
+    Attribute names match the FCN command line inputs so rules can be
+    passed straight to the FCN encoder. Slots keep each rule small
+
+    """
+    __slots__ = tuple(name for name, _ in RULE_FIELDS)
+
+    def __init__(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0,
+                 destport=0, prototype=0, msgtype=MSG_ADD,
+                 mclass='myclass', prio=1, timeoutval=60, export='myexp',
+                 a_flg=1, seq_no=20, packet_count=0, kbyte_count=0):
+        self.srcip = srcip
+        self.destip = destip
+        self.srcport = srcport
+        self.destport = destport
+        self.prototype = prototype
+        self.msgtype = msgtype
+        self.mclass = mclass
+        self.prio = prio
+        self.timeoutval = timeoutval
+        self.export = export
+        self.a_flg = a_flg
+        self.seq_no = seq_no
+        self.packet_count = packet_count
+        self.kbyte_count = kbyte_count
+
+    def __repr__(self):
+        return 'FlowRule(%s)' % ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return (isinstance(other, FlowRule) and
+                all(getattr(self, name) == getattr(other, name)
+                    for name in self.__slots__))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    @classmethod
+    def from_inputs(cls, inputs):
+        """Copies the rule attributes of the FCN command line inputs, or of
+        any object with them. Missing attributes take their defaults
+
+        Parameters
+        ----------
+        inputs:
+            The inputs to copy
+
+        Returns
+        -------
+            The FlowRule
+
+        """
+        rule = cls.__new__(cls)
+        for name, default in RULE_FIELDS:
+            setattr(rule, name, getattr(inputs, name, default))
+
+        return rule
+
+    def copy(self):
+        """Returns a copy of the rule
+
+        """
+        return FlowRule.from_inputs(self)
+
+
+class RuleArray(object):
+    """Column-oriented collection of flow rules
+    Each rule takes around 30 bytes in typed arrays: IPs as uint32, ports
+    as uint16 and export and class names as indexes into a table of
+    distinct names. Sequence numbers are assigned when the rules are
+    encoded
+
+    """
+    # Column -> array type code
+    COLUMNS = (('srcip', UINT32),
+               ('destip', UINT32),
+               ('srcport', 'H'),
+               ('destport', 'H'),
+               ('prototype', 'B'),
+               ('msgtype', 'B'),
+               ('prio', 'B'),
+               ('timeoutval', 'H'),
+               ('a_flg', 'H'),
+               ('export', 'B'),
+               ('mclass', 'H'),
+               ('packet_count', UINT32),
+               ('kbyte_count', UINT32))
+
+    def __init__(self, rules=()):
+        """Initialise the rule array
+
+        Parameters
+        ----------
+        rules:
+            Iterable of rules with the FCN input attributes to add
+
+        """
+        self.columns = dict((name, array.array(code))
+                            for name, code in self.COLUMNS)
+        # Distinct export and class names, the columns hold their indexes
+        self.exports = []
+        self.classes = []
+        self._export_index = {}
+        self._class_index = {}
+        self.extend(rules)
+
+    def __len__(self):
+        return len(self.columns['srcip'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            raise TypeError('RuleArray indexes must be integers')
+        columns = self.columns
+        values = dict((name, columns[name][index]) for name, _ in
+                      self.COLUMNS)
+        values['srcip'] = socket.inet_ntoa(struct.pack('!I',
+                                                       values['srcip']))
+        values['destip'] = socket.inet_ntoa(struct.pack('!I',
+                                                        values['destip']))
+        values['export'] = self.exports[values['export']]
+        values['mclass'] = self.classes[values['mclass']]
+
+        return FlowRule(seq_no=0, **values)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns
+
+        """
+        return sum(len(column) * column.itemsize
+                   for column in self.columns.values())
+
+    def add(self, srcip='0.0.0.0', destip='0.0.0.0', srcport=0, destport=0,
+            prototype=0, msgtype=MSG_ADD, mclass='myclass', prio=1,
+            timeoutval=60, export='myexp', a_flg=1, packet_count=0,
+            kbyte_count=0):
+        """Adds a rule, checking every field
+
+        """
+        if not 0 <= msgtype <= MSG_REMOVE_ALL:
+            raise NameError('Invalid Msg Type')
+        export = self._name(export, self.exports, self._export_index, 8,
+                            'Invalid Export Name')
+        mclass = self._name(mclass, self.classes, self._class_index, 251,
+                            'Invalid Name')
+        srcip = self._ip(srcip)
+        destip = self._ip(destip)
+        columns = self.columns
+        length = len(columns['srcip'])
+        try:
+            columns['srcip'].append(srcip)
+            columns['destip'].append(destip)
+            columns['srcport'].append(srcport)
+            columns['destport'].append(destport)
+            columns['prototype'].append(prototype)
+            columns['msgtype'].append(msgtype)
+            columns['prio'].append(prio)
+            columns['timeoutval'].append(timeoutval)
+            columns['a_flg'].append(a_flg)
+            columns['export'].append(export)
+            columns['mclass'].append(mclass)
+            columns['packet_count'].append(packet_count)
+            columns['kbyte_count'].append(kbyte_count)
+        except (OverflowError, TypeError):
+            # Keep the columns the same length
+            for column in columns.values():
+                del column[length:]
+            raise NameError('Error: Message field out of range')
+
+    def append(self, rule):
+        """Adds a rule object
+
+        Parameters
+        ----------
+        rule:
+            Any object with the FCN input attributes
+
+        """
+        self.add(rule.srcip, rule.destip, rule.srcport, rule.destport,
+                 rule.prototype, rule.msgtype, rule.mclass, rule.prio,
+                 rule.timeoutval, rule.export, rule.a_flg,
+                 getattr(rule, 'packet_count', 0),
+                 getattr(rule, 'kbyte_count', 0))
+
+    def extend(self, rules):
+        """Adds rule objects
+
+        Parameters
+        ----------
+        rules:
+            Iterable of objects with the FCN input attributes
+
+        """
+        for rule in rules:
+            self.append(rule)
+
+    @staticmethod
+    def _ip(address):
+        """Converts an IPv4 address in x.x.x.x format to an integer,
+        integers are passed through
+
+        """
+        try:
+            return struct.unpack('!I', socket.inet_pton(socket.AF_INET,
+                                                        address))[0]
+        except TypeError:
+            if 0 <= address <= 0xffffffff:
+                return address
+        except Exception:
+            pass
+        raise NameError('Invalid IP')
+
+    @staticmethod
+    def _name(name, names, indexes, max_len, error):
+        """Finds the index of a name in a name table, adding it if new
+
+        """
+        index = indexes.get(name)
+        if index is None:
+            if isinstance(name, bytes):
+                encoded = name
+            else:
+                try:
+                    encoded = name.encode('ascii')
+                except Exception:
+                    raise NameError(error)
+            if len(encoded) > max_len:
+                raise NameError(error)
+            index = indexes[name] = len(names)
+            names.append(name)
+        return index
+
+    def records(self, start=0, stop=None):
+        """Encodes a run of rules as data records
+
+        Parameters
+        ----------
+        start:
+            Index of the first rule
+        stop:
+            Index after the last rule (Default: the end)
+
+        Returns
+        -------
+            List of data records, as the FCN encoder's pack_msg_payload
+            would make them
+
+        """
+        if stop is None:
+            stop = len(self)
+        columns = [self.columns[name][start:stop] for name, _ in
+                   self.COLUMNS]
+        exports = [name if isinstance(name, bytes) else name.encode('ascii')
+                   for name in self.exports]
+        classes = [(name if isinstance(name, bytes) else
+                    name.encode('ascii')) + b'\x00\x00'
+                   for name in self.classes]
+        pack_head = RECORD_HEAD_STRUCT.pack
+        pack_tail = RECORD_TAIL_STRUCT.pack
+        records = []
+        for (srcip, destip, srcport, destport, prototype, msgtype, prio,
+             timeoutval, a_flg, export, mclass, packet_count,
+             kbyte_count) in zip(*columns):
+            name = classes[mclass]
+            records.append(
+                pack_head(exports[export], msgtype, srcip, destip, srcport,
+                          destport, prototype, packet_count, kbyte_count,
+                          len(name) + 2) +
+                name +
+                pack_tail(prio, 0, timeoutval, 0, a_flg, b''))
+
+        return records
+
+    def messages(self, encoder, seq_no=0, msg_size=DEFAULT_MSG_SIZE,
+                 session=False, chunk=4096):
+        """Encodes the rules into RAP messages of up to msg_size bytes
+
+        Parameters
+        ----------
+        encoder:
+            The FCN instance used to pack headers and templates
+        seq_no:
+            Sequence number of the first rule, each message takes the
+            sequence number of its first record
+        msg_size:
+            Maximum RAP message size in bytes
+        session:
+            Build data-only messages without the template
+        chunk:
+            Rules encoded at a time, bounds the memory used for records
+
+        Returns
+        -------
+            Generator of serialised messages
+
+        """
+        def records():
+            for start in range(0, len(self), chunk):
+                for record in self.records(start, start + chunk):
+                    yield record
+
+        return pack_records(encoder, records(), seq_no, msg_size, session)
+
+
+def pack_records(encoder, records, seq_no=0, msg_size=DEFAULT_MSG_SIZE,
+                 session=False):
+    """Packs encoded data records into RAP messages of up to msg_size bytes
+
+    Parameters
+    ----------
+    encoder:
+        The FCN instance used to pack headers and templates
+    records:
+        Iterable of data records, as pack_msg_payload makes them
+    seq_no:
+        Sequence number of the first record, each message takes the
+        sequence number of its first record
+    msg_size:
+        Maximum RAP message size in bytes
+    session:
+        Build data-only messages without the template
+
+    Returns
+    -------
+        Generator of serialised messages
+
+    """
+    overhead = DATA_MESSAGE_OVERHEAD if session else MESSAGE_OVERHEAD
+    pack = encoder.pack_data_batch if session else encoder.pack_batch
+    if not overhead < msg_size <= MAX_MSG_SIZE:
+        raise NameError('Error: Message size must be between %d and %d'
+                        % (overhead + 1, MAX_MSG_SIZE))
+    first = FlowRule(seq_no=seq_no)
+    payloads = []
+    size = overhead
+    for record in records:
+        if payloads and size + len(record) > msg_size:
+            yield pack(first, payloads)
+            first.seq_no = (first.seq_no + len(payloads)) & 0xffffffff
+            payloads = []
+            size = overhead
+        payloads.append(record)
+        size += len(record)
+    if payloads:
+        yield pack(first, payloads)
@@ -0,0 +1,164 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Rule Files
+- Stream flow rules from CSV or JSON Lines files
+
+Each row holds one rule. Columns use the long names of the FCN command
+line flags, and a_flg for the action flag -o. Missing or empty columns fall
+back to the command line values
+
+    srcip,destip,srcport,destport,prototype,mtype,timeoutval,class,prio
+    10.0.0.1,10.0.0.2,80,5000,6,0,60,myclass,20
+
+    {"srcip": "10.0.0.1", "destip": "10.0.0.2", "srcport": 80, "class": "a"}
+
+"""
+import csv
+import json
+
+from fcn_rule import FlowRule
+
+# Column name -> (FCN input attribute, type)
+FIELDS = {
+    'srcip': ('srcip', str),
+    'destip': ('destip', str),
+    'seqno': ('seq_no', int),
+    'srcport': ('srcport', int),
+    'destport': ('destport', int),
+    'prototype': ('prototype', int),
+    'mtype': ('msgtype', int),
+    'timeoutval': ('timeoutval', int),
+    'export': ('export', str),
+    'class': ('mclass', str),
+    'prio': ('prio', int),
+    'a_flg': ('a_flg', int),
+}
+
+FORMATS = ['csv', 'jsonl']
+
+
+def file_format(path, fmt=None):
+    """Works out the format of a rule file
+
+    Parameters
+    ----------
+    path:
+        The rule file path, - for stdin
+    fmt:
+        The format given on the command line, if any
+
+    Returns
+    -------
+        csv or jsonl
+
+    """
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise NameError('Invalid Rule File Format')
+        return fmt
+    if path.lower().endswith(('.jsonl', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_rows(stream, fmt):
+    """Reads raw rows from a rule file one at a time
+
+    Parameters
+    ----------
+    stream:
+        The open rule file
+    fmt:
+        csv or jsonl
+
+    Returns
+    -------
+        Generator of (line number, dict of column values)
+
+    """
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise NameError('Error: Line %d: Invalid JSON' % line_no)
+            if not isinstance(row, dict):
+                raise NameError('Error: Line %d: Rule must be an object'
+                                % line_no)
+            yield line_no, row
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def read_rules(stream, fmt, defaults):
+    """Streams rules from a rule file. Rows are converted as they are read
+    so memory use does not grow with the file
+
+    Parameters
+    ----------
+    stream:
+        The open rule file
+    fmt:
+        csv or jsonl
+    defaults:
+        The command line inputs used for missing columns. Rows without a
+        seqno column are numbered on from the command line seqno
+
+    Returns
+    -------
+        Generator of (line number, rule) tuples, the rules have the FCN
+        input attributes
+
+    """
+    seq_no = defaults.seq_no
+    for line_no, row in read_rows(stream, fmt):
+        rule = FlowRule.from_inputs(defaults)
+        rule.seq_no = seq_no
+        for column, value in row.items():
+            if column not in FIELDS:
+                raise NameError('Error: Line %d: Unknown column %s'
+                                % (line_no, column))
+            if value is None or value == '':
+                continue
+            attr, _type = FIELDS[column]
+            try:
+                setattr(rule, attr, _type(value))
+            except (TypeError, ValueError):
+                raise NameError('Error: Line %d: Invalid %s'
+                                % (line_no, column))
+        seq_no = (rule.seq_no + 1) & 0xffffffff
+
+        yield line_no, rule
@@ -0,0 +1,379 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Sink
+Stand-in Action Node that receives RAP messages over UDP and TCP and
+reports throughput
+
+Parameters
+----------
+    -h, --help                      Help
+    -x, --host                      Address to listen on (Default: 127.0.0.1)
+    -y, --port                      Port to listen on (Default: 5000)
+    -z, --proto                     UDP, TCP or both (Default: both)
+    -t, --interval                  Seconds between reports (Default: 1)
+    -d, --duration                  Seconds to run for (Default: until Ctrl-C)
+"""
+from __future__ import print_function
+
+import argparse
+import select
+import socket
+import struct
+import time
+
+from fcn_decoder import HEADER_STRUCT
+from fcn_decoder import parse_message
+
+MSG_TYPE_NAMES = ['add', 'remove', 'remove_all']
+
+
+class SinkStats(object):
+    """Counters kept by the sink
+
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.rules = dict((name, 0) for name in MSG_TYPE_NAMES)
+        self.rules['other'] = 0
+        self.parse_errors = 0
+        self.seq_gaps = 0
+        self.seq_missing = 0
+        # Next sequence number expected from each sender
+        self.expected = {}
+
+    def add_message(self, data, sender):
+        """Counts one received RAP message
+
+        Parameters
+        ----------
+        data:
+            The message
+        sender:
+            Key of the sending socket, sequence numbers are tracked per
+            sender
+
+        """
+        self.messages += 1
+        self.bytes += len(data)
+        try:
+            seq_no, msg_types = parse_message(data)
+        except (ValueError, struct.error):
+            self.parse_errors += 1
+            return
+        for msg_type in msg_types:
+            if msg_type < len(MSG_TYPE_NAMES):
+                self.rules[MSG_TYPE_NAMES[msg_type]] += 1
+            else:
+                self.rules['other'] += 1
+        if not msg_types:
+            # Template-only messages reuse the next data sequence number
+            return
+        expected = self.expected.get(sender)
+        if expected is not None and seq_no != expected:
+            self.seq_gaps += 1
+            self.seq_missing += (seq_no - expected) & 0xffffffff
+        # Sequence numbers count data records
+        self.expected[sender] = (seq_no + len(msg_types)) & 0xffffffff
+
+    def copy(self):
+        """Snapshot of the counters for interval reports
+
+        """
+        stats = SinkStats()
+        stats.__dict__.update(self.__dict__)
+        stats.rules = dict(self.rules)
+        stats.expected = {}
+        return stats
+
+    def report(self, elapsed, since=None):
+        """Formats the counters as a report line
+
+        Parameters
+        ----------
+        elapsed:
+            Seconds covered by the report
+        since:
+            Earlier snapshot to report the difference from
+
+        Returns
+        -------
+            The report line
+
+        """
+        since = since or SinkStats()
+        elapsed = max(elapsed, 1e-9)
+        messages = self.messages - since.messages
+        rules = dict((name, self.rules[name] - since.rules[name])
+                     for name in self.rules)
+        return ('%.0f msg/s %.0f B/s | add %d remove %d remove_all %d '
+                'other %d | parse errors %d | seq gaps %d missing %d' % (
+                    messages / elapsed,
+                    (self.bytes - since.bytes) / elapsed,
+                    rules['add'], rules['remove'], rules['remove_all'],
+                    rules['other'],
+                    self.parse_errors - since.parse_errors,
+                    self.seq_gaps - since.seq_gaps,
+                    self.seq_missing - since.seq_missing))
+
+
+class RAPSink(object):
+    """Receives RAP messages on UDP and TCP sockets
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=5000, udp=True, tcp=True):
+        """Initialise the sink and bind its sockets
+
+        Parameters
+        ----------
+        host:
+            Address to listen on
+        port:
+            Port to listen on, 0 picks a free port
+        udp:
+            Listen for UDP messages
+        tcp:
+            Listen for TCP connections
+
+        """
+        self.stats = SinkStats()
+        self.udp = None
+        self.tcp = None
+        # TCP connection -> (peer address, receive buffer)
+        self.streams = {}
+        if tcp:
+            self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.tcp.bind((host, port))
+            self.tcp.listen(128)
+            port = self.tcp.getsockname()[1]
+        if udp:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                4 * 1024 * 1024)
+            self.udp.bind((host, port))
+            port = self.udp.getsockname()[1]
+        self.port = port
+
+    def poll(self, timeout):
+        """Handles the sockets that are ready
+
+        Parameters
+        ----------
+        timeout:
+            Seconds to wait for a socket to become ready
+
+        """
+        sockets = list(self.streams)
+        for sock in [self.udp, self.tcp]:
+            if sock is not None:
+                sockets.append(sock)
+        readable = select.select(sockets, [], [], timeout)[0]
+        for sock in readable:
+            if sock is self.udp:
+                self.read_datagrams()
+            elif sock is self.tcp:
+                conn, address = self.tcp.accept()
+                self.streams[conn] = (address, bytearray())
+            else:
+                self.read_stream(sock)
+
+    def read_datagrams(self):
+        """Reads every queued UDP message
+
+        """
+        self.udp.setblocking(False)
+        try:
+            while True:
+                try:
+                    data, address = self.udp.recvfrom(65535)
+                except socket.error:
+                    break
+                self.stats.add_message(data, address)
+        finally:
+            self.udp.setblocking(True)
+
+    def read_stream(self, conn):
+        """Reads from a TCP connection and counts each complete message
+
+        Parameters
+        ----------
+        conn:
+            The TCP connection
+
+        """
+        address, buf = self.streams[conn]
+        try:
+            data = conn.recv(65536)
+        except socket.error:
+            data = b''
+        if not data:
+            self.close_stream(conn)
+            return
+        buf.extend(data)
+        while len(buf) >= 4:
+            m_len = struct.unpack_from('!H', buf, 2)[0]
+            if m_len < HEADER_STRUCT.size:
+                # Framing is lost, nothing after this can be trusted
+                self.stats.parse_errors += 1
+                self.close_stream(conn)
+                return
+            if len(buf) < m_len:
+                break
+            self.stats.add_message(bytes(buf[:m_len]), address)
+            del buf[:m_len]
+
+    def close_stream(self, conn):
+        """Closes a TCP connection
+
+        Parameters
+        ----------
+        conn:
+            The TCP connection
+
+        """
+        address = self.streams.pop(conn)[0]
+        self.stats.expected.pop(address, None)
+        conn.close()
+
+    def serve(self, duration=None, interval=1, out=None):
+        """Receives messages and prints a report every interval
+
+        Parameters
+        ----------
+        duration:
+            Seconds to run for, None to run until Ctrl-C
+        interval:
+            Seconds between reports
+        out:
+            Called with each report line (Default: print)
+
+        Returns
+        -------
+            The final SinkStats
+
+        """
+        out = out or print
+        start = last = time.time()
+        previous = self.stats.copy()
+        try:
+            while duration is None or time.time() - start < duration:
+                self.poll(min(interval, 0.1))
+                now = time.time()
+                if now - last >= interval:
+                    out(self.stats.report(now - last, previous))
+                    previous = self.stats.copy()
+                    last = now
+        except KeyboardInterrupt:
+            pass
+        elapsed = time.time() - start
+        out('Total: %d messages, %d bytes in %.1f s' % (
+            self.stats.messages, self.stats.bytes, elapsed))
+        out(self.stats.report(elapsed))
+
+        return self.stats
+
+    def close(self):
+        """Closes every socket
+
+        """
+        for conn in list(self.streams):
+            self.close_stream(conn)
+        for sock in [self.udp, self.tcp]:
+            if sock is not None:
+                sock.close()
+
+
+def parser():
+    """Command Line Interface for the sink
+
+    Returns
+    -------
+    cli_inputs:
+        The command line interface inputs
+
+    """
+    parser = argparse.ArgumentParser(
+        description='FCN RAP Sink\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-x", "--host",
+                        action="store",
+                        dest="HOST",
+                        default='127.0.0.1',
+                        metavar='Host',
+                        help='\t\t\tAddress to listen on (Default: 127.0.0.1)')
+    parser.add_argument("-y", "--port",
+                        action="store",
+                        dest="PORT",
+                        type=int,
+                        default=5000,
+                        metavar='Port',
+                        help='\t\t\tPort to listen on (Default: 5000)')
+    parser.add_argument("-z", "--proto",
+                        action="store",
+                        dest="PROTO",
+                        default='both',
+                        choices=['udp', 'tcp', 'both'],
+                        type=str.lower,
+                        metavar='Proto',
+                        help='\t\t\tUDP, TCP or both (Default: both)')
+    parser.add_argument("-t", "--interval",
+                        action="store",
+                        dest="interval",
+                        type=float,
+                        default=1,
+                        metavar='Seconds',
+                        help='\t\t\tSeconds between reports (Default: 1)')
+    parser.add_argument("-d", "--duration",
+                        action="store",
+                        dest="duration",
+                        type=float,
+                        default=None,
+                        metavar='Seconds',
+                        help='\t\t\tSeconds to run for '
+                             '(Default: until Ctrl-C)')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    INPUTS = parser()
+    SINK = RAPSink(INPUTS.HOST, INPUTS.PORT,
+                   udp=INPUTS.PROTO in ['udp', 'both'],
+                   tcp=INPUTS.PROTO in ['tcp', 'both'])
+    print('Listening on %s:%d (%s)' % (INPUTS.HOST, SINK.port,
+                                       INPUTS.PROTO.upper()))
+    try:
+        SINK.serve(INPUTS.duration, INPUTS.interval)
+    finally:
+        SINK.close()
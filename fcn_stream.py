@@ -0,0 +1,265 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Streaming
+- Send flow rules written line by line by a live producer
+
+Each line holds one rule written like the FCN command line flags, flags
+that are left out fall back to the command line values
+
+    -i 10.0.0.1 -j 10.0.0.2 -k 80 -l 5000 -u 6 -c myclass -n 20
+    --srcip 10.0.0.3 --mtype=1 -o 0
+
+Rules that arrive together are packed into one message. A message that is
+not full is sent once its first rule has waited for the flush delay, so a
+lone flow is not held back by the batching
+
+"""
+from __future__ import print_function
+
+import errno
+import os
+import select
+import sys
+import time
+
+from fcn_rule import FlowRule
+from fcn_rulefile import FIELDS
+
+# Short command line flag -> rule file column, named after the long flag
+SHORT_FLAGS = {
+    'i': 'srcip',
+    'j': 'destip',
+    's': 'seqno',
+    'k': 'srcport',
+    'l': 'destport',
+    'u': 'prototype',
+    'a': 'mtype',
+    't': 'timeoutval',
+    'e': 'export',
+    'c': 'class',
+    'n': 'prio',
+    'o': 'a_flg',
+}
+
+# Flag as written on a line -> (FCN input attribute, type)
+FLAGS = dict(('--' + flag, field) for flag, field in FIELDS.items())
+FLAGS.update(('-' + flag, FIELDS[name]) for flag, name in
+             SHORT_FLAGS.items())
+
+# Default wait before a partial message is sent, in seconds
+DEFAULT_FLUSH_DELAY = 0.001
+# Bytes read from the stream at a time
+READ_SIZE = 65536
+
+
+def parse_line(line, rule):
+    """Sets the fields given on one line of flags
+
+    Parameters
+    ----------
+    line:
+        The flags, such as '-i 10.0.0.1 --destport=80'
+    rule:
+        The flow rule the fields are set on
+
+    """
+    words = line.split()
+    index = 0
+    while index < len(words):
+        flag = words[index]
+        value = None
+        if flag.startswith('--') and '=' in flag:
+            flag, value = flag.split('=', 1)
+        if flag not in FLAGS:
+            raise NameError('Unknown flag %s' % flag)
+        if value is None:
+            index += 1
+            if index == len(words):
+                raise NameError('Missing value for %s' % flag)
+            value = words[index]
+        attr, _type = FLAGS[flag]
+        try:
+            setattr(rule, attr, _type(value))
+        except ValueError:
+            raise NameError('Invalid value for %s' % flag)
+        index += 1
+
+
+class RuleStream(object):
+    """Reads rules from a file descriptor and sends them through a
+    RecordBatcher, flushing partial messages after the flush delay
+
+    """
+
+    def __init__(self, fd, defaults, batcher, delay=DEFAULT_FLUSH_DELAY,
+                 flow_table=None, clock=time.time):
+        """Initialise the stream
+
+        Parameters
+        ----------
+        fd:
+            File descriptor of the stream, such as a pipe
+        defaults:
+            The command line inputs used for flags missing from a line.
+            Lines without a seqno are numbered on from the command line
+            seqno
+        batcher:
+            The RecordBatcher rules are added to
+        delay:
+            Seconds the first rule of a partial message waits for more
+            rules before the message is sent, 0 to send once the rules
+            read together are encoded
+        flow_table:
+            FlowTable used to skip redundant rules, None to send them all
+        clock:
+            Returns the current time in seconds
+
+        """
+        if delay < 0:
+            raise NameError('Error: Flush delay must not be negative')
+        self.fd = fd
+        self.defaults = defaults
+        self.batcher = batcher
+        self.delay = delay
+        self.flow_table = flow_table
+        self.clock = clock
+        self.seq_no = defaults.seq_no
+        self.line_no = 0
+        self.rules = 0
+        self.errors = 0
+        # Partial message the deadline belongs to, known by its first rule
+        self.first = None
+        self.deadline = None
+
+    def run(self):
+        """Sends rules until the stream ends
+
+        Returns
+        -------
+            The number of rules sent
+
+        """
+        pending = b''
+        while True:
+            if not self.wait():
+                self.flush()
+                continue
+            chunk = os.read(self.fd, READ_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                self.add_line(line)
+            self.update_deadline()
+            # A busy stream is always readable, so wait alone may never
+            # see the deadline pass
+            if self.deadline is not None and self.clock() >= self.deadline:
+                self.flush()
+        if pending:
+            self.add_line(pending)
+        self.flush()
+
+        return self.rules
+
+    def wait(self):
+        """Waits for the stream until the deadline of the partial message
+
+        Returns
+        -------
+            True if the stream can be read, False if the deadline passed
+
+        """
+        timeout = None
+        if self.deadline is not None:
+            timeout = max(0.0, self.deadline - self.clock())
+        try:
+            return bool(select.select([self.fd], [], [], timeout)[0])
+        except select.error as error:
+            if error.args[0] != errno.EINTR:
+                raise
+            return False
+
+    def add_line(self, line):
+        """Encodes the rule on one line. Invalid lines are reported and
+        skipped so one bad line does not stop the stream
+
+        Parameters
+        ----------
+        line:
+            The line as bytes
+
+        """
+        self.line_no += 1
+        line = line.decode('latin-1').strip()
+        if not line or line.startswith('#'):
+            return
+        rule = FlowRule.from_inputs(self.defaults)
+        rule.seq_no = self.seq_no
+        try:
+            parse_line(line, rule)
+            if self.flow_table is None:
+                self.batcher.add(rule)
+            elif self.flow_table.admit(rule):
+                try:
+                    self.batcher.add(rule)
+                except NameError:
+                    self.flow_table.discard(rule)
+                    raise
+            else:
+                return
+        except NameError as error:
+            self.errors += 1
+            print('Error: Line %d: %s' % (
+                self.line_no, str(error).replace('Error: ', '', 1)),
+                file=sys.stderr)
+            return
+        self.seq_no = (rule.seq_no + 1) & 0xffffffff
+        self.rules += 1
+
+    def update_deadline(self):
+        """Starts the flush delay when a new partial message is begun
+
+        """
+        first = self.batcher.first
+        if first is None:
+            self.deadline = None
+        elif first is not self.first:
+            self.deadline = self.clock() + self.delay
+        self.first = first
+
+    def flush(self):
+        """Sends the partial message
+
+        """
+        self.batcher.flush()
+        self.first = None
+        self.deadline = None
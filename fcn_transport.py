@@ -0,0 +1,284 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+"""Fake Classifier Node Transport
+- Keeps connections to Action Nodes open between RAP messages
+
+"""
+import select
+import socket
+import time
+
+
+class Transport(object):
+    """Pool of sockets to Action Nodes
+    One socket is kept per host, port and protocol. TCP connections are
+    reopened when the Action Node drops them
+
+    """
+
+    def __init__(self, timeout=10, template_interval=60, metrics=None):
+        """Initialise the transport
+
+        Parameters
+        ----------
+        timeout:
+            Connect and send timeout in seconds
+        template_interval:
+            Seconds between template messages over UDP in session mode
+        metrics:
+            Metrics that record send and connect latency, errors and
+            timeouts, None to record nothing
+
+        """
+        self.timeout = timeout
+        self.template_interval = template_interval
+        self.metrics = metrics
+        self.sockets = {}
+        # Time the template was last sent on each socket
+        self.template_times = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, data, host, port, proto, template=None):
+        """Sends a RAP message to an Action Node
+
+        Parameters
+        ----------
+        data:
+            The serialised message to be sent
+        host:
+            Action Node IP
+        port:
+            Output port to the Action Node
+        proto:
+            Protocol to the Action Node, TCP or UDP
+        template:
+            Session mode. Called with data to build a template message,
+            which is sent first on every new TCP connection and every
+            template_interval seconds over UDP
+
+        """
+        metrics = self.metrics
+        if metrics is None:
+            self.send_message(data, host, port, proto, template)
+            return
+        start = metrics.clock()
+        try:
+            self.send_message(data, host, port, proto, template)
+        except NameError:
+            metrics.observe('send', metrics.clock() - start, failed=True)
+            metrics.inc('send_errors')
+            raise
+        metrics.observe('send', metrics.clock() - start)
+        metrics.inc('messages_sent')
+        metrics.inc('bytes_sent', len(data))
+
+    def send_message(self, data, host, port, proto, template):
+        """Sends a RAP message, see send
+
+        """
+        key = (host, port, proto.lower())
+        if key[2] == 'udp':
+            sock = self.sockets.get(key)
+            if sock is None:
+                sock = self.open(key)
+            try:
+                if template is not None and self.template_due(key):
+                    sock.sendto(template(data), (host, port))
+                    self.template_times[key] = time.time()
+                    self.count('templates_sent')
+                sock.sendto(data, (host, port))
+            except socket.error:
+                raise NameError('Error: Couldn\'t send to socket')
+            return
+
+        sock = self.sockets.get(key)
+        if sock is not None and not self.is_alive(sock):
+            self.close_socket(key)
+            sock = None
+        if sock is None:
+            sock = self.open(key)
+        try:
+            self.send_stream(sock, key, data, template)
+        except (socket.timeout, socket.error) as error:
+            if isinstance(error, socket.timeout):
+                self.count('send_timeouts')
+            # The connection dropped since the last message, retry once
+            self.close_socket(key)
+            sock = self.open(key)
+            try:
+                self.send_stream(sock, key, data, template)
+            except (socket.timeout, socket.error) as error:
+                if isinstance(error, socket.timeout):
+                    self.count('send_timeouts')
+                self.close_socket(key)
+                raise NameError('Error: Couldn\'t send to socket')
+
+    def send_stream(self, sock, key, data, template):
+        """Sends a RAP message over a TCP connection, preceded by the
+        template if this connection has not carried it yet
+
+        Parameters
+        ----------
+        sock:
+            The TCP socket
+        key:
+            The host, port and lower case protocol
+        data:
+            The serialised message to be sent
+        template:
+            Builds the template message, None outside session mode
+
+        """
+        if template is not None and key not in self.template_times:
+            sock.sendall(template(data))
+            self.template_times[key] = time.time()
+            self.count('templates_sent')
+        sock.sendall(data)
+
+    def template_due(self, key):
+        """Checks if a UDP session needs the template resent
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        Returns
+        -------
+            True if the template has never been sent or is stale
+
+        """
+        sent = self.template_times.get(key)
+        return (sent is None or
+                time.time() - sent >= self.template_interval)
+
+    def open(self, key):
+        """Opens a socket to an Action Node and adds it to the pool
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        Returns
+        -------
+        sock:
+            The open socket
+
+        """
+        host, port, proto = key
+        if proto == 'udp':
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(self.timeout)
+            metrics = self.metrics
+            if metrics is not None:
+                start = metrics.clock()
+            try:
+                sock.connect((host, port))
+            except (socket.timeout, socket.error) as error:
+                sock.close()
+                if metrics is not None:
+                    metrics.observe('connect', metrics.clock() - start,
+                                    failed=True)
+                    if isinstance(error, socket.timeout):
+                        metrics.inc('send_timeouts')
+                raise NameError('Error: Couldn\'t connect to socket')
+            if metrics is not None:
+                metrics.observe('connect', metrics.clock() - start)
+        self.sockets[key] = sock
+        self.count('connects')
+
+        return sock
+
+    def count(self, name):
+        """Adds one to a metrics counter if metrics are recorded
+
+        Parameters
+        ----------
+        name:
+            The counter
+
+        """
+        if self.metrics is not None:
+            self.metrics.inc(name)
+
+    @staticmethod
+    def is_alive(sock):
+        """Checks if a TCP connection is still open
+        Action Nodes never send data, so a readable socket means the peer
+        closed or reset the connection
+
+        Parameters
+        ----------
+        sock:
+            The TCP socket
+
+        Returns
+        -------
+            True if the connection can be reused
+
+        """
+        try:
+            readable = select.select([sock], [], [], 0)[0]
+            if not readable:
+                return True
+            return sock.recv(1, socket.MSG_PEEK) != b''
+        except (socket.error, ValueError):
+            return False
+
+    def close_socket(self, key):
+        """Closes a single pooled socket
+
+        Parameters
+        ----------
+        key:
+            The host, port and lower case protocol
+
+        """
+        sock = self.sockets.pop(key, None)
+        self.template_times.pop(key, None)
+        if sock is not None:
+            sock.close()
+
+    def close(self):
+        """Closes every pooled socket
+
+        """
+        for key in list(self.sockets):
+            self.close_socket(key)
@@ -0,0 +1,151 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import socket
+import sys
+import threading
+import time
+sys.path.append("..")
+if sys.version_info >= (3, 7):
+    from fcn_async import send_all
+
+
+def _closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@unittest.skipUnless(sys.version_info >= (3, 7), 'requires Python 3.7')
+class AsyncSenderTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+        self.udp_port = self.sink.getsockname()[1]
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.server.settimeout(2)
+        self.tcp_port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        self.sink.close()
+        self.server.close()
+
+    def receive(self, conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_udp_and_tcp(self):
+        messages = [(b'a', '127.0.0.1', self.udp_port, 'UDP'),
+                    (b'b', '127.0.0.1', self.tcp_port, 'TCP'),
+                    (b'c', '127.0.0.1', self.tcp_port, 'TCP')]
+        results = send_all(messages)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.sink.recv(16), b'a')
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 2), b'bc')
+        conn.close()
+
+    def test_unreachable_node_isolated(self):
+        bad_port = _closed_port()
+        messages = []
+        for i in range(5):
+            messages.append((b'x', '127.0.0.1', bad_port, 'TCP'))
+            messages.append((b'%d' % i, '127.0.0.1', self.udp_port, 'UDP'))
+        start = time.time()
+        results = send_all(messages, limit=4, timeout=1)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual([result.ok for result in results], [False, True] * 5)
+        self.assertEqual(results[0].port, bad_port)
+        received = sorted(self.sink.recv(16) for _ in range(5))
+        self.assertEqual(received, [b'0', b'1', b'2', b'3', b'4'])
+
+    def test_hanging_connect_isolated(self):
+        # A full listen backlog drops further connects without an answer
+        blackhole = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        blackhole.bind(('127.0.0.1', 0))
+        blackhole.listen(0)
+        port = blackhole.getsockname()[1]
+        pending = []
+        for _ in range(4):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            sock.connect_ex(('127.0.0.1', port))
+            pending.append(sock)
+        time.sleep(0.1)
+        messages = []
+        for i in range(50):
+            messages.append((b'x', '127.0.0.1', port, 'TCP'))
+            messages.append((b'%d' % i, '127.0.0.1', self.udp_port, 'UDP'))
+        results = []
+        thread = threading.Thread(target=lambda: results.extend(
+            send_all(messages, limit=4, timeout=2)))
+        start = time.time()
+        thread.start()
+        try:
+            received = [self.sink.recv(16) for _ in range(50)]
+            # The healthy node didn't wait for the connect to time out
+            self.assertLess(time.time() - start, 1)
+        finally:
+            thread.join()
+            for sock in pending:
+                sock.close()
+            blackhole.close()
+        self.assertEqual(len(received), 50)
+        self.assertEqual([result.ok for result in results],
+                         [False, True] * 50)
+
+    def test_session_template(self):
+        messages = [(b'a', '127.0.0.1', self.udp_port, 'UDP'),
+                    (b'b', '127.0.0.1', self.udp_port, 'UDP')]
+        header = b'\x00\x01\x00\x11\x00\x00\x00\x01\x00\x00\x00\x00'
+        messages = [(header + data, host, port, proto)
+                    for data, host, port, proto in messages]
+        send_all(messages, session=True)
+        sizes = [len(self.sink.recv(128)) for _ in range(3)]
+        self.assertEqual(sizes, [56, 13, 13])
+
+    def test_invalid_protocol(self):
+        results = send_all([(b'a', '127.0.0.1', self.udp_port, 'SCTP')])
+        self.assertEqual(results[0].error, 'Invalid Protocol')
+
+if __name__ == '__main__':
+    unittest.main()
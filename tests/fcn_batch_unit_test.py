@@ -0,0 +1,99 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import struct
+import sys
+sys.path.append("..")
+from fcn import FCN
+from fcn_batch import MESSAGE_OVERHEAD
+from fcn_batch import RecordBatcher
+from fcn_client import FlowRule
+
+
+class RecordBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self.sent = []
+
+    def rules(self, count):
+        return [FlowRule(srcip='10.0.0.%d' % i, seq_no=100 + i)
+                for i in range(count)]
+
+    def test_overhead(self):
+        rule = FlowRule()
+        self.assertEqual(len(self.fake.pack_message(rule)),
+                         MESSAGE_OVERHEAD +
+                         len(self.fake.pack_msg_payload(rule)))
+
+    def test_fill_to_size(self):
+        # 70 byte records, 4 fit in 60 + 4 * 70 = 340 bytes
+        batcher = RecordBatcher(self.fake, self.sent.append, 350)
+        for rule in self.rules(10):
+            batcher.add(rule)
+        self.assertEqual(batcher.flush(), 2)
+        self.assertEqual([len(data) for data in self.sent],
+                         [340, 340, 200])
+        self.assertEqual(batcher.messages, 3)
+        for data in self.sent:
+            self.assertLessEqual(len(data), 350)
+
+    def test_message_layout(self):
+        batcher = RecordBatcher(self.fake, self.sent.append, 1472)
+        for rule in self.rules(3):
+            batcher.add(rule)
+        batcher.flush()
+        data = self.sent[0]
+        m_len, seq_no = struct.unpack('!HI', data[2:8])
+        set_id, set_len = struct.unpack('!HH', data[56:60])
+        self.assertEqual(m_len, len(data))
+        self.assertEqual(seq_no, 100)
+        self.assertEqual((set_id, set_len), (256, 3 * 70 + 4))
+        self.assertEqual(data[60:], b''.join(
+            self.fake.pack_msg_payload(rule) for rule in self.rules(3)))
+
+    def test_oversized_record_sent_alone(self):
+        batcher = RecordBatcher(self.fake, self.sent.append, 100)
+        for rule in self.rules(2):
+            batcher.add(rule)
+        batcher.flush()
+        self.assertEqual(len(self.sent), 2)
+
+    def test_flush_empty(self):
+        batcher = RecordBatcher(self.fake, self.sent.append)
+        self.assertEqual(batcher.flush(), 0)
+        self.assertEqual(self.sent, [])
+
+    def test_invalid_size(self):
+        self.assertRaises(NameError, RecordBatcher, self.fake,
+                          self.sent.append, 65536)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import sys
+sys.path.append("..")
+from fcn_bench import Benchmark
+from fcn_bench import compare
+from fcn_bench import percentile
+from fcn_bench import run_benchmark
+from fcn_bench import run_suite
+
+
+class BenchTest(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(101))
+        self.assertEqual([percentile(samples, pct) for pct in [0, 50, 99]],
+                         [0, 50, 99])
+
+    def test_run_benchmark(self):
+        calls = []
+        bench = Benchmark('test', lambda: calls.append(1), inner=5,
+                          setup=lambda: calls.append('setup'),
+                          teardown=lambda: calls.append('teardown'))
+        result = run_benchmark(bench, min_time=0.01)
+        self.assertEqual(calls[0], 'setup')
+        self.assertEqual(calls[-1], 'teardown')
+        self.assertTrue(result['ops'] >= 50)
+        self.assertTrue(result['ops'] % 5 == 0)
+        self.assertTrue(result['p50_us'] <= result['p99_us']
+                        <= result['max_us'])
+
+    def test_suite_and_compare(self):
+        report = run_suite('send', min_time=0.02)
+        self.assertEqual(sorted(report['results']), ['send.tcp', 'send.udp'])
+        self.assertTrue(report['results']['send.tcp']['ops_per_sec'] > 0)
+        lines = compare(report, report)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue('+0.0%' in lines[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import socket
+import struct
+import sys
+sys.path.append("..")
+from fcn_client import FCNClient
+from fcn_client import FlowRule
+from fcn_flowtable import FlowTable
+
+
+class FCNClientTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+        self.client = FCNClient(host='127.0.0.1',
+                                port=self.sink.getsockname()[1],
+                                proto='UDP', seq_no=7)
+
+    def tearDown(self):
+        self.client.close()
+        self.sink.close()
+
+    def receive(self):
+        data = self.sink.recv(2048)
+        seq_no = struct.unpack('!I', data[4:8])[0]
+        msg_type = struct.unpack('!B', data[68:69])[0]
+        return seq_no, msg_type
+
+    def test_add_remove_remove_all(self):
+        self.assertEqual(self.client.add(srcip='10.0.0.1', destip='10.0.0.2',
+                                         srcport=80, destport=5000,
+                                         prototype=6), 7)
+        self.assertEqual(self.client.remove(srcip='10.0.0.1'), 8)
+        self.assertEqual(self.client.remove_all(), 9)
+        self.assertEqual(self.receive(), (7, 0))
+        self.assertEqual(self.receive(), (8, 1))
+        self.assertEqual(self.receive(), (9, 2))
+
+    def test_flow_table(self):
+        self.client.flow_table = FlowTable()
+        self.assertEqual(self.client.add(srcip='10.0.0.1'), 7)
+        self.assertEqual(self.client.add(srcip='10.0.0.1'), None)
+        self.assertEqual(self.client.remove(srcip='10.0.0.9'), None)
+        self.assertEqual(self.client.remove(srcip='10.0.0.1'), 8)
+        self.assertEqual(self.receive(), (7, 0))
+        self.assertEqual(self.receive(), (8, 1))
+        self.assertEqual(self.client.flow_table.suppressed, 2)
+
+    def test_socket_reused(self):
+        self.client.add()
+        sockets = dict(self.client.transport.sockets)
+        self.client.add()
+        self.assertEqual(sockets, self.client.transport.sockets)
+
+    def test_send_rule_matches_encoder(self):
+        rule = FlowRule(srcip='10.0.0.1', destip='10.0.0.2', seq_no=3)
+        self.assertEqual(self.client.send_rule(rule), 3)
+        data = self.sink.recv(2048)
+        self.assertEqual(data[12:], self.client.pack_message(rule)[12:])
+
+    def test_send_rules_packed(self):
+        rules = [self.client.create_rule(0, '10.0.0.%d' % i, '10.0.0.2', 80,
+                                         5000, 6, 'myclass', 1, 60)
+                 for i in range(30)]
+        self.assertEqual(self.client.send_rules(rules), 2)
+        first = self.sink.recv(2048)
+        second = self.sink.recv(2048)
+        self.assertEqual(len(first) + len(second), 2 * 60 + 30 * 70)
+        self.assertEqual(struct.unpack('!I', second[4:8])[0], 7 + 20)
+
+    def test_session_sends_template_once(self):
+        client = FCNClient(host='127.0.0.1',
+                           port=self.sink.getsockname()[1],
+                           proto='UDP', seq_no=7, session=True)
+        client.add()
+        client.add()
+        client.close()
+        sizes = [len(self.sink.recv(2048)) for _ in range(3)]
+        self.assertEqual(sizes, [56, 16 + 70, 16 + 70])
+
+    def test_invalid_rule(self):
+        self.assertRaises(NameError, self.client.add, srcip='x')
+
+    def test_invalid_proto(self):
+        self.assertRaises(NameError, FCNClient, proto='SCTP')
+
+    def test_tcp_connect_refused(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        client = FCNClient(host='127.0.0.1', port=port, proto='TCP')
+        self.assertRaises(NameError, client.add)
+
+if __name__ == '__main__':
+    unittest.main()
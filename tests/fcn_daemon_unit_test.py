@@ -0,0 +1,172 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import os
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+sys.path.append("..")
+from fcn_client import FCNClient
+from fcn_ctl import DaemonClient
+from fcn_ctl import REPLY_STRUCT
+from fcn_ctl import STATUS_ERROR
+from fcn_ctl import pack_reply
+from fcn_ctl import pack_request
+from fcn_ctl import unpack_requests
+from fcn_daemon import FCNDaemon
+
+
+class RequestTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = (pack_request(0, '10.0.0.1', '10.0.0.2', 80, 5000, 6,
+                             'myclass', 20, 30) +
+                pack_request(2, '0.0.0.0', '0.0.0.0', 0, 0, 0, 'c', 1, 60,
+                             reply=False))
+        requests, used = unpack_requests(data + data[:10])
+        self.assertEqual(used, len(data))
+        self.assertEqual(requests, [
+            (True, 0, '10.0.0.1', '10.0.0.2', 80, 5000, 6, 'myclass', 20,
+             30),
+            (False, 2, '0.0.0.0', '0.0.0.0', 0, 0, 0, 'c', 1, 60)])
+
+    def test_invalid(self):
+        with self.assertRaises(NameError):
+            pack_request(0, '10.0.0', '0.0.0.0', 0, 0, 0, 'myclass', 1, 60)
+        with self.assertRaises(NameError):
+            pack_request(0x80, '0.0.0.0', '0.0.0.0', 0, 0, 0, 'myclass', 1,
+                         60)
+        with self.assertRaises(NameError):
+            pack_request(0, '0.0.0.0', '0.0.0.0', 70000, 0, 0, 'myclass', 1,
+                         60)
+
+    def test_reply(self):
+        reply = pack_reply(STATUS_ERROR, error='Invalid Msg Type')
+        self.assertEqual(REPLY_STRUCT.unpack(reply[:REPLY_STRUCT.size]),
+                         (STATUS_ERROR, 0, 16))
+        self.assertEqual(reply[REPLY_STRUCT.size:], b'Invalid Msg Type')
+
+
+class FCNDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fcn.sock')
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+        self.daemon = FCNDaemon(
+            FCNClient(port=self.sink.getsockname()[1], seq_no=7,
+                      flow_table=True), self.path)
+        self.thread = threading.Thread(target=self.daemon.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join()
+        self.daemon.close()
+        self.sink.close()
+        shutil.rmtree(self.directory)
+
+    def receive(self):
+        data = self.sink.recv(2048)
+        seq_no = struct.unpack('!I', data[4:8])[0]
+        msg_type = struct.unpack('!B', data[68:69])[0]
+        return seq_no, msg_type
+
+    def test_add_remove(self):
+        with DaemonClient(self.path) as client:
+            self.assertEqual(client.add(srcip='10.0.0.1', destip='10.0.0.2',
+                                        srcport=80, destport=5000,
+                                        prototype=6), 7)
+            self.assertEqual(client.remove(srcip='10.0.0.1',
+                                           destip='10.0.0.2', srcport=80,
+                                           destport=5000, prototype=6), 8)
+            self.assertEqual(client.remove_all(), 9)
+        self.assertEqual(self.receive(), (7, 0))
+        self.assertEqual(self.receive(), (8, 1))
+        self.assertEqual(self.receive(), (9, 2))
+
+    def test_sequence_shared_between_clients(self):
+        first = DaemonClient(self.path)
+        second = DaemonClient(self.path)
+        self.assertEqual(first.add(srcip='10.0.0.1'), 7)
+        self.assertEqual(second.add(srcip='10.0.0.2'), 8)
+        # The daemon's flow table is shared too
+        self.assertEqual(second.add(srcip='10.0.0.1'), None)
+        first.close()
+        second.close()
+
+    def test_error(self):
+        with DaemonClient(self.path) as client:
+            with self.assertRaises(NameError):
+                client.send(5, '0.0.0.0', '0.0.0.0', 0, 0, 0, 'myclass', 1,
+                            60)
+            # The failed request doesn't use a sequence number
+            self.assertEqual(client.add(), 7)
+        self.assertEqual(self.daemon.errors, 1)
+
+    def test_no_reply(self):
+        with DaemonClient(self.path) as client:
+            self.assertEqual(client.add(srcport=1, reply=False), None)
+            self.assertEqual(client.add(srcport=2, reply=False), None)
+            self.assertEqual(client.add(srcport=3), 9)
+        self.assertEqual([self.receive()[0] for _ in range(3)], [7, 8, 9])
+
+    def test_client_not_reading_replies(self):
+        slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        slow.connect(self.path)
+        request = pack_request(0, '10.0.0.1', '0.0.0.0', 0, 0, 0, 'myclass',
+                               1, 60)
+        # More replies than the socket buffers hold, none of them read
+        slow.sendall(request * 60000)
+        with DaemonClient(self.path, timeout=2) as client:
+            self.assertEqual(client.add(srcip='10.0.0.2'), 8)
+        self.assertEqual(len(slow.recv(6)), 6)
+        slow.close()
+
+    def test_already_running(self):
+        with self.assertRaises(NameError):
+            FCNDaemon(FCNClient(), self.path)
+
+    def test_stale_socket(self):
+        path = os.path.join(self.directory, 'stale.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        daemon = FCNDaemon(FCNClient(), path)
+        daemon.close()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import os
+import struct
+import sys
+import tempfile
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FlowRule
+from fcn_decoder import decode_file
+from fcn_decoder import CLASS_LEN_OFFSET
+from fcn_decoder import decode_message
+from fcn_decoder import decode_record
+from fcn_decoder import decode_stream
+from fcn_decoder import split_messages
+
+
+class DecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self.rules = [FlowRule(srcip='10.0.0.%d' % i, destip='192.168.1.2',
+                               srcport=i, destport=80, prototype=17,
+                               msgtype=i % 3, mclass='c' * (i + 1), prio=i,
+                               timeoutval=60 * i, export='exp%d' % i,
+                               a_flg=i % 2, seq_no=10 + i)
+                       for i in range(4)]
+
+    def assertRoundTrip(self, records, rules):
+        self.assertEqual(len(records), len(rules))
+        for record, rule in zip(records, rules):
+            self.assertEqual(self.fake.pack_msg_payload(record),
+                             self.fake.pack_msg_payload(rule))
+            self.assertEqual(record.seq_no, rule.seq_no)
+            self.assertEqual((record.srcip, record.mclass, record.export),
+                             (rule.srcip, rule.mclass, rule.export))
+
+    def test_single(self):
+        data = self.fake.pack_message(self.rules[1])
+        records = list(decode_message(data))
+        self.assertRoundTrip(records, self.rules[1:2])
+        self.assertEqual(self.fake.pack_message(records[0])[12:], data[12:])
+
+    def test_multi_record(self):
+        payloads = [self.fake.pack_msg_payload(rule) for rule in self.rules]
+        for data in [self.fake.pack_batch(self.rules[0], payloads),
+                     self.fake.pack_data_batch(self.rules[0], payloads)]:
+            self.assertRoundTrip(list(decode_message(data)), self.rules)
+
+    def test_multi_set(self):
+        # Second data set appended to a full message
+        first = self.fake.pack_message(self.rules[0])
+        payload = self.fake.pack_msg_payload(self.rules[1])
+        data = (b'\x00\x01' + struct.pack('!H', len(first) + 4 +
+                                          len(payload)) +
+                first[4:] + struct.pack('!HH', 256, len(payload) + 4) +
+                payload)
+        self.assertRoundTrip(list(decode_message(data)), self.rules[:2])
+
+    def test_template_only(self):
+        data = FCN.pack_template_message(self.fake.pack_message(FlowRule()))
+        self.assertEqual(list(decode_message(data)), [])
+
+    def test_stream_and_file(self):
+        stream = b''.join(self.fake.pack_message(rule) for rule in self.rules)
+        self.assertEqual(len(list(split_messages(stream))), 4)
+        self.assertRoundTrip(list(decode_stream(bytearray(stream))),
+                             self.rules)
+        handle, path = tempfile.mkstemp()
+        try:
+            os.write(handle, stream)
+            os.close(handle)
+            self.assertRoundTrip(list(decode_file(path)), self.rules)
+            for _ in decode_file(path):
+                break
+        finally:
+            os.remove(path)
+
+    def test_truncated(self):
+        data = self.fake.pack_message(self.rules[0])
+        self.assertRaises(ValueError, list, decode_message(data[:-3]))
+        self.assertRaises(ValueError, list, decode_stream(data + data[:20]))
+        broken = data[:58] + b'\x00\x03' + data[60:]
+        self.assertRaises(ValueError, list, decode_message(broken))
+
+    def test_short_class_length(self):
+        record = bytearray(self.fake.pack_msg_payload(self.rules[0]))
+        record[CLASS_LEN_OFFSET] = 3
+        self.assertRaises(ValueError, decode_record, memoryview(record))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import os
+import shutil
+import struct
+import sys
+import tempfile
+sys.path.append("..")
+from fcn import FCN
+from fcn_flowfile import FlowFile
+from fcn_flowfile import FlowFileWriter
+from fcn_flowfile import convert
+from fcn_rule import FlowRule
+from fcn_rule import RuleArray
+
+
+class FlowFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'rules.flows')
+        self.fake = FCN.__new__(FCN)
+        self.rules = [FlowRule(srcip='10.0.0.%d' % i, destip='10.0.1.1',
+                               srcport=i, destport=80, prototype=6,
+                               msgtype=i % 3, mclass='class%d' % (i % 2),
+                               prio=i, timeoutval=30 + i)
+                      for i in range(1, 11)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, rules):
+        with FlowFileWriter(self.path) as writer:
+            for rule in rules:
+                writer.add(rule)
+
+    def test_records_match_encoder(self):
+        self.write(self.rules)
+        with FlowFile(self.path) as flow_file:
+            self.assertEqual(len(flow_file), 10)
+            self.assertEqual(flow_file.classes, [b'class1', b'class0'])
+            self.assertEqual(flow_file.records('myexp', 2, 20),
+                             [self.fake.pack_msg_payload(cli_inputs=rule)
+                              for rule in self.rules[2:]])
+
+    def test_messages(self):
+        self.write(self.rules)
+        expected = list(RuleArray(self.rules).messages(self.fake, 9, 200))
+        with FlowFile(self.path) as flow_file:
+            messages = list(flow_file.messages(self.fake, seq_no=9,
+                                               msg_size=200, chunk=3))
+        self.assertEqual(len(messages), 5)
+        # Export times may differ
+        self.assertEqual([data[:8] + data[12:] for data in messages],
+                         [data[:8] + data[12:] for data in expected])
+
+    def test_empty(self):
+        self.write([])
+        with FlowFile(self.path) as flow_file:
+            self.assertEqual(len(flow_file), 0)
+            self.assertEqual(list(flow_file.messages(self.fake)), [])
+
+    def test_invalid_rule(self):
+        with FlowFileWriter(self.path) as writer:
+            self.assertRaises(NameError, writer.add, FlowRule(msgtype=3))
+            self.assertRaises(NameError, writer.add, FlowRule(srcip='1.2.3'))
+            self.assertRaises(NameError, writer.add, FlowRule(srcport=-1))
+            self.assertRaises(NameError, writer.add,
+                              FlowRule(mclass='x' * 252))
+            self.assertEqual(writer.count, 0)
+
+    def test_partial_file_removed(self):
+        with self.assertRaises(NameError):
+            with FlowFileWriter(self.path) as writer:
+                writer.add(FlowRule())
+                raise NameError('Invalid IP')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_flow_file(self):
+        with open(self.path, 'wb') as stream:
+            stream.write(b'srcip,destip\n' * 10)
+        self.assertRaises(NameError, FlowFile, self.path)
+        self.assertRaises(NameError, FlowFile,
+                          os.path.join(self.directory, 'missing'))
+
+    def test_corrupt_record(self):
+        self.write(self.rules[:1])
+        with open(self.path, 'r+b') as stream:
+            # Class index past the class table
+            stream.seek(32 + 18)
+            stream.write(struct.pack('!H', 5))
+        with FlowFile(self.path) as flow_file:
+            self.assertRaises(NameError, flow_file.records, 'myexp')
+
+    def test_invalid_action_flag(self):
+        self.write(self.rules)
+        with FlowFile(self.path) as flow_file:
+            self.assertRaises(NameError, list,
+                              flow_file.messages(self.fake, a_flg=70000))
+
+    def test_convert(self):
+        source = os.path.join(self.directory, 'rules.csv')
+        with open(source, 'w') as stream:
+            stream.write('srcip,destport,class\n'
+                         '10.0.0.1,80,web\n'
+                         '10.0.0.2,,\n')
+        self.assertEqual(convert(source, self.path), 2)
+        with FlowFile(self.path) as flow_file:
+            self.assertEqual(
+                flow_file.records('myexp'),
+                [self.fake.pack_msg_payload(cli_inputs=FlowRule(
+                    srcip='10.0.0.1', destport=80, mclass='web')),
+                 self.fake.pack_msg_payload(cli_inputs=FlowRule(
+                     srcip='10.0.0.2'))])
+
+    def test_convert_error(self):
+        source = os.path.join(self.directory, 'rules.csv')
+        with open(source, 'w') as stream:
+            stream.write('srcip\n10.0.0.1\n10.0.0\n')
+        with self.assertRaises(NameError) as context:
+            convert(source, self.path)
+        self.assertEqual(str(context.exception), 'Error: Line 3: Invalid IP')
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
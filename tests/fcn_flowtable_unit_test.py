@@ -0,0 +1,102 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import sys
+sys.path.append("..")
+from fcn_client import FlowRule
+from fcn_flowtable import FlowTable
+
+
+class FlowTableTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.table = FlowTable(clock=lambda: self.now)
+
+    def test_duplicate_add(self):
+        rule = FlowRule(srcip='10.0.0.1', timeoutval=60)
+        self.assertTrue(self.table.admit(rule))
+        self.assertFalse(self.table.admit(rule))
+        # Another class is another flow
+        self.assertTrue(self.table.admit(FlowRule(srcip='10.0.0.1',
+                                                  mclass='other')))
+        self.now = 59.9
+        self.assertFalse(self.table.admit(rule))
+        self.now = 60
+        self.assertFalse(rule in self.table)
+        self.assertTrue(self.table.admit(rule))
+        self.assertEqual(self.table.suppressed, 2)
+
+    def test_refresh(self):
+        table = FlowTable(refresh=5, clock=lambda: self.now)
+        rule = FlowRule(timeoutval=60)
+        self.assertTrue(table.admit(rule))
+        self.now = 50
+        self.assertFalse(table.admit(rule))
+        self.now = 55
+        self.assertTrue(table.admit(rule))
+        self.now = 110
+        self.assertTrue(rule in table)
+
+    def test_remove(self):
+        add = FlowRule(srcip='10.0.0.1')
+        remove = FlowRule(srcip='10.0.0.1', msgtype=1)
+        self.assertFalse(self.table.admit(remove))
+        self.table.admit(add)
+        self.assertTrue(self.table.admit(remove))
+        self.assertFalse(self.table.admit(remove))
+        self.assertTrue(self.table.admit(add))
+
+    def test_remove_all(self):
+        for port in range(10):
+            self.table.admit(FlowRule(srcport=port))
+        self.assertTrue(self.table.admit(FlowRule(msgtype=2)))
+        self.assertTrue(self.table.admit(FlowRule(msgtype=2)))
+        self.assertEqual(len(self.table), 0)
+
+    def test_max_flows(self):
+        table = FlowTable(max_flows=2, clock=lambda: self.now)
+        for port, timeoutval in [(1, 30), (2, 10), (3, 20)]:
+            table.admit(FlowRule(srcport=port, timeoutval=timeoutval))
+        # The flow closest to expiry made room
+        self.assertEqual(sorted(key[2] for key in table.flows), [1, 3])
+
+    def test_stale_entries_compacted(self):
+        rule = FlowRule(msgtype=0)
+        remove = FlowRule(msgtype=1)
+        for _ in range(1000):
+            self.table.admit(rule)
+            self.table.admit(remove)
+        self.assertTrue(len(self.table.expiries) <= 66)
+        self.table.discard(rule)
+        self.assertEqual(len(self.table), 0)
+
+if __name__ == '__main__':
+    unittest.main()
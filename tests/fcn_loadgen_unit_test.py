@@ -0,0 +1,148 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import argparse
+import sys
+sys.path.append("..")
+from fcn_loadgen import LoadGenerator
+from fcn_loadgen import LoadReport
+from fcn_loadgen import TokenBucket
+from fcn_loadgen import generate_rules
+
+
+class _Clock(object):
+    """Simulated time that only moves when slept
+
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _base():
+    return argparse.Namespace(srcip='10.0.0.1', destip='10.0.0.2',
+                              seq_no=4294967294, srcport=0, destport=80)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_even_spacing(self):
+        clock = _Clock()
+        bucket = TokenBucket(100, burst=1, clock=clock)
+        times = []
+        for _ in range(3):
+            due = bucket.reserve()
+            clock.sleep(due - clock())
+            times.append(round(clock() - 1000.0, 6))
+        self.assertEqual(times, [0.01, 0.02, 0.03])
+
+    def test_burst_after_idle(self):
+        clock = _Clock()
+        bucket = TokenBucket(100, burst=5, clock=clock)
+        clock.sleep(1)
+        dues = [bucket.reserve() for _ in range(6)]
+        self.assertEqual(dues[:5], [clock()] * 5)
+        self.assertAlmostEqual(dues[5] - clock(), 0.01)
+
+
+class LoadGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.sent = []
+
+    def run_load(self, send=None, **kwargs):
+        generator = LoadGenerator(send or self.sent.append,
+                                  generate_rules(_base()),
+                                  clock=self.clock, sleep=self.clock.sleep,
+                                  **kwargs)
+        return generator.run()
+
+    def test_duration(self):
+        report = self.run_load(rate=1000, duration=2)
+        self.assertEqual(report.sent, 1999)
+        self.assertAlmostEqual(report.rate, 1000, delta=1)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(report.jitter_max, 0)
+
+    def test_count(self):
+        report = self.run_load(rate=1000, count=10)
+        self.assertEqual(len(self.sent), 10)
+        self.assertEqual(report.sent, 10)
+
+    def test_poisson_mean_rate(self):
+        report = self.run_load(rate=1000, duration=20, poisson=True, seed=1)
+        self.assertAlmostEqual(report.rate, 1000, delta=50)
+
+    def test_ramp(self):
+        report = self.run_load(rate=1000, duration=2, ramp=2)
+        self.assertAlmostEqual(report.sent, 1000, delta=50)
+
+    def test_errors_counted(self):
+        def send(rule):
+            raise NameError('Error: Couldn\'t send to socket')
+        report = self.run_load(send=send, rate=1000, count=5)
+        self.assertEqual((report.sent, report.errors), (0, 5))
+
+    def test_merged_reports(self):
+        first = self.run_load(rate=1000, count=10)
+        second = LoadReport(500)
+        second.record(0.002)
+        second.record(0.004, error=True)
+        second.elapsed = 0.5
+        total = LoadReport.merged([first, second])
+        self.assertEqual((total.sent, total.errors), (11, 1))
+        self.assertEqual(total.target_rate, 1500)
+        self.assertEqual(total.elapsed, max(first.elapsed, 0.5))
+        self.assertAlmostEqual(total.jitter_max, 0.004)
+        self.assertAlmostEqual(total.jitter_mean, 0.006 / 12)
+
+    def test_invalid_rate(self):
+        self.assertRaises(NameError, LoadGenerator, self.sent.append, [], 0)
+
+
+class GenerateRulesTest(unittest.TestCase):
+    def test_flows_cycle(self):
+        rules = generate_rules(_base(), flows=65537)
+        first = [next(rules) for _ in range(65538)]
+        self.assertEqual((first[0].srcip, first[0].srcport), ('10.0.0.1', 1))
+        self.assertEqual((first[65535].srcip, first[65535].srcport),
+                         ('10.0.0.2', 1))
+        self.assertEqual((first[65537].srcip, first[65537].srcport),
+                         ('10.0.0.1', 1))
+        self.assertEqual([rule.seq_no for rule in first[:3]],
+                         [4294967294, 4294967295, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import os
+import pickle
+import shutil
+import socket
+import sys
+import tempfile
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FCNClient
+from fcn_client import FlowRule
+from fcn_metrics import Histogram
+from fcn_metrics import Metrics
+from fcn_rule import RuleArray
+from fcn_transport import Transport
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    # Python 2
+    from urllib2 import urlopen
+
+
+class HistogramTest(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.001, 0.01))
+        self.assertEqual(histogram.quantile(0.5), None)
+        for seconds in (0.0005, 0.001, 0.005, 0.5):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 0.5065)
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(0.75), 0.01)
+        self.assertEqual(histogram.quantile(1), float('inf'))
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+
+    def tearDown(self):
+        self.metrics.stop()
+        self.sink.close()
+
+    def test_instrument(self):
+        fake = FCN.__new__(FCN)
+        self.metrics.instrument(fake)
+        fake.pack_message(cli_inputs=FlowRule())
+        self.assertRaises(NameError, fake.pack_message,
+                          FlowRule(msgtype=5))
+        stages = self.metrics.stages
+        self.assertEqual(stages['payload'].count, 2)
+        self.assertEqual(stages['template'].count, 1)
+        self.assertEqual(stages['header'].count, 1)
+        self.assertEqual(self.metrics.stage_errors['payload'], 1)
+        self.assertEqual(self.metrics.counters['encode_errors'], 1)
+        # Other instances are not timed
+        FCN.__new__(FCN).pack_message(cli_inputs=FlowRule())
+        self.assertEqual(stages['payload'].count, 2)
+
+    def test_bulk_encoders(self):
+        fake = FCN.__new__(FCN)
+        self.metrics.instrument(fake)
+        rules = RuleArray()
+        for port in range(30):
+            rules.add(srcport=port)
+        self.metrics.instrument_records(rules)
+        messages = list(rules.messages(fake, msg_size=1000, chunk=10))
+        list(rules.messages(fake, msg_size=1000, session=True))
+        stages = self.metrics.stages
+        self.assertEqual(stages['records'].count, 4)
+        self.assertEqual(stages['batch'].count, 2 * len(messages))
+        # Records are encoded in bulk, not one by one
+        self.assertEqual(stages['payload'].count, 0)
+
+    def test_client(self):
+        with FCNClient(port=self.sink.getsockname()[1],
+                       metrics=self.metrics) as client:
+            client.add()
+            client.add()
+        counters = self.metrics.counters
+        self.assertEqual(counters['messages_sent'], 2)
+        self.assertEqual(counters['bytes_sent'], 2 * 130)
+        self.assertEqual(counters['connects'], 1)
+        self.assertEqual(self.metrics.stages['send'].count, 2)
+        self.assertEqual(len(self.sink.recv(2048)), 130)
+
+    def test_client_rule_array(self):
+        rules = RuleArray()
+        rules.add(srcport=1)
+        with FCNClient(port=self.sink.getsockname()[1],
+                       metrics=self.metrics) as client:
+            client.send_rule_array(rules)
+            client.send_rule_array(rules)
+        self.assertEqual(self.metrics.stages['records'].count, 2)
+        # The caller's array is left untimed
+        self.assertNotIn('records', vars(rules))
+
+    def test_send_error(self):
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        transport = Transport(metrics=self.metrics)
+        self.assertRaises(NameError, transport.send, b'data', '127.0.0.1',
+                          port, 'TCP')
+        self.assertEqual(self.metrics.counters['send_errors'], 1)
+        self.assertEqual(self.metrics.counters['messages_sent'], 0)
+        self.assertEqual(self.metrics.stage_errors['connect'], 1)
+        self.assertEqual(self.metrics.stage_errors['send'], 1)
+
+    def test_render(self):
+        self.metrics.observe('send', 0.00002)
+        self.metrics.observe('send', 20)
+        self.metrics.inc('messages_sent', 3)
+        lines = self.metrics.render().splitlines()
+        self.assertIn('fcn_messages_sent_total 3', lines)
+        self.assertIn('# TYPE fcn_stage_seconds histogram', lines)
+        self.assertIn('fcn_stage_seconds_bucket{stage="send",le="2.5e-05"} 1',
+                      lines)
+        self.assertIn('fcn_stage_seconds_bucket{stage="send",le="+Inf"} 2',
+                      lines)
+        self.assertIn('fcn_stage_seconds_count{stage="send"} 2', lines)
+        buckets = [int(line.split()[-1]) for line in lines
+                   if line.startswith('fcn_stage_seconds_bucket')]
+        self.assertEqual(buckets, sorted(buckets))
+        summary = self.metrics.summary()
+        self.assertIn('Sent 3 messages', summary)
+
+    def test_merge(self):
+        fake = FCN.__new__(FCN)
+        self.metrics.instrument(fake)
+        fake.pack_message(cli_inputs=FlowRule())
+        worker = Metrics()
+        worker.export(port=0)
+        worker.observe('send', 0.001, failed=True)
+        worker.observe('payload', 0.001)
+        worker.inc('messages_sent', 2)
+        # Workers send their metrics back pickled
+        copy = pickle.loads(pickle.dumps(worker))
+        worker.stop()
+        self.metrics.merge(copy)
+        self.metrics.merge(copy)
+        self.assertEqual(self.metrics.counters['messages_sent'], 4)
+        self.assertEqual(self.metrics.stages['send'].count, 2)
+        self.assertEqual(self.metrics.stage_errors['send'], 2)
+        self.assertEqual(self.metrics.stages['payload'].count, 3)
+        # The instrumented encoder still records into the merged counts
+        fake.pack_message(cli_inputs=FlowRule())
+        self.assertEqual(self.metrics.stages['payload'].count, 4)
+
+    def test_export(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'fcn.prom')
+            self.metrics.inc('messages_sent')
+            self.metrics.export(path=path, port=0)
+            with open(path) as stream:
+                self.assertEqual(stream.read(), self.metrics.render())
+            port = self.metrics.server.server_address[1]
+            response = urlopen('http://127.0.0.1:%d/metrics' % port)
+            body = response.read().decode('utf-8')
+            response.close()
+            self.assertIn('fcn_messages_sent_total 1', body.splitlines())
+            self.metrics.stop()
+            self.assertEqual(os.listdir(directory), ['fcn.prom'])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import struct
+import sys
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FlowRule
+try:
+    import numpy
+    from fcn_numpy import encode_messages
+    from fcn_numpy import encode_records
+    from fcn_numpy import ip_array
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class NumpyEncoderTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+
+    def rules(self):
+        return [FlowRule(srcip='10.0.0.%d' % i, destip='192.168.1.2',
+                         srcport=1000 + i, destport=80, prototype=6,
+                         prio=i, timeoutval=60 + i, msgtype=i % 3,
+                         mclass='web')
+                for i in range(5)]
+
+    def test_records_match_encoder(self):
+        rules = self.rules()
+        records = encode_records(
+            srcip=ip_array(rule.srcip for rule in rules),
+            destip=ip_array(['192.168.1.2']),
+            srcport=[rule.srcport for rule in rules],
+            destport=80,
+            prototype=6,
+            prio=[rule.prio for rule in rules],
+            timeoutval=[rule.timeoutval for rule in rules],
+            msgtype=[rule.msgtype for rule in rules],
+            mclass='web')
+        self.assertEqual(records.tobytes(), b''.join(
+            self.fake.pack_msg_payload(rule) for rule in rules))
+
+    def test_messages(self):
+        records = encode_records(srcip=numpy.arange(50), destip=1,
+                                 srcport=1, destport=2, prototype=6, prio=1,
+                                 timeoutval=60, mclass='myclass')
+        messages = list(encode_messages(self.fake, records, seq_no=10,
+                                        msg_size=60 + 20 * 70))
+        self.assertEqual([len(data) for data in messages],
+                         [1460, 1460, 60 + 10 * 70])
+        self.assertEqual([struct.unpack('!I', data[4:8])[0]
+                          for data in messages], [10, 30, 50])
+        self.assertEqual(b''.join(data[60:] for data in messages),
+                         records.tobytes())
+
+    def test_session_messages(self):
+        records = encode_records(srcip=numpy.arange(3), destip=1, srcport=1,
+                                 destport=2, prototype=6, prio=1,
+                                 timeoutval=60)
+        messages = list(encode_messages(self.fake, records, session=True))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(len(messages[0]), 16 + 3 * 70)
+
+    def test_out_of_range(self):
+        self.assertRaises(NameError, encode_records, srcip=[1], destip=[1],
+                          srcport=[70000], destport=1, prototype=6, prio=1,
+                          timeoutval=60)
+        self.assertRaises(NameError, encode_records, srcip=[1], destip=[1],
+                          srcport=1, destport=1, prototype=6, prio=1,
+                          timeoutval=60, a_flg=70000)
+        self.assertRaises(NameError, encode_records, srcip=[1, 2],
+                          destip=[1, 2, 3], srcport=1, destport=1,
+                          prototype=6, prio=1, timeoutval=60)
+        self.assertRaises(NameError, ip_array, ['10.0.0'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import sys
+sys.path.append("..")
+import fcn
+from fcn import FCN
+from fcn_client import FlowRule
+from fcn_packet import PacketBuilder
+
+
+class PacketBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self._time = fcn.time.time
+        fcn.time.time = lambda: 1461283200.5
+
+    def tearDown(self):
+        fcn.time.time = self._time
+
+    def test_unpatched_matches_encoder(self):
+        rule = FlowRule(srcip='10.0.0.1', destip='10.0.0.2', seq_no=5)
+        builder = PacketBuilder(self.fake, rule)
+        self.assertEqual(bytes(builder.buffer), self.fake.pack_message(rule))
+
+    def test_patch_matches_encoder(self):
+        builder = PacketBuilder(self.fake, FlowRule(prototype=6))
+        builder.patch_header(99, 1461283200)
+        builder.patch_flow(0, 0x0a000001, 0xc0a80102, 80, 5000, 17)
+        builder.patch_msg_type(0, 1)
+        rule = FlowRule(srcip='10.0.0.1', destip='192.168.1.2', srcport=80,
+                        destport=5000, prototype=17, msgtype=1, seq_no=99)
+        self.assertEqual(bytes(builder.buffer), self.fake.pack_message(rule))
+
+    def test_patch_records(self):
+        rule = FlowRule(seq_no=7)
+        builder = PacketBuilder(self.fake, rule, records=3, session=True)
+        builder.patch_flow(2, 0x0a000003, 0x0a000004, 3, 4, 6)
+        expected = [self.fake.pack_msg_payload(rule)] * 2 + [
+            self.fake.pack_msg_payload(FlowRule(
+                srcip='10.0.0.3', destip='10.0.0.4', srcport=3, destport=4,
+                prototype=6))]
+        self.assertEqual(bytes(builder.buffer),
+                         self.fake.pack_data_batch(rule, expected))
+
+    def test_patch_in_place(self):
+        builder = PacketBuilder(self.fake, FlowRule())
+        buffer = builder.buffer
+        builder.patch_header(1, 2)
+        self.assertIs(buffer, builder.buffer)
+        self.assertEqual(bytes(builder.buffer[4:12]),
+                         b'\x00\x00\x00\x01\x00\x00\x00\x02')
+
+if __name__ == '__main__':
+    unittest.main()
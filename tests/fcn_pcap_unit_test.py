@@ -0,0 +1,267 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import argparse
+import io
+import itertools
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import sys
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FlowRule
+from fcn_decoder import decode_message
+from fcn_pcap import PcapTransport
+from fcn_pcap import PcapWriter
+from fcn_pcap import checksum
+from fcn_pcap import flow_key
+from fcn_pcap import pcap_format
+from fcn_pcap import read_flows
+from fcn_pcap import read_packets
+
+
+def read_pcap(path):
+    """Returns the (timestamp, frame) records of a pcap file"""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    records = []
+    offset = 24
+    while offset < len(data):
+        sec, usec, length, _ = struct.unpack_from('<IIII', data, offset)
+        offset += 16
+        records.append((sec + usec / 1e6, data[offset:offset + length]))
+        offset += length
+    return records
+
+
+def read_pcapng(path):
+    """Returns the frames of the enhanced packet blocks of a pcapng file"""
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    frames = []
+    offset = 0
+    while offset < len(data):
+        block_type, block_len = struct.unpack_from('<II', data, offset)
+        if block_type == 6:
+            length = struct.unpack_from('<I', data, offset + 20)[0]
+            frames.append(data[offset + 28:offset + 28 + length])
+        offset += block_len
+    return frames
+
+
+class ChecksumTest(unittest.TestCase):
+    def test_checksum(self):
+        # Widely used worked example of an IPv4 header checksum
+        header = bytearray.fromhex('450000730000400040110000c0a80001c0a800c7')
+        self.assertEqual(checksum(bytes(header)), 0xb861)
+        self.assertEqual(checksum(b'\x01'), 0xfeff)
+
+    def test_format(self):
+        self.assertEqual(pcap_format('a.pcapng'), 'pcapng')
+        self.assertEqual(pcap_format('a.cap'), 'pcap')
+        self.assertEqual(pcap_format('a.pcapng', 'pcap'), 'pcap')
+        self.assertRaises(NameError, pcap_format, 'a.pcap', 'erf')
+
+
+class PcapTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self.message = self.fake.pack_message(FlowRule(seq_no=5))
+        self.tmp = tempfile.mkdtemp()
+        times = itertools.count(100)
+        self.clock = lambda: next(times)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check_ip(self, frame):
+        self.assertEqual(frame[12:14], b'\x08\x00')
+        self.assertEqual(checksum(frame[14:34]), 0)
+        return frame[34:]
+
+    def test_udp(self):
+        path = os.path.join(self.tmp, 'out.pcap')
+        big = self.message * 40
+        with PcapTransport(path, clock=self.clock) as transport:
+            transport.send(self.message, '10.0.0.2', 5000, 'UDP')
+            transport.send(big, '10.0.0.2', 5000, 'UDP')
+        records = read_pcap(path)
+        self.assertEqual(records[0][0], 100)
+        self.assertEqual(len(records), 1 + 4)
+        segment = self.check_ip(records[0][1])
+        self.assertEqual(segment[8:], self.message)
+        self.assertEqual(struct.unpack('!HH', segment[:4]), (49152, 5000))
+        pseudo = (records[0][1][26:34] +
+                  struct.pack('!BBH', 0, 17, len(segment)))
+        self.assertEqual(checksum(pseudo + segment), 0)
+        # Fragments reassemble into the big message
+        data = b''.join(self.check_ip(frame) for _, frame in records[1:])
+        self.assertEqual(data[8:], big)
+        self.assertTrue(all(len(frame) <= 1514 for _, frame in records))
+
+    def test_tcp_session(self):
+        path = os.path.join(self.tmp, 'out.pcapng')
+        data = self.fake.pack_data_batch(
+            FlowRule(), [self.fake.pack_msg_payload(FlowRule())] * 30)
+        with PcapTransport(path) as transport:
+            for _ in range(2):
+                transport.send(data, '10.0.0.2', 5000, 'TCP',
+                               template=FCN.pack_template_message)
+        frames = read_pcapng(path)
+        segments = [self.check_ip(frame) for frame in frames]
+        flags = [bytearray(segment)[13] for segment in segments]
+        self.assertEqual(flags[:3], [0x02, 0x12, 0x10])
+        self.assertEqual(flags[-3:], [0x11, 0x11, 0x10])
+        stream = b''.join(segment[20:] for segment in segments
+                          if segment[:2] == struct.pack('!H', 49152))
+        self.assertEqual(stream,
+                         FCN.pack_template_message(data) + data + data)
+        # Sequence numbers follow the data sent
+        seqs = [struct.unpack_from('!I', segment, 4)[0]
+                for segment in segments[3:-3]]
+        lengths = [len(segment) - 20 for segment in segments[3:-3]]
+        for i in range(1, len(seqs)):
+            self.assertEqual(seqs[i], seqs[i - 1] + lengths[i - 1])
+
+    def test_errors(self):
+        self.assertRaises(NameError, PcapTransport,
+                          os.path.join(self.tmp, 'no', 'out.pcap'))
+        path = os.path.join(self.tmp, 'out.pcap')
+        with PcapTransport(path) as transport:
+            self.assertRaises(NameError, transport.send, self.message,
+                              '10.0.0', 5000, 'UDP')
+            self.assertRaises(NameError, transport.send,
+                              b'\x00' * 65508, '10.0.0.2', 5000, 'UDP')
+
+    def test_open_transport(self):
+        inputs = argparse.Namespace(pcap=os.path.join(self.tmp, 'l.pcap'),
+                                    pcap_format='pcapng',
+                                    template_interval=60)
+        transport = FCN.open_transport(inputs, 1, 2)
+        transport.close()
+        self.assertEqual(transport.writer.fmt, 'pcapng')
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, 'l-1.pcap')))
+
+
+class PcapWriterTest(unittest.TestCase):
+    def test_header(self):
+        stream = io.BytesIO()
+        writer = PcapWriter(stream)
+        writer.write(b'\x00' * 60, 1.5)
+        self.assertEqual(stream.getvalue()[:4], b'\xd4\xc3\xb2\xa1')
+        self.assertEqual(struct.unpack_from('<IIII', stream.getvalue(), 24),
+                         (1, 500000, 60, 60))
+        self.assertEqual(writer.packets, 1)
+
+class ReadPcapTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self.tmp = tempfile.mkdtemp()
+        self.defaults = argparse.Namespace(seq_no=7, msgtype=1, srcip='',
+                                           destip='', srcport=0, destport=0,
+                                           prototype=0, mclass='c', prio=1,
+                                           timeoutval=60, export='e',
+                                           a_flg=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_capture(self, fmt):
+        path = os.path.join(self.tmp, 'in.' + fmt)
+        message = self.fake.pack_message(FlowRule())
+        times = itertools.count(10)
+        with PcapTransport(path, clock=lambda: next(times)) as transport:
+            for port in [5000, 5000, 6000]:
+                transport.send(message, '10.0.0.2', port, 'UDP')
+            transport.send(message, '10.0.0.3', 5000, 'TCP')
+        return path
+
+    def test_round_trip(self):
+        for fmt in ['pcap', 'pcapng']:
+            with open(self.write_capture(fmt), 'rb') as stream:
+                packets = list(read_packets(stream))
+            self.assertEqual(len(packets), 3 + 7)
+            self.assertEqual([packet[:2] for packet in packets[:2]],
+                             [(10, 1), (11, 1)])
+            self.assertEqual(flow_key(1, packets[0][2]),
+                             (('192.0.2.1', '10.0.0.2', 49152, 5000, 17),
+                              158))
+
+    def test_big_endian_nanoseconds(self):
+        frame = b'\x00' * 16 + b'\x45' + b'\x00' * 19
+        data = (struct.pack('>IHHiIII', 0xa1b23c4d, 2, 4, 0, 0, 65535, 101) +
+                struct.pack('>IIII', 3, 500000000, 20, 20) + frame[16:])
+        packets = list(read_packets(io.BytesIO(data)))
+        self.assertEqual(packets, [(3.5, 101, frame[16:])])
+        self.assertRaises(NameError, read_packets, io.BytesIO(b'junk'))
+
+    def test_link_types(self):
+        ip = bytearray(20)
+        ip[0] = 0x45
+        ip[9] = 17
+        ip[12:20] = bytearray([10, 0, 0, 1, 10, 0, 0, 2])
+        packet = bytes(ip) + struct.pack('!HH', 1, 2)
+        key = ('10.0.0.1', '10.0.0.2', 1, 2, 17)
+        vlan = b'\x00' * 12 + b'\x81\x00\x00\x05\x08\x00' + packet
+        sll = b'\x00' * 14 + b'\x08\x00' + packet
+        self.assertEqual(flow_key(1, vlan)[0], key)
+        self.assertEqual(flow_key(113, sll)[0], key)
+        self.assertEqual(flow_key(0, b'\x02\x00\x00\x00' + packet)[0], key)
+        self.assertEqual(flow_key(101, packet)[0], key)
+        # IPv6, later fragments and unknown link types are skipped
+        self.assertEqual(flow_key(101, b'\x60' + packet[1:]), None)
+        fragment = packet[:6] + b'\x00\x10' + packet[8:]
+        self.assertEqual(flow_key(101, fragment), None)
+        self.assertEqual(flow_key(147, packet), None)
+
+    def test_read_flows(self):
+        path = self.write_capture('pcapng')
+        with open(path, 'rb') as stream:
+            rules = list(read_flows(stream, self.defaults))
+        self.assertEqual([position for position, _ in rules], [1, 3, 4, 5])
+        self.assertEqual([(rule.destport, rule.seq_no, rule.msgtype)
+                          for _, rule in rules],
+                         [(5000, 7, 0), (6000, 8, 0), (5000, 9, 0),
+                          (49154, 10, 0)])
+        with open(path, 'rb') as stream:
+            rules = list(read_flows(stream, self.defaults, counts=True))
+        self.assertEqual([(rule.packet_count, rule.kbyte_count)
+                          for _, rule in rules],
+                         [(2, 0), (1, 0), (5, 0), (2, 0)])
+        # The counts are encoded into the rule
+        record = next(decode_message(self.fake.pack_message(rules[0][1])))
+        self.assertEqual((record.srcip, record.packet_count),
+                         ('192.0.2.1', 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import random
+import socket
+import unittest
+import sys
+sys.path.append("..")
+from fcn_client import FCNClient
+from fcn_client import FlowRule
+from fcn_decoder import decode_message
+from fcn_refresh import RefreshScheduler
+from fcn_refresh import TimerWheel
+
+
+class TimerWheelTest(unittest.TestCase):
+    def test_expiry_order(self):
+        wheel = TimerWheel(tick=0.5, start=100)
+        for key, when in [('c', 103), ('a', 100.6), ('b', 101), ('d', 99)]:
+            wheel.schedule(key, key.upper(), when)
+        self.assertEqual(wheel.advance(100.4), [])
+        expired = wheel.advance(101.2)
+        # Past times are due at the next tick
+        self.assertEqual(sorted(expired[:2]), [('a', 'A'), ('d', 'D')])
+        self.assertEqual(expired[2:], [('b', 'B')])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.cancel('c'), 'C')
+        self.assertEqual(wheel.cancel('c'), None)
+        self.assertEqual(wheel.advance(200), [])
+
+    def test_levels_and_overflow(self):
+        # 4 slots per level, 3 levels: timers past 64 ticks overflow
+        for levels in [1, 3]:
+            rand = random.Random(levels)
+            wheel = TimerWheel(tick=1, bits=2, levels=levels, start=5)
+            due = {}
+            for key in range(200):
+                due[key] = rand.randint(6, 400)
+                wheel.schedule(key, None, due[key])
+            # Rescheduling replaces the timer
+            wheel.schedule(0, None, 300)
+            due[0] = 300
+            fired = {}
+            for now in range(6, 410, 7):
+                for key, _ in wheel.advance(now):
+                    fired[key] = now
+            for key in due:
+                self.assertTrue(fired[key] - 7 < due[key] <= fired[key])
+            self.assertEqual(len(wheel), 0)
+
+    def test_clear(self):
+        wheel = TimerWheel(start=0)
+        wheel.schedule('a', None, 1000)
+        wheel.clear()
+        self.assertFalse('a' in wheel)
+        self.assertEqual(wheel.advance(2000), [])
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.sent = []
+        self.scheduler = RefreshScheduler(self.sent.append, lead=5,
+                                          clock=lambda: self.now)
+
+    def test_batched_refresh(self):
+        rules = [FlowRule(srcport=port, timeoutval=60) for port in range(3)]
+        for rule in rules:
+            self.scheduler.track(rule)
+        short = FlowRule(srcport=9, timeoutval=4)
+        self.scheduler.track(short)
+        self.assertEqual(self.scheduler.poll(1001), 0)
+        self.assertEqual(self.scheduler.poll(1002.5), 1)
+        self.assertEqual(self.scheduler.poll(1055), 4)
+        self.assertEqual(self.sent[0], [short])
+        self.assertEqual(sorted(rule.srcport for rule in self.sent[-1]),
+                         [0, 1, 2, 9])
+        # Refreshed rules stay scheduled until forgotten
+        self.scheduler.forget(rules[0])
+        self.assertEqual(self.scheduler.poll(1111), 3)
+        self.assertEqual(self.scheduler.refreshed, 8)
+        self.scheduler.clear()
+        self.assertEqual(len(self.scheduler), 0)
+
+
+class ClientRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+        self.client = FCNClient(port=self.sink.getsockname()[1], seq_no=1,
+                                refresh=5, flow_table=True)
+
+    def tearDown(self):
+        self.client.close()
+        self.sink.close()
+
+    def test_refresh(self):
+        now = self.client.refresher.clock()
+        self.client.add(srcip='10.0.0.1', timeoutval=30)
+        self.client.add(srcip='10.0.0.2', timeoutval=30)
+        self.client.add(srcip='10.0.0.3', timeoutval=30)
+        self.client.remove(srcip='10.0.0.3', timeoutval=30)
+        for _ in range(4):
+            self.sink.recv(2048)
+        self.assertEqual(self.client.refresh_due(now + 10), 0)
+        self.assertEqual(self.client.refresh_due(now + 26), 2)
+        records = list(decode_message(self.sink.recv(2048)))
+        self.assertEqual([record.seq_no for record in records], [5, 6])
+        self.assertEqual(sorted(record.srcip for record in records),
+                         ['10.0.0.1', '10.0.0.2'])
+        # The flow table knows the flows were renewed
+        self.assertEqual(self.client.add(srcip='10.0.0.1', timeoutval=30),
+                         None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import os
+import shutil
+import struct
+import sys
+import tempfile
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FlowRule
+from fcn_ring import RingBuffer
+from fcn_ring import RingConsumer
+
+
+class RingBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fcn.ring')
+        self.ring = RingBuffer(self.path, 4)
+
+    def tearDown(self):
+        self.ring.close()
+        shutil.rmtree(self.directory)
+
+    def test_full_and_wrap(self):
+        producer = RingBuffer(self.path)
+        self.assertEqual(producer.capacity, 4)
+        for port in range(4):
+            self.assertTrue(producer.push(srcport=port))
+        self.assertFalse(producer.push(srcport=4))
+        self.assertEqual(len(self.ring), 4)
+        self.assertEqual([record[2] for record in self.ring.pop(3)],
+                         [0, 1, 2])
+        for port in range(4, 7):
+            self.assertTrue(producer.push(srcport=port))
+        self.assertEqual([record[2] for record in self.ring.pop()],
+                         [3, 4, 5, 6])
+        self.assertEqual(self.ring.pop(), [])
+        producer.close()
+
+    def test_invalid(self):
+        self.assertRaises(NameError, RingBuffer, self.path, 3)
+        self.assertRaises(NameError, self.ring.push, mclass=b'x' * 21)
+        self.assertRaises(NameError, self.ring.push, srcport=70000)
+        path = os.path.join(self.directory, 'other')
+        with open(path, 'wb') as stream:
+            stream.write(b'\x00' * 256)
+        self.assertRaises(NameError, RingBuffer, path)
+        self.assertRaises(NameError, RingBuffer,
+                          os.path.join(self.directory, 'missing'))
+
+
+class RingConsumerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.ring = RingBuffer(os.path.join(self.directory, 'fcn.ring'), 64)
+        self.fake = FCN.__new__(FCN)
+        self.sent = []
+        self.consumer = RingConsumer(self.ring, self.fake, self.sent.append,
+                                     FlowRule(seq_no=20), msg_size=60 + 66 * 2)
+
+    def tearDown(self):
+        self.ring.close()
+        shutil.rmtree(self.directory)
+
+    def test_records_match_encoder(self):
+        self.ring.push(0x0a000001, 0x0a000002, 80, 5000, 6, 1, b'web', 20,
+                       30, 7, 8)
+        self.ring.push(mclass=b'')
+        rules = [FlowRule(srcip='10.0.0.1', destip='10.0.0.2', srcport=80,
+                          destport=5000, prototype=6, msgtype=1,
+                          mclass='web', prio=20, timeoutval=30,
+                          packet_count=7, kbyte_count=8),
+                 FlowRule()]
+        self.assertEqual(self.consumer.records(self.ring.pop()),
+                         [self.fake.pack_msg_payload(cli_inputs=rule)
+                          for rule in rules])
+
+    def test_poll(self):
+        for port in range(5):
+            self.ring.push(srcport=port, mclass=b'web')
+        self.ring.push(msgtype=3)
+        self.assertEqual(self.consumer.poll(), 6)
+        self.assertEqual(self.consumer.poll(), 0)
+        self.assertEqual(self.consumer.errors, 1)
+        self.assertEqual(self.consumer.rules, 5)
+        self.assertEqual(
+            [(struct.unpack('!I', data[4:8])[0], (len(data) - 60) // 66)
+             for data in self.sent], [(20, 2), (22, 2), (24, 1)])
+        self.ring.push()
+        self.consumer.poll()
+        self.assertEqual(struct.unpack('!I', self.sent[-1][4:8])[0], 25)
+
+    def test_invalid_msg_size(self):
+        self.assertRaises(NameError, RingConsumer, self.ring, self.fake,
+                          self.sent.append, FlowRule(), msg_size=60)
+
+    def test_invalid_default_class(self):
+        self.assertRaises(NameError, RingConsumer, self.ring, self.fake,
+                          self.sent.append, FlowRule(mclass='x' * 252))
+
+    def test_invalid_action_flag(self):
+        self.assertRaises(NameError, RingConsumer, self.ring, self.fake,
+                          self.sent.append, FlowRule(a_flg=70000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import argparse
+import socket
+import unittest
+import sys
+sys.path.append("..")
+from fcn import FCN
+from fcn_batch import RecordBatcher
+from fcn_client import FCNClient
+from fcn_decoder import decode_stream
+from fcn_rule import FlowRule
+from fcn_rule import RuleArray
+
+
+def _rules():
+    return [FlowRule(srcip='10.0.0.%d' % i, destip='192.168.1.1',
+                     srcport=i, destport=80, prototype=6, msgtype=i % 3,
+                     mclass='class%d' % (i % 4), prio=i % 256,
+                     timeoutval=30 + i, export='e%d' % (i % 2),
+                     packet_count=i * 7, kbyte_count=i)
+            for i in range(100)]
+
+
+class FlowRuleTest(unittest.TestCase):
+    def test_slots(self):
+        rule = FlowRule()
+        self.assertFalse(hasattr(rule, '__dict__'))
+        self.assertRaises(AttributeError, setattr, rule, 'HOST', 'x')
+
+    def test_from_inputs(self):
+        inputs = argparse.Namespace(srcip='10.0.0.1', seq_no=4, HOST='x')
+        rule = FlowRule.from_inputs(inputs)
+        self.assertEqual(rule, FlowRule(srcip='10.0.0.1', seq_no=4))
+        copy = rule.copy()
+        copy.srcport = 80
+        self.assertNotEqual(rule, copy)
+
+
+class RuleArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self.rules = _rules()
+        self.array = RuleArray(self.rules)
+
+    def test_records_match_encoder(self):
+        self.assertEqual(len(self.array), 100)
+        self.assertEqual(self.array.records(),
+                         [self.fake.pack_msg_payload(rule)
+                          for rule in self.rules])
+        self.assertEqual(self.array.records(5, 7),
+                         [self.fake.pack_msg_payload(rule)
+                          for rule in self.rules[5:7]])
+
+    def test_messages_match_batcher(self):
+        for session in [False, True]:
+            expected = []
+            batcher = RecordBatcher(self.fake, expected.append, 600,
+                                    session=session)
+            for seq_no, rule in enumerate(self.rules, 9):
+                rule.seq_no = seq_no
+                batcher.add(rule)
+            batcher.flush()
+            messages = list(self.array.messages(self.fake, 9, 600, session,
+                                                chunk=7))
+            # Export times may differ by a second
+            self.assertEqual([data[:8] + data[12:] for data in messages],
+                             [data[:8] + data[12:] for data in expected])
+        self.assertRaises(NameError, list, self.array.messages(self.fake,
+                                                               msg_size=60))
+
+    def test_getitem(self):
+        rule = self.rules[42]
+        rule.seq_no = 0
+        self.assertEqual(self.array[42], rule)
+        self.assertEqual(self.array[-1].srcip, '10.0.0.99')
+        self.assertEqual(len(list(self.array)), 100)
+
+    def test_invalid(self):
+        for kwargs in [{'srcip': '10.0.0'}, {'srcport': 65536},
+                       {'prio': -1}, {'msgtype': 3},
+                       {'export': 'too long name'}, {'mclass': u'\xe9'},
+                       {'srcip': 2 ** 32}]:
+            self.assertRaises(NameError, self.array.add, **kwargs)
+        lengths = set(len(column) for column in self.array.columns.values())
+        self.assertEqual(lengths, set([100]))
+
+    def test_compact(self):
+        array = RuleArray()
+        for i in range(1000):
+            array.add(srcip=i, destip=0x0a000001, srcport=i)
+        self.assertEqual(array[1].srcip, '0.0.0.1')
+        self.assertTrue(array.nbytes <= 1000 * 30)
+        self.assertEqual((array.exports, array.classes),
+                         (['myexp'], ['myclass']))
+
+    def test_client_send(self):
+        sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink.bind(('127.0.0.1', 0))
+        sink.settimeout(2)
+        try:
+            with FCNClient(port=sink.getsockname()[1], seq_no=3) as client:
+                messages = client.send_rule_array(self.array)
+                self.assertEqual(client.seq_no, 103)
+            records = []
+            for _ in range(messages):
+                records.extend(decode_stream(sink.recv(2048)))
+        finally:
+            sink.close()
+        self.assertEqual([record.seq_no for record in records],
+                         list(range(3, 103)))
+        self.assertEqual(records[10].mclass, 'class2')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import argparse
+import io
+import sys
+sys.path.append("..")
+from fcn_rulefile import file_format
+from fcn_rulefile import read_rules
+
+
+def _defaults():
+    return argparse.Namespace(srcip='0.0.0.0', destip='0.0.0.0', seq_no=20,
+                              srcport=0, destport=0, prototype=0, msgtype=0,
+                              timeoutval=60, export='myexp', mclass='myclass',
+                              prio=1, HOST='127.0.0.1', PORT=5000,
+                              PROTO='UDP', a_flg=1)
+
+
+class RuleFileTest(unittest.TestCase):
+    def test_file_format(self):
+        self.assertEqual(file_format('rules.csv'), 'csv')
+        self.assertEqual(file_format('rules.JSONL'), 'jsonl')
+        self.assertEqual(file_format('-'), 'csv')
+        self.assertEqual(file_format('-', 'jsonl'), 'jsonl')
+        self.assertRaises(NameError, file_format, '-', 'xml')
+
+    def test_read_csv(self):
+        stream = io.StringIO(u'srcip,destip,srcport,mtype,class\n'
+                             u'10.0.0.1,10.0.0.2,80,1,web\n'
+                             u'10.0.0.3,,,,\n')
+        rules = list(read_rules(stream, 'csv', _defaults()))
+        self.assertEqual([line for line, _ in rules], [2, 3])
+        first, second = rules[0][1], rules[1][1]
+        self.assertEqual((first.srcip, first.destip, first.srcport,
+                          first.msgtype, first.mclass, first.seq_no),
+                         ('10.0.0.1', '10.0.0.2', 80, 1, 'web', 20))
+        self.assertEqual((second.srcip, second.destip, second.srcport,
+                          second.msgtype, second.mclass, second.seq_no),
+                         ('10.0.0.3', '0.0.0.0', 0, 0, 'myclass', 21))
+
+    def test_read_jsonl(self):
+        stream = io.StringIO(u'{"srcip": "10.0.0.1", "seqno": 5}\n'
+                             u'\n'
+                             u'{"prio": "7", "a_flg": 0}\n')
+        rules = [rule for _, rule in read_rules(stream, 'jsonl',
+                                                _defaults())]
+        self.assertEqual([rule.seq_no for rule in rules], [5, 6])
+        self.assertEqual((rules[1].prio, rules[1].a_flg), (7, 0))
+        self.assertEqual(rules[0].a_flg, 1)
+
+    def test_unknown_column(self):
+        stream = io.StringIO(u'srcip,colour\n10.0.0.1,red\n')
+        self.assertRaises(NameError, list,
+                          read_rules(stream, 'csv', _defaults()))
+
+    def test_invalid_int(self):
+        stream = io.StringIO(u'{"srcport": "http"}\n')
+        self.assertRaises(NameError, list,
+                          read_rules(stream, 'jsonl', _defaults()))
+
+    def test_invalid_json(self):
+        stream = io.StringIO(u'{"srcport": \n')
+        self.assertRaises(NameError, list,
+                          read_rules(stream, 'jsonl', _defaults()))
+
+if __name__ == '__main__':
+    unittest.main()
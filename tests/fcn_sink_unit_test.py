@@ -0,0 +1,112 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import sys
+sys.path.append("..")
+from fcn import FCN
+from fcn_client import FCNClient
+from fcn_client import FlowRule
+from fcn_sink import RAPSink
+from fcn_sink import SinkStats
+from fcn_sink import parse_message
+
+
+class ParseMessageTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+
+    def test_single(self):
+        data = self.fake.pack_message(FlowRule(msgtype=1, seq_no=9))
+        self.assertEqual(parse_message(data), (9, [1]))
+
+    def test_batch(self):
+        rules = [FlowRule(msgtype=i % 3, mclass='c' * i) for i in range(5)]
+        data = self.fake.pack_batch(
+            rules[0], [self.fake.pack_msg_payload(rule) for rule in rules])
+        self.assertEqual(parse_message(data), (20, [0, 1, 2, 0, 1]))
+
+    def test_session(self):
+        data = self.fake.pack_data_batch(
+            FlowRule(), [self.fake.pack_msg_payload(FlowRule())])
+        self.assertEqual(parse_message(data), (20, [0]))
+        self.assertEqual(parse_message(FCN.pack_template_message(data)),
+                         (20, []))
+
+    def test_invalid(self):
+        data = self.fake.pack_message(FlowRule())
+        self.assertRaises(ValueError, parse_message, data[:-1])
+        self.assertRaises(ValueError, parse_message, data[:8])
+        self.assertRaises(ValueError, parse_message, b'\x00\x02' + data[2:])
+
+
+class SinkStatsTest(unittest.TestCase):
+    def test_seq_gaps(self):
+        fake = FCN.__new__(FCN)
+        stats = SinkStats()
+        for seq_no in [1, 2, 5, 6]:
+            stats.add_message(fake.pack_message(FlowRule(seq_no=seq_no)), 'a')
+        stats.add_message(fake.pack_message(FlowRule(seq_no=100)), 'b')
+        stats.add_message(b'junk', 'a')
+        self.assertEqual((stats.messages, stats.rules['add'],
+                          stats.parse_errors, stats.seq_gaps,
+                          stats.seq_missing), (6, 5, 1, 1, 2))
+
+
+class RAPSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = RAPSink(port=0)
+
+    def tearDown(self):
+        self.sink.close()
+
+    def wait_for(self, messages):
+        for _ in range(40):
+            if self.sink.stats.messages >= messages:
+                break
+            self.sink.poll(0.05)
+
+    def test_udp_and_tcp(self):
+        for count, proto in [(3, 'UDP'), (6, 'TCP')]:
+            with FCNClient(port=self.sink.port, proto=proto) as client:
+                client.add()
+                client.remove()
+                client.send_rules([client.create_rule(2, '0.0.0.0', '0.0.0.0',
+                                                      0, 0, 0, 'c', 1, 60)
+                                   for _ in range(3)])
+                self.wait_for(count)
+        stats = self.sink.stats
+        self.assertEqual(stats.messages, 6)
+        self.assertEqual(stats.rules, {'add': 2, 'remove': 2,
+                                       'remove_all': 6, 'other': 0})
+        self.assertEqual((stats.parse_errors, stats.seq_gaps), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
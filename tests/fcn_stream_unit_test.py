@@ -0,0 +1,169 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import itertools
+import os
+import struct
+import sys
+import threading
+sys.path.append("..")
+from fcn import FCN
+from fcn_batch import RecordBatcher
+from fcn_flowtable import FlowTable
+import fcn_stream
+from fcn_rule import FlowRule
+from fcn_stream import RuleStream
+from fcn_stream import parse_line
+
+
+class ParseLineTest(unittest.TestCase):
+    def test_flags(self):
+        rule = FlowRule()
+        parse_line('-i 10.0.0.1 --destip 10.0.0.2 -k 80 --destport=5000 '
+                   '-u 6 -a 1 -c web -n 20 -t 30 -s 7 -o 0', rule)
+        self.assertEqual((rule.srcip, rule.destip, rule.srcport,
+                          rule.destport, rule.prototype, rule.msgtype,
+                          rule.mclass, rule.prio, rule.timeoutval,
+                          rule.seq_no, rule.a_flg),
+                         ('10.0.0.1', '10.0.0.2', 80, 5000, 6, 1, 'web', 20,
+                          30, 7, 0))
+
+    def test_invalid(self):
+        self.assertRaises(NameError, parse_line, '-x 10.0.0.1', FlowRule())
+        self.assertRaises(NameError, parse_line, '-i', FlowRule())
+        self.assertRaises(NameError, parse_line, '-k eighty', FlowRule())
+
+
+class RuleStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.sent = []
+        self.batcher = RecordBatcher(FCN.__new__(FCN), self.sent.append,
+                                     msg_size=60 + 70 * 3)
+
+    def tearDown(self):
+        os.close(self.read_fd)
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+
+    def write(self, data):
+        os.write(self.write_fd, data)
+
+    def end(self):
+        os.close(self.write_fd)
+        self.write_fd = None
+
+    def records(self, data):
+        seq_no = struct.unpack('!I', data[4:8])[0]
+        return seq_no, (len(data) - 60) // 70
+
+    def test_batches(self):
+        self.write(b''.join(b'-k %d\n' % (port + 1) for port in range(7)))
+        self.end()
+        stream = RuleStream(self.read_fd, FlowRule(seq_no=20), self.batcher)
+        self.assertEqual(stream.run(), 7)
+        self.assertEqual([self.records(data) for data in self.sent],
+                         [(20, 3), (23, 3), (26, 1)])
+
+    def test_last_line_without_newline(self):
+        self.write(b'# comment\n\n-i 10.0.0.1\n-i 10.0.0.2')
+        self.end()
+        stream = RuleStream(self.read_fd, FlowRule(), self.batcher)
+        self.assertEqual(stream.run(), 2)
+        self.assertEqual(len(self.sent), 1)
+
+    def test_invalid_lines_skipped(self):
+        self.write(b'-k 1\n-i 10.0.0\n--bogus 1\n-n 300\n-k 2\n')
+        self.end()
+        stream = RuleStream(self.read_fd, FlowRule(seq_no=20), self.batcher)
+        self.assertEqual(stream.run(), 2)
+        self.assertEqual(stream.errors, 3)
+        # Skipped lines don't use sequence numbers
+        self.assertEqual([self.records(data) for data in self.sent],
+                         [(20, 2)])
+
+    def test_flush_delay(self):
+        flushed = threading.Event()
+
+        def send(data):
+            self.sent.append(data)
+            flushed.set()
+
+        batcher = RecordBatcher(FCN.__new__(FCN), send)
+        stream = RuleStream(self.read_fd, FlowRule(seq_no=20), batcher,
+                            delay=0.01)
+        thread = threading.Thread(target=stream.run)
+        thread.start()
+        try:
+            self.write(b'-k 1\n')
+            # Sent while the stream is still open
+            self.assertTrue(flushed.wait(2))
+            self.assertEqual(self.records(self.sent[0]), (20, 1))
+        finally:
+            self.end()
+            thread.join()
+        self.assertEqual(len(self.sent), 1)
+
+    def test_flush_delay_busy_stream(self):
+        self.write(b''.join(b'-k %d\n' % (port + 1) for port in range(5)))
+        self.end()
+        # One line per read, and a second passes at every look at the clock
+        clock = itertools.count()
+        stream = RuleStream(self.read_fd, FlowRule(seq_no=20), self.batcher,
+                            delay=1.5, clock=lambda: next(clock))
+        read_size = fcn_stream.READ_SIZE
+        fcn_stream.READ_SIZE = 5
+        try:
+            self.assertEqual(stream.run(), 5)
+        finally:
+            fcn_stream.READ_SIZE = read_size
+        # Flushed once overdue, before the messages are full
+        self.assertEqual([self.records(data) for data in self.sent],
+                         [(20, 2), (22, 2), (24, 1)])
+
+    def test_flow_table(self):
+        self.write(b'-k 1\n-k 1\n-a 1 -k 2\n-a 1 -k 1\n')
+        self.end()
+        table = FlowTable()
+        stream = RuleStream(self.read_fd, FlowRule(seq_no=20), self.batcher,
+                            flow_table=table)
+        self.assertEqual(stream.run(), 2)
+        self.assertEqual(table.suppressed, 2)
+        self.assertEqual([self.records(data) for data in self.sent],
+                         [(20, 2)])
+
+    def test_negative_delay(self):
+        self.assertRaises(NameError, RuleStream, self.read_fd, FlowRule(),
+                          self.batcher, delay=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
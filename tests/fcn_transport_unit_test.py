@@ -0,0 +1,132 @@
+# Copyright (c) 2016, Centre for Advanced Internet Architectures,
+# Swinburne University of Technology. All rights reserved.
+#
+# Author: Dzuy Pham (dhpham@swin.edu.au)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of the FreeBSD Project.
+import unittest
+import socket
+import sys
+sys.path.append("..")
+from fcn_transport import Transport
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.server.settimeout(2)
+        self.port = self.server.getsockname()[1]
+        self.transport = Transport(timeout=2)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.close()
+
+    def receive(self, conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_tcp_connection_reused(self):
+        self.transport.send(b'ab', '127.0.0.1', self.port, 'TCP')
+        self.transport.send(b'cd', '127.0.0.1', self.port, 'tcp')
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 4), b'abcd')
+        self.assertEqual(len(self.transport.sockets), 1)
+        conn.close()
+
+    def test_tcp_nodelay(self):
+        self.transport.send(b'ab', '127.0.0.1', self.port, 'TCP')
+        sock = list(self.transport.sockets.values())[0]
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP,
+                                        socket.TCP_NODELAY))
+        self.server.accept()[0].close()
+
+    def test_tcp_reconnect_after_drop(self):
+        self.transport.send(b'ab', '127.0.0.1', self.port, 'TCP')
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 2), b'ab')
+        conn.close()
+        self.transport.send(b'cd', '127.0.0.1', self.port, 'TCP')
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 2), b'cd')
+        conn.close()
+
+    def test_close(self):
+        self.transport.send(b'ab', '127.0.0.1', self.port, 'TCP')
+        self.transport.send(b'ab', '127.0.0.1', self.port, 'UDP')
+        self.assertEqual(len(self.transport.sockets), 2)
+        self.transport.close()
+        self.assertEqual(self.transport.sockets, {})
+        self.server.accept()[0].close()
+
+    def test_tcp_session_template_once(self):
+        template = lambda data: b'T' + data
+        self.transport.send(b'a', '127.0.0.1', self.port, 'TCP', template)
+        self.transport.send(b'b', '127.0.0.1', self.port, 'TCP', template)
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 4), b'Taab')
+        conn.close()
+        # A new connection gets the template again
+        self.transport.send(b'c', '127.0.0.1', self.port, 'TCP', template)
+        conn = self.server.accept()[0]
+        conn.settimeout(2)
+        self.assertEqual(self.receive(conn, 3), b'Tcc')
+        conn.close()
+
+    def test_udp_session_template_interval(self):
+        sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink.bind(('127.0.0.1', 0))
+        sink.settimeout(2)
+        port = sink.getsockname()[1]
+        template = lambda data: b'T'
+        self.transport.send(b'a', '127.0.0.1', port, 'UDP', template)
+        self.transport.send(b'b', '127.0.0.1', port, 'UDP', template)
+        self.transport.template_interval = 0
+        self.transport.send(b'c', '127.0.0.1', port, 'UDP', template)
+        received = [sink.recv(16) for _ in range(5)]
+        self.assertEqual(received, [b'T', b'a', b'b', b'T', b'c'])
+        sink.close()
+
+    def test_connect_refused(self):
+        self.server.close()
+        self.assertRaises(NameError, self.transport.send, b'ab',
+                          '127.0.0.1', self.port, 'TCP')
+
+if __name__ == '__main__':
+    unittest.main()
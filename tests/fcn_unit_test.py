@@ -29,11 +29,42 @@
 # those of the authors and should not be interpreted as representing official
 # policies, either expressed or implied, of the FreeBSD Project.
 import unittest
+import argparse
+import binascii
+import os
+import signal
+import socket
+import struct
 import sys
+import tempfile
 sys.path.append("..")
+import fcn
 from fcn import FCN
 
 
+class _Inputs(object):
+    """Stand-in for the parsed command line inputs
+
+    """
+    def __init__(self, **kwargs):
+        self.srcip = '10.0.0.1'
+        self.destip = '10.0.0.2'
+        self.seq_no = 10
+        self.srcport = 80
+        self.destport = 5000
+        self.prototype = 6
+        self.msgtype = 0
+        self.timeoutval = 60
+        self.export = 'myexp'
+        self.mclass = 'myclass'
+        self.prio = 20
+        self.HOST = '127.0.0.1'
+        self.PORT = 5000
+        self.PROTO = 'TCP'
+        self.a_flg = 1
+        self.__dict__.update(kwargs)
+
+
 class FCNCheckTest(unittest.TestCase):
     def setUp(self):
         pass
@@ -139,5 +170,150 @@ class FCNCheckTest(unittest.TestCase):
         msg_type = 'abde'
         self.assertRaises(NameError, FCN.msg_type_check, msg_type)
 
+
+class FCNPackTest(unittest.TestCase):
+    # Output of the hex-string pipeline for the same inputs at time 1461283200
+    default_msg = (
+        '000100820000000a571969800001002c0100000080020008000c000100020003'
+        '0004000500100011c000000d000e80000008000f800100100100004a6d796578'
+        '70000000000a0000010a000002005013880600000000000000000b6d79636c61'
+        '737300001400003c000000000000000000010000000000000000000000000000'
+        '0000')
+    limits_msg = (
+        '0001007cffffffff571969800001002c0100000080020008000c000100020003'
+        '0004000500100011c000000d000e80000008000f80010010010000446578706f'
+        '72746162020a0000010a000002ffff138811000000000000000005630000ff00'
+        'ffff0000000000000000000000000000000000000000000000000000')
+
+    def setUp(self):
+        self.fake = FCN.__new__(FCN)
+        self._time = fcn.time.time
+        fcn.time.time = lambda: 1461283200.5
+
+    def tearDown(self):
+        fcn.time.time = self._time
+
+    def test_pack_message_default(self):
+        out = self.fake.pack_message(_Inputs())
+        self.assertEqual(binascii.hexlify(out).decode(), self.default_msg)
+
+    def test_pack_message_limits(self):
+        inputs = _Inputs(mclass='c', export='exportab', msgtype=2,
+                         seq_no=4294967295, timeoutval=65535, a_flg=0,
+                         prio=255, srcport=65535, prototype=17)
+        out = self.fake.pack_message(inputs)
+        self.assertEqual(binascii.hexlify(out).decode(), self.limits_msg)
+
+    def test_pack_lengths(self):
+        payload = self.fake.pack_msg_payload(_Inputs())
+        template = self.fake.pack_template(len(payload))
+        self.assertEqual(len(payload), 70)
+        self.assertEqual(len(template), 44)
+
+    def test_pack_template_cached(self):
+        template = self.fake.pack_template(70)
+        self.assertIs(template, self.fake.pack_template(70))
+        self.assertEqual(template[-4:], b'\x01\x00\x00\x4a')
+        self.assertEqual(self.fake.pack_template(71)[-4:],
+                         b'\x01\x00\x00\x4b')
+
+    def test_pack_data_batch(self):
+        inputs = _Inputs()
+        payload = self.fake.pack_msg_payload(inputs)
+        data = self.fake.pack_data_batch(inputs, [payload, payload])
+        full = self.fake.pack_batch(inputs, [payload, payload])
+        self.assertEqual(data[4:12], full[4:12])
+        self.assertEqual(data[12:], full[56:])
+        self.assertEqual(data[:4], b'\x00\x01\x00\x9c')
+
+    def test_pack_template_message(self):
+        full = self.fake.pack_message(_Inputs())
+        template = FCN.pack_template_message(full)
+        self.assertEqual(template[:2], full[:2])
+        self.assertEqual(template[2:4], b'\x00\x38')
+        self.assertEqual(template[4:], full[4:56])
+
+    def test_pack_rule_message(self):
+        inputs = _Inputs()
+        full = self.fake.pack_rule_message(inputs)
+        self.assertEqual(full[:12], self.fake.pack_message(inputs)[:12])
+        # No template in session mode, the transport sends it ahead
+        data = self.fake.pack_rule_message(inputs, session=True)
+        self.assertEqual(len(data), 16 + 70)
+        self.assertEqual(data[12:], full[56:])
+
+    def test_pack_timeout_out_of_range(self):
+        self.assertRaises(NameError, self.fake.pack_msg_payload,
+                          _Inputs(timeoutval=65536))
+
+    def test_pack_seq_no_out_of_range(self):
+        self.assertRaises(NameError, self.fake.pack_message,
+                          _Inputs(seq_no=2 ** 32))
+
+    def test_pack_invalid_ip(self):
+        self.assertRaises(NameError, self.fake.pack_msg_payload,
+                          _Inputs(srcip='10.0.0'))
+
+
+class FCNLoadShardTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(2)
+        inputs = _Inputs(PORT=self.sink.getsockname()[1], PROTO='UDP',
+                         seq_no=5, rate=100000.0, duration=None, count=5,
+                         burst=10, poisson=False, ramp=0, flows=10,
+                         session=False, template_interval=60)
+        self.inputs = argparse.Namespace(**vars(inputs))
+
+    def tearDown(self):
+        self.sink.close()
+
+    def test_shards_disjoint(self):
+        fake = FCN.__new__(FCN)
+        received = []
+        for shard in range(2):
+            report = fake.run_load_shard(self.inputs, shard, 2)
+            self.assertEqual(report.sent, 3 - shard)
+            for _ in range(report.sent):
+                data = self.sink.recv(2048)
+                received.append((struct.unpack('!I', data[4:8])[0],
+                                 struct.unpack('!H', data[77:79])[0]))
+        self.assertEqual(received, [(5, 1), (6, 3), (7, 5),
+                                    (5 + 2 ** 31, 2), (6 + 2 ** 31, 4)])
+
+    def test_worker_ignores_ctrl_c(self):
+        handler = signal.getsignal(signal.SIGINT)
+        try:
+            fcn.init_load_worker()
+            self.assertEqual(signal.getsignal(signal.SIGINT), signal.SIG_IGN)
+        finally:
+            signal.signal(signal.SIGINT, handler)
+
+
+class FCNRuleFileTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        os.write(handle, b'srcport,mtype\n1,0\n2,0\n3,5\n')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_batch_sent_before_error(self):
+        fake = FCN.__new__(FCN)
+        sent = []
+        fake.send_message = lambda data, inputs: sent.append(data)
+        inputs = argparse.Namespace(**vars(_Inputs(
+            from_file=self.path, file_format=None, msg_size=1472,
+            session=False)))
+        with self.assertRaises(SystemExit) as context:
+            fake.send_rule_file(inputs)
+        self.assertEqual(str(context.exception.code),
+                         'Error: Line 4: Invalid Msg Type')
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(len(sent[0]), 60 + 70 * 2)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file